@@ -0,0 +1,416 @@
+"""
+Adaptive admission control for the model-bound endpoints.
+
+Each endpoint gets an `AdaptiveLimiter`: a concurrency limit tuned AIMD-style
+from observed service latency (add ~1 per limit's worth of fast completions,
+multiply by ADMISSION_BACKOFF when latency exceeds the target or a call fails),
+in front of a bounded priority queue. Queued requests give up at their deadline.
+Overload is answered fast instead of piling up: 429 when the queue is full, 503
+when the queue wait ran out, both with Retry-After estimated from the backlog.
+`high_safety` traffic is served first and may take the place of a queued normal
+request when the queue is full.
+
+Settings come from ADMISSION_* variables, overridable per endpoint with
+ADMISSION_<NAME>_* (e.g. ADMISSION_ANALYZE_MAX=32).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+import anyio.from_thread
+
+from Common.Metrics import REGISTRY
+
+HIGH = 0
+NORMAL = 1
+PRIORITIES = {"high_safety": HIGH, "high": HIGH, "normal": NORMAL}
+
+ADMISSION_ENABLED = os.environ.get("ADMISSION_ENABLED", "1").lower() not in {"0", "false", "no"}
+# The no-load baseline drops to any faster smoothed latency at once but only creeps up over this many
+# seconds, independent of request rate, so sustained overload is not mistaken for the new normal
+BASELINE_WINDOW_SECONDS = float(os.environ.get("ADMISSION_BASELINE_WINDOW_SECONDS", "300"))
+LATENCY_ALPHA = 0.2
+# Never aim below this, so fast endpoints do not shrink on scheduling noise
+MIN_TARGET_MS = 10.0
+
+REJECTED = REGISTRY.counter("mindful_admission_rejected_total", "Requests turned away by admission control.", ("endpoint", "reason"))
+QUEUE_WAIT = REGISTRY.histogram("mindful_admission_wait_seconds", "Time spent queued before admission.", ("endpoint",))
+
+
+def _setting(name: str, key: str, default: str) -> str:
+    return os.environ.get(f"ADMISSION_{name.upper()}_{key}", os.environ.get(f"ADMISSION_{key}", default))
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, reason: str, retry_after: int):
+        super().__init__(reason)
+        self.status_code = status_code
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "future")
+
+    def __init__(self, priority: int, seq: int, future: asyncio.Future):
+        self.priority = priority
+        self.seq = seq
+        self.future = future
+
+    def __lt__(self, other: "_Waiter") -> bool:
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit plus a bounded priority wait queue; used from one event loop.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 64,
+        target_ms: float = 0.0,
+        tolerance: float = 2.0,
+        backoff: float = 0.9,
+        queue_size: int = 64,
+        queue_timeout: float = 2.0,
+    ):
+        self.name = name
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = float(min(self.max_limit, max(self.min_limit, initial)))
+        # 0: aim for `tolerance` x the no-load latency observed so far
+        self.target_ms = target_ms
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.queue_size = max(0, queue_size)
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.baseline_ms: Optional[float] = None
+        self.latency_ms: Optional[float] = None
+        self._waiters: List[_Waiter] = []
+        self._queued = 0
+        self._seq = itertools.count()
+        self._last_decrease = 0.0
+        self._last_sample = 0.0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @classmethod
+    def from_env(cls, name: str) -> "AdaptiveLimiter":
+        return cls(
+            name,
+            initial=int(_setting(name, "INITIAL", "4")),
+            min_limit=int(_setting(name, "MIN", "1")),
+            max_limit=int(_setting(name, "MAX", "64")),
+            target_ms=float(_setting(name, "TARGET_MS", "0")),
+            tolerance=float(_setting(name, "TOLERANCE", "2.0")),
+            backoff=float(_setting(name, "BACKOFF", "0.9")),
+            queue_size=int(_setting(name, "QUEUE", "64")),
+            queue_timeout=float(_setting(name, "QUEUE_TIMEOUT_MS", "2000")) / 1000.0,
+        )
+
+    @property
+    def target(self) -> float:
+        if self.target_ms > 0:
+            return self.target_ms
+        if self.baseline_ms is None:
+            return float("inf")
+        return max(MIN_TARGET_MS, self.baseline_ms * self.tolerance)
+
+    def retry_after(self) -> int:
+        # seconds to drain the current backlog at the current limit
+        per_request = (self.latency_ms or 1000.0) / 1000.0
+        return max(1, math.ceil((self._queued + 1) * per_request / max(1.0, self.limit)))
+
+    async def acquire(self, priority: int = NORMAL) -> None:
+        if self.in_flight < int(self.limit) and not self._queued:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        if self._queued >= self.queue_size:
+            victim = self._lowest_waiter() if priority == HIGH else None
+            if victim is None or victim.priority == HIGH:
+                self._reject("queue_full")
+                raise AdmissionRejected(429, f"{self.name}: too many requests queued", self.retry_after())
+            # a high_safety request takes the place of the newest queued normal one
+            self._queued -= 1
+            REJECTED.inc(endpoint=self.name, reason="preempted")
+            self.rejected += 1
+            victim.future.set_exception(AdmissionRejected(503, f"{self.name}: preempted by priority traffic", self.retry_after()))
+
+        loop = asyncio.get_running_loop()
+        waiter = _Waiter(priority, next(self._seq), loop.create_future())
+        heapq.heappush(self._waiters, waiter)
+        self._queued += 1
+        started = time.perf_counter()
+        try:
+            await asyncio.wait({waiter.future}, timeout=self.queue_timeout)
+        except asyncio.CancelledError:
+            # the client went away while queued; hand back a slot it may already have been given
+            if waiter.future.done() and not waiter.future.cancelled() and waiter.future.exception() is None:
+                self._release_slot()
+            else:
+                self._abandon(waiter)
+            raise
+        QUEUE_WAIT.observe(time.perf_counter() - started, endpoint=self.name)
+        if not waiter.future.done():
+            self._abandon(waiter)
+            self.timed_out += 1
+            self._reject("queue_timeout")
+            raise AdmissionRejected(503, f"{self.name}: overloaded, queue wait exceeded", self.retry_after())
+        waiter.future.result()  # raises if preempted
+        self.admitted += 1
+
+    def release(self, latency: Optional[float] = None, ok: bool = True) -> None:
+        """
+        Free a slot; latency (seconds of service time) and ok feed the AIMD update when given.
+        """
+        if latency is not None or not ok:
+            self._adjust(latency, ok)
+        self._release_slot()
+
+    @asynccontextmanager
+    async def slot(self, priority: int = NORMAL, sample: bool = True) -> AsyncIterator[None]:
+        """
+        Hold one slot for the block; sample=False for long streams that should not skew the latency target.
+        """
+        await self.acquire(priority)
+        started = time.perf_counter()
+        latency: Optional[float] = None
+        ok = True
+        try:
+            yield
+        except Exception as exc:
+            # 4xx means a bad request, not an overloaded endpoint
+            ok = getattr(exc, "status_code", 500) < 500
+            raise
+        else:
+            if sample:
+                latency = time.perf_counter() - started
+        finally:
+            # a cancelled (disconnected) request releases without a verdict
+            self.release(latency, ok)
+
+    def _adjust(self, latency: Optional[float], ok: bool) -> None:
+        now = time.monotonic()
+        if latency is not None:
+            ms = latency * 1000.0
+            self.latency_ms = ms if self.latency_ms is None else self.latency_ms + LATENCY_ALPHA * (ms - self.latency_ms)
+            # baseline and verdict both use the smoothed latency: against single samples a
+            # heavy-tailed upstream looks overloaded most of the time and the limit collapses
+            if self.baseline_ms is None or self.latency_ms < self.baseline_ms:
+                self.baseline_ms = self.latency_ms
+            else:
+                drift = min(1.0, (now - self._last_sample) / BASELINE_WINDOW_SECONDS) if BASELINE_WINDOW_SECONDS > 0 else 1.0
+                self.baseline_ms += drift * (self.latency_ms - self.baseline_ms)
+            self._last_sample = now
+        slow = latency is not None and self.latency_ms > self.target
+        if not ok or slow:
+            # at most one decrease per typical request time, so one burst does not collapse the limit
+            if now - self._last_decrease >= (self.latency_ms or 0.0) / 1000.0:
+                self.limit = max(float(self.min_limit), self.limit * self.backoff)
+                self._last_decrease = now
+        elif self.in_flight >= int(self.limit):
+            # only grow while the limit is actually the bottleneck
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+
+    def _release_slot(self) -> None:
+        self.in_flight = max(0, self.in_flight - 1)
+        while self._waiters and self.in_flight < int(self.limit):
+            waiter = heapq.heappop(self._waiters)
+            if waiter.future.done():
+                continue
+            self._queued -= 1
+            self.in_flight += 1
+            waiter.future.set_result(None)
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        if not waiter.future.done():
+            waiter.future.cancel()
+            self._queued -= 1
+
+    def _lowest_waiter(self) -> Optional[_Waiter]:
+        live = [w for w in self._waiters if not w.future.done()]
+        return max(live) if live else None
+
+    def _reject(self, reason: str) -> None:
+        self.rejected += 1
+        REJECTED.inc(endpoint=self.name, reason=reason)
+
+    def stats(self) -> Dict:
+        return {
+            "limit": round(self.limit, 2),
+            "in_flight": self.in_flight,
+            "queued": self._queued,
+            "queue_size": self.queue_size,
+            "target_ms": round(self.target, 1) if self.target != float("inf") else None,
+            "baseline_ms": round(self.baseline_ms, 1) if self.baseline_ms is not None else None,
+            "latency_ms": round(self.latency_ms, 1) if self.latency_ms is not None else None,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+
+_limiters: Dict[str, AdaptiveLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str) -> AdaptiveLimiter:
+    with _limiters_lock:
+        limiter = _limiters.get(name)
+        if limiter is None:
+            limiter = _limiters[name] = AdaptiveLimiter.from_env(name)
+        return limiter
+
+
+def priority_of(mode: Optional[str]) -> int:
+    return PRIORITIES.get((mode or "normal").lower(), NORMAL)
+
+
+@asynccontextmanager
+async def admit(name: str, priority: int = NORMAL, sample: bool = True) -> AsyncIterator[None]:
+    """
+    Run the block under the named endpoint's limiter (a no-op when ADMISSION_ENABLED=0).
+    """
+    if not ADMISSION_ENABLED:
+        yield
+        return
+    async with get_limiter(name).slot(priority, sample):
+        yield
+
+
+async def _acquire(limiter: AdaptiveLimiter, priority: int) -> asyncio.AbstractEventLoop:
+    await limiter.acquire(priority)
+    return asyncio.get_running_loop()
+
+
+@contextmanager
+def admit_from_thread(name: str, priority: int = NORMAL) -> Iterator[None]:
+    """
+    admit() for synchronous code stepped from the threadpool (anyio worker threads), such as a
+    streaming flow generator: the slot is awaited on the serving loop and released when the
+    block exits, from whichever thread closes it. Holds without feeding the latency target.
+    """
+    if not ADMISSION_ENABLED:
+        yield
+        return
+    limiter = get_limiter(name)
+    slot = _HeldSlot(limiter, anyio.from_thread.run(_acquire, limiter, priority))
+    try:
+        yield
+    finally:
+        slot.release()
+
+
+class _HeldSlot:
+    """
+    One acquired slot, given back exactly once from whichever thread finishes with it.
+    """
+
+    def __init__(self, limiter: AdaptiveLimiter, loop: asyncio.AbstractEventLoop):
+        self._limiter = limiter
+        self._loop = loop
+        self._lock = threading.Lock()
+        self._held = True
+
+    def release(self) -> None:
+        with self._lock:
+            if not self._held:
+                return
+            self._held = False
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            self._limiter.release()
+            return
+        # the limiter's waiters are futures of the serving loop
+        try:
+            self._loop.call_soon_threadsafe(self._limiter.release)
+        except RuntimeError:
+            # loop already closed: nothing is waiting any more
+            pass
+
+
+class AdmittedStream:
+    """
+    An async iterator holding one admission slot. The slot goes back when iteration ends or
+    fails, on aclose() (routes also run it as the response's background task), and, should
+    the response never start iterating, when the stream is garbage-collected.
+    """
+
+    def __init__(self, events: AsyncIterator, slot: Optional[_HeldSlot] = None):
+        self._events = events
+        self._slot = slot
+        if slot is not None:
+            weakref.finalize(self, slot.release)
+
+    def __aiter__(self) -> "AdmittedStream":
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self._events.__anext__()
+        except BaseException:
+            # end of stream, an error, or the response task being cancelled on disconnect
+            self._release()
+            raise
+
+    async def aclose(self) -> None:
+        self._release()
+        close = getattr(self._events, "aclose", None)
+        if close is not None:
+            await close()
+
+    def _release(self) -> None:
+        if self._slot is not None:
+            self._slot.release()
+
+
+async def admit_stream(name: str, events: AsyncIterator, priority: int = NORMAL) -> AdmittedStream:
+    """
+    Admit a streamed response now, so overload is still a 429/503 rather than a broken stream,
+    and hold the slot until the stream is finished or dropped. Stream durations do not feed
+    the latency target.
+    """
+    if not ADMISSION_ENABLED:
+        return AdmittedStream(events)
+    limiter = get_limiter(name)
+    await limiter.acquire(priority)
+    return AdmittedStream(events, _HeldSlot(limiter, asyncio.get_running_loop()))
+
+
+def install_admission(app) -> None:
+    """
+    Turn AdmissionRejected into 429/503 + Retry-After and expose `/admission/stats`.
+    """
+    from fastapi.responses import JSONResponse
+
+    @app.exception_handler(AdmissionRejected)
+    async def _rejected(_request, exc: AdmissionRejected):
+        return JSONResponse(
+            {"detail": exc.reason}, status_code=exc.status_code, headers={"Retry-After": str(exc.retry_after)}
+        )
+
+    @app.get("/admission/stats")
+    def admission_stats():
+        with _limiters_lock:
+            limiters = dict(_limiters)
+        return {"enabled": ADMISSION_ENABLED, "endpoints": {name: limiter.stats() for name, limiter in limiters.items()}}
@@ -0,0 +1,179 @@
+"""
+Bounded in-memory LRU/TTL cache with an optional SQLite tier.
+
+Values must be JSON-serializable so they can be spilled to disk; the SQLite file
+survives restarts and is consulted on memory misses (hits are promoted back).
+The memory tier is bounded by entry count and, optionally, by the total size of
+the JSON-encoded values (`max_bytes`).
+
+The SQLite connection is opened on first use and reopened in a forked child: caches
+built at import time in a preloading parent (Common/Serve.py) must not share one
+connection across fork(), which SQLite does not support.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Connections inherited from a parent process; kept referenced so the child never closes
+# (and checkpoints or unlinks the WAL of) a connection the parent may still be using
+_inherited: List[sqlite3.Connection] = []
+
+
+class TtlLruCache:
+    def __init__(
+        self,
+        max_entries: int = 10000,
+        ttl: float = 3600.0,
+        db_path: Optional[str] = None,
+        namespace: str = "default",
+        max_bytes: int = 0,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.namespace = namespace
+        # 0 disables the size bound
+        self.max_bytes = max(0, max_bytes)
+        self.bytes = 0
+        self._entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.db_path = db_path or None
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_pid: Optional[int] = None
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        # caller holds self._lock
+        if self.db_path is None:
+            return None
+        if self._db is not None and self._db_pid == os.getpid():
+            return self._db
+        if self._db is not None:
+            _inherited.append(self._db)
+        Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute(
+            "CREATE TABLE IF NOT EXISTS cache (namespace TEXT, key TEXT, value TEXT, expires_at REAL, PRIMARY KEY (namespace, key))"
+        )
+        self._db, self._db_pid = db, os.getpid()
+        return db
+
+    def _expiry(self) -> float:
+        return time.time() + self.ttl if self.ttl > 0 else float("inf")
+
+    def get(self, key: str) -> Optional[Any]:
+        now = time.time()
+        with self._lock:
+            item = self._entries.get(key)
+            if item is not None:
+                value, expires_at, _size = item
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                self._drop_locked(key)
+            found = self._disk_get(key, now)
+            if found is not None:
+                value, expires_at = found
+                self.disk_hits += 1
+                # keep the stored expiry: a frequently read entry must still expire
+                self._store_locked(key, value, expires_at)
+                return value
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Any) -> None:
+        expires_at = self._expiry()
+        encoded = json.dumps(value)
+        with self._lock:
+            self._store_locked(key, value, expires_at, len(encoded))
+            db = self._connection()
+            if db is not None:
+                db.execute(
+                    "INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)",
+                    (self.namespace, key, encoded, expires_at if expires_at != float("inf") else None),
+                )
+
+    def invalidate(self, key: Optional[str] = None) -> int:
+        """
+        Drop one key, or everything in this namespace when key is None; returns entries removed.
+        """
+        with self._lock:
+            if key is None:
+                removed = len(self._entries)
+                self._entries.clear()
+                self.bytes = 0
+                db = self._connection()
+                if db is not None:
+                    removed = max(removed, db.execute("DELETE FROM cache WHERE namespace = ?", (self.namespace,)).rowcount)
+                return removed
+            removed = 1 if self._drop_locked(key) else 0
+            db = self._connection()
+            if db is not None:
+                removed = max(removed, db.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key)).rowcount)
+            return removed
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "disk": self.db_path is not None,
+            }
+
+    def _store_locked(self, key: str, value: Any, expires_at: float, size: Optional[int] = None) -> None:
+        if size is None:
+            size = len(json.dumps(value))
+        if self.max_bytes and size > self.max_bytes:
+            # larger than the whole memory budget: keep it on disk only
+            self._drop_locked(key)
+            return
+        self._drop_locked(key)
+        self._entries[key] = (value, expires_at, size)
+        self.bytes += size
+        while len(self._entries) > self.max_entries or (self.max_bytes and self.bytes > self.max_bytes):
+            _key, (_value, _expires_at, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def _drop_locked(self, key: str) -> bool:
+        item = self._entries.pop(key, None)
+        if item is None:
+            return False
+        self.bytes -= item[2]
+        return True
+
+    def _disk_get(self, key: str, now: float) -> Optional[Tuple[Any, float]]:
+        db = self._connection()
+        if db is None:
+            return None
+        row = db.execute(
+            "SELECT value, expires_at FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key)
+        ).fetchone()
+        if row is None:
+            return None
+        value, expires_at = row
+        if expires_at is not None and expires_at <= now:
+            db.execute("DELETE FROM cache WHERE namespace = ? AND key = ?", (self.namespace, key))
+            return None
+        return json.loads(value), expires_at if expires_at is not None else float("inf")
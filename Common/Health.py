@@ -0,0 +1,28 @@
+"""
+Liveness / readiness helpers shared by the services.
+
+`/health` only says the process is up and serving; `/health/ready` reports whether
+the heavy components (models, providers) are loaded, with 503 until they are, so
+load balancers can hold traffic during a cold start without restarting the pod.
+"""
+
+from __future__ import annotations
+
+from typing import Dict
+
+from fastapi.responses import JSONResponse
+
+READY = "ready"
+# Seconds a client should wait before probing again while components load
+RETRY_AFTER_SECONDS = 5
+
+
+def readiness_response(components: Dict[str, str]) -> JSONResponse:
+    """
+    200 when every component is "ready", otherwise 503 with Retry-After and per-component state.
+    """
+    ready = all(state == READY for state in components.values())
+    body = {"status": "ready" if ready else "not_ready", "components": components}
+    if ready:
+        return JSONResponse(body)
+    return JSONResponse(body, status_code=503, headers={"Retry-After": str(RETRY_AFTER_SECONDS)})
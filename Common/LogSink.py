@@ -0,0 +1,242 @@
+"""
+Background JSON-lines log writer shared by the services.
+
+Request handlers only enqueue a dict; a daemon thread batches records, writes
+them as one JSON object per line, and rotates (optionally gzipping) the file
+by size or age. When the queue is full the configured backpressure policy
+decides whether to drop, sample or briefly block instead of slowing requests.
+
+Under Common.Serve every forked worker writes its own file (app.log -> app.w<index>.log):
+a file shared between processes would be rotated by one while the others kept
+appending to the renamed inode.
+"""
+
+from __future__ import annotations
+
+import atexit
+import datetime
+import gzip
+import json
+import os
+import queue
+import random
+import shutil
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", "10000"))
+FLUSH_INTERVAL_MS = float(os.environ.get("LOG_FLUSH_MS", "500"))
+BATCH_SIZE = int(os.environ.get("LOG_BATCH_SIZE", "256"))
+MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", str(20 * 1024 * 1024)))
+ROTATE_SECONDS = float(os.environ.get("LOG_ROTATE_SECONDS", "0"))  # 0 disables time-based rotation
+BACKUPS = int(os.environ.get("LOG_BACKUPS", "5"))
+COMPRESS = os.environ.get("LOG_COMPRESS", "1").lower() not in {"0", "false", "no"}
+# drop: discard new records when full; sample: keep SAMPLE_RATE of records once the
+# queue is past its high-water mark; block: wait up to BLOCK_MS for space, then drop
+BACKPRESSURE = os.environ.get("LOG_BACKPRESSURE", "sample").lower()
+SAMPLE_RATE = float(os.environ.get("LOG_SAMPLE_RATE", "0.1"))
+BLOCK_MS = float(os.environ.get("LOG_BLOCK_MS", "5"))
+HIGH_WATER = 0.8
+
+_STOP = object()
+
+
+class LogSink:
+    def __init__(
+        self,
+        path: Path,
+        *,
+        queue_size: int = QUEUE_SIZE,
+        flush_interval_ms: float = FLUSH_INTERVAL_MS,
+        batch_size: int = BATCH_SIZE,
+        max_bytes: int = MAX_BYTES,
+        rotate_seconds: float = ROTATE_SECONDS,
+        backups: int = BACKUPS,
+        compress: bool = COMPRESS,
+        backpressure: str = BACKPRESSURE,
+        sample_rate: float = SAMPLE_RATE,
+    ):
+        self.path = Path(path)
+        self.flush_interval = max(0.01, flush_interval_ms / 1000.0)
+        self.batch_size = max(1, batch_size)
+        self.max_bytes = max_bytes
+        self.rotate_seconds = rotate_seconds
+        self.backups = backups
+        self.compress = compress
+        self.backpressure = backpressure
+        self.sample_rate = sample_rate
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max(1, queue_size))
+        self._high_water = int(self._queue.maxsize * HIGH_WATER)
+        self._file = None
+        self._opened_at = 0.0
+        self.emitted = 0
+        self.dropped = 0
+        self.written = 0
+        self.rotations = 0
+        self._worker = threading.Thread(target=self._run, name=f"log-sink:{self.path.name}", daemon=True)
+        self._worker.start()
+
+    def emit(self, record: Dict) -> bool:
+        """
+        Enqueue one record; never raises and never waits longer than the block policy allows.
+        """
+        record.setdefault("ts", datetime.datetime.utcnow().isoformat() + "Z")
+        if self.backpressure == "sample" and self._queue.qsize() >= self._high_water and random.random() >= self.sample_rate:
+            self.dropped += 1
+            return False
+        try:
+            if self.backpressure == "block":
+                self._queue.put(record, timeout=BLOCK_MS / 1000.0)
+            else:
+                self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            return False
+        self.emitted += 1
+        return True
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """
+        Wait until everything enqueued so far has been written.
+        """
+        done = threading.Event()
+        try:
+            self._queue.put(done, timeout=timeout)
+        except queue.Full:
+            return
+        done.wait(timeout)
+
+    def close(self) -> None:
+        try:
+            self._queue.put(_STOP, timeout=1.0)
+        except queue.Full:
+            pass
+        self._worker.join(timeout=5.0)
+
+    def stats(self) -> Dict:
+        return {
+            "path": str(self.path),
+            "queued": self._queue.qsize(),
+            "emitted": self.emitted,
+            "dropped": self.dropped,
+            "written": self.written,
+            "rotations": self.rotations,
+        }
+
+    def _run(self) -> None:
+        while True:
+            batch: List = []
+            try:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+                while len(batch) < self.batch_size:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                pass
+            stop = any(item is _STOP for item in batch)
+            records = [item for item in batch if isinstance(item, dict)]
+            try:
+                if records:
+                    self._write(records)
+            except Exception:
+                # logging must never break the service
+                pass
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+            if stop:
+                if self._file is not None:
+                    self._file.close()
+                return
+
+    def _write(self, records: List[Dict]) -> None:
+        if self._file is None:
+            self._open()
+        lines = "".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in records)
+        self._file.write(lines)
+        self._file.flush()
+        self.written += len(records)
+        if self._should_rotate():
+            self._rotate()
+
+    def _open(self) -> None:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = self.path.open("a", encoding="utf-8")
+        self._opened_at = time.monotonic()
+
+    def _should_rotate(self) -> bool:
+        if self.max_bytes > 0 and self._file.tell() >= self.max_bytes:
+            return True
+        return self.rotate_seconds > 0 and time.monotonic() - self._opened_at >= self.rotate_seconds
+
+    def _rotate(self) -> None:
+        self._file.close()
+        self._file = None
+        stamp = datetime.datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+        rotated = self.path.with_name(f"{self.path.name}.{stamp}")
+        self.path.rename(rotated)
+        if self.compress:
+            with rotated.open("rb") as src, gzip.open(f"{rotated}.gz", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            rotated.unlink()
+        self.rotations += 1
+        self._prune()
+
+    def _prune(self) -> None:
+        old = sorted(self.path.parent.glob(f"{self.path.name}.*"))
+        for stale in old[: max(0, len(old) - self.backups)]:
+            try:
+                stale.unlink()
+            except OSError:
+                pass
+
+
+_sinks: Dict[str, LogSink] = {}
+_sinks_lock = threading.Lock()
+_worker_tag: Optional[str] = None
+
+
+def set_worker(index: int) -> None:
+    """
+    Called in each forked worker: sinks created from now on write app.w<index>.log instead of app.log.
+    """
+    global _worker_tag
+    _worker_tag = f"w{index}"
+
+
+def _worker_path(path: Path) -> Path:
+    if _worker_tag is None:
+        return path
+    return path.with_name(f"{path.stem}.{_worker_tag}{path.suffix}")
+
+
+def get_sink(path: Path) -> LogSink:
+    """
+    One sink (and writer thread) per log file per process.
+    """
+    key = str(Path(path).resolve())
+    sink: Optional[LogSink] = _sinks.get(key)
+    if sink is None:
+        with _sinks_lock:
+            sink = _sinks.get(key)
+            if sink is None:
+                sink = _sinks[key] = LogSink(_worker_path(Path(path)))
+    return sink
+
+
+@atexit.register
+def close_all() -> None:
+    for sink in list(_sinks.values()):
+        sink.close()
+
+
+def _after_fork_in_child() -> None:
+    # the parent's writer threads do not exist in the child; its sinks are rebuilt on first use
+    global _sinks_lock
+    _sinks.clear()
+    _sinks_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
@@ -0,0 +1,247 @@
+"""
+Dependency-free Prometheus-style metrics and per-request timing spans.
+
+Every service registers its counters/histograms on the process-wide REGISTRY and
+exposes them with `instrument_app(app, service)`, which also records HTTP latency
+per route. `span(stage)` times a block, feeds the stage histogram and, inside
+`trace(trace_id)`, appends a span tagged with the trace id so flows can report
+where the time went.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import os
+import resource
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: [bucket counts..., sum, count]
+        self._values: Dict[LabelValues, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0.0] * (len(self.buckets) + 2)
+            if idx < len(self.buckets):
+                state[idx] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                cumulative = 0.0
+                for bound, count in zip(self.buckets, state):
+                    cumulative += count
+                    labels = _format_labels(self.labelnames, key, 'le="%s"' % bound)
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.labelnames, key, 'le="+Inf"')
+                lines.append(f"{self.name}_bucket{labels} {state[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {state[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(name, lambda: Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(name, lambda: Histogram(name, documentation, labelnames, buckets))
+
+    def _get_or_create(self, name, factory):
+        # Modules may be imported by several services in one process; reuse the same metric.
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = factory()
+            return self._metrics[name]
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        lines.extend(_process_lines())
+        return "\n".join(lines) + "\n"
+
+
+def _process_lines() -> List[str]:
+    try:
+        with open("/proc/self/statm", encoding="ascii") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # ru_maxrss is the peak, in KiB on Linux; good enough where /proc is missing
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    return [
+        "# HELP process_resident_memory_bytes Resident memory size in bytes.",
+        "# TYPE process_resident_memory_bytes gauge",
+        f"process_resident_memory_bytes {rss}",
+    ]
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    "mindful_stage_duration_seconds", "Time spent in one pipeline stage.", ("stage",)
+)
+HTTP_SECONDS = REGISTRY.histogram(
+    "mindful_http_request_duration_seconds", "HTTP handler latency until the response starts.", ("service", "method", "route", "status")
+)
+HTTP_REQUESTS = REGISTRY.counter(
+    "mindful_http_requests_total", "HTTP requests handled.", ("service", "method", "route", "status")
+)
+
+
+@dataclass
+class Trace:
+    trace_id: str
+    spans: List[Dict] = field(default_factory=list)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def add(self, stage: str, ms: float) -> None:
+        with self._lock:
+            self.spans.append({"stage": stage, "ms": ms, "traceId": self.trace_id})
+
+
+T = TypeVar("T")
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("mindful_trace", default=None)
+
+
+@contextmanager
+def trace(trace_id: str) -> Iterator[Trace]:
+    """
+    Collect spans for one request; tasks and to_thread workers started inside inherit it.
+    """
+    current = Trace(trace_id)
+    token = _current_trace.set(current)
+    try:
+        yield current
+    finally:
+        _current_trace.reset(token)
+
+
+def traced(current: Trace, events: Iterator[T]) -> Iterator[T]:
+    """
+    Step a generator with `current` as the active trace. Set on every next(): generators stepped
+    from the threadpool run each step in a fresh copy of the caller's context.
+    """
+    try:
+        while True:
+            token = _current_trace.set(current)
+            try:
+                event = next(events)
+            except StopIteration:
+                return
+            finally:
+                _current_trace.reset(token)
+            yield event
+    finally:
+        events.close()
+
+
+def current_spans() -> List[Dict]:
+    current = _current_trace.get()
+    return list(current.spans) if current is not None else []
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        current = _current_trace.get()
+        if current is not None:
+            current.add(stage, round(elapsed * 1000, 2))
+
+
+def instrument_app(app, service: str) -> None:
+    """
+    Add per-route HTTP latency/count metrics and a Prometheus text `/metrics` endpoint.
+    """
+    from fastapi.responses import PlainTextResponse
+
+    @app.middleware("http")
+    async def _record_http(request, call_next):
+        started = time.perf_counter()
+        status = "500"
+        try:
+            response = await call_next(request)
+            status = str(response.status_code)
+            return response
+        finally:
+            route = request.scope.get("route")
+            labels = {
+                "service": service,
+                "method": request.method,
+                # route template, not the raw path, to keep label cardinality bounded
+                "route": getattr(route, "path", "unmatched"),
+                "status": status,
+            }
+            HTTP_SECONDS.observe(time.perf_counter() - started, **labels)
+            HTTP_REQUESTS.inc(**labels)
+
+    @app.get("/metrics", include_in_schema=False)
+    def metrics():
+        return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,106 @@
+"""
+Circuit breakers and retry backoff for calls to other services.
+
+A breaker opens after `failure_threshold` consecutive failures and rejects calls
+immediately for `reset_timeout` seconds; then it lets a single probe through
+(half-open) and closes again if the probe succeeds.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from typing import Dict, Iterator
+
+from Common.Metrics import REGISTRY
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+BREAKER_TRANSITIONS = REGISTRY.counter(
+    "mindful_circuit_transitions_total", "Circuit breaker state changes.", ("breaker", "state")
+)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+
+class CircuitBreaker:
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state_locked(time.monotonic())
+
+    def allow(self) -> bool:
+        """
+        Whether a call may go through now; in half-open only one probe is admitted at a time.
+        """
+        with self._lock:
+            state = self._current_state_locked(time.monotonic())
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def check(self) -> None:
+        if not self.allow():
+            raise CircuitOpenError(f"circuit '{self.name}' is open")
+
+    def record_success(self) -> None:
+        with self._lock:
+            self._failures = 0
+            self._probe_in_flight = False
+            self._transition_locked(CLOSED)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            self._probe_in_flight = False
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._opened_at = time.monotonic()
+                self._transition_locked(OPEN)
+
+    def release(self) -> None:
+        """
+        Give back an admitted call that ended without an outcome (e.g. a cancelled hedge).
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+    def stats(self) -> Dict:
+        return {"state": self.state, "failures": self._failures, "rejected": self.rejected}
+
+    def _current_state_locked(self, now: float) -> str:
+        if self._state == OPEN and now - self._opened_at >= self.reset_timeout:
+            self._transition_locked(HALF_OPEN)
+        return self._state
+
+    def _transition_locked(self, state: str) -> None:
+        if state != self._state:
+            self._state = state
+            BREAKER_TRANSITIONS.inc(breaker=self.name, state=state)
+
+
+def backoff_delays(retries: int, base_ms: float = 100.0, cap_ms: float = 2000.0) -> Iterator[float]:
+    """
+    Seconds to sleep before each retry: exponential with full jitter.
+    """
+    for attempt in range(retries):
+        yield random.uniform(0, min(cap_ms, base_ms * (2**attempt))) / 1000.0
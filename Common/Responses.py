@@ -0,0 +1,47 @@
+"""
+orjson-backed JSON responses for the hot endpoints.
+
+With a response_model, FastAPI validates the returned value again, walks it through
+jsonable_encoder and then encodes it with the stdlib json module; for a model the service
+has just built from validated parts that is all overhead. model_response() dumps the
+model once with .dict() and encodes with orjson; because it returns a Response, FastAPI
+skips its own serialization (the response_model still documents the schema).
+
+orjson is optional: without it the stdlib encoder produces the same JSON, only slower.
+"""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Drop-in JSONResponse (also usable as default_response_class) encoded with orjson.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(content, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def model_response(model: BaseModel, status_code: int = 200, **dict_options) -> FastJSONResponse:
+    """
+    Serialize an already-valid model (e.g. from Model.construct(**values)) without re-validation;
+    keys use aliases like FastAPI's default, dict_options go to .dict() (exclude_none, include, ...).
+    """
+    return FastJSONResponse(model.dict(by_alias=True, **dict_options), status_code=status_code)
+
+
+def encoder_name() -> str:
+    return "orjson" if orjson is not None else "json"
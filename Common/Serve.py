@@ -0,0 +1,251 @@
+"""
+Preload-then-fork launcher for multi-worker production deployments.
+
+    python -m Common.Serve EmotionService.App:app --port 8001 --workers 4
+
+The parent process imports the app, loads the model weights once, freezes the
+GC so those objects are never written to again, binds the listening socket and
+then forks the workers. Every worker serves uvicorn on the inherited socket and
+shares the weights copy-on-write, so memory grows with request state, not with
+the number of workers. Each worker also gets its own slice of the CPU for
+torch / OpenMP threads, so N workers do not oversubscribe the cores.
+
+The parent supervises the workers, restarts crashed ones, forwards
+SIGTERM/SIGINT for a graceful shutdown and passes SIGHUP (config reload) on to
+every worker.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import importlib
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+from typing import Callable, Dict, List, Optional
+
+from Common.LogSink import close_all as close_logs, set_worker as set_log_worker
+
+# Workers default to one per core; each worker then gets cores // workers torch threads.
+SERVE_WORKERS = int(os.environ.get("SERVE_WORKERS", "0"))
+SERVE_THREADS_PER_WORKER = int(os.environ.get("SERVE_THREADS_PER_WORKER", "0"))
+SERVE_INTEROP_THREADS = int(os.environ.get("SERVE_INTEROP_THREADS", "1"))
+SERVE_BACKLOG = int(os.environ.get("SERVE_BACKLOG", "2048"))
+# Crash-looping workers are restarted after RESPAWN_DELAY_SECONDS, doubling per consecutive early
+# exit up to RESPAWN_MAX_DELAY_SECONDS; a worker that exits early SERVE_MAX_EARLY_EXITS times in a
+# row (e.g. a broken config or a port it cannot serve) is given up on instead of looping forever
+RESPAWN_DELAY_SECONDS = 1.0
+RESPAWN_MAX_DELAY_SECONDS = 30.0
+SERVE_EARLY_EXIT_SECONDS = float(os.environ.get("SERVE_EARLY_EXIT_SECONDS", "10"))
+SERVE_MAX_EARLY_EXITS = int(os.environ.get("SERVE_MAX_EARLY_EXITS", "5"))
+
+
+def _preload_emotion() -> None:
+    from EmotionService.Core import EMOTION_BACKEND, get_backend
+
+    # ONNX Runtime sessions own thread pools that do not survive fork(); those load in each worker
+    if EMOTION_BACKEND in {"torch", "embedding"}:
+        get_backend()
+
+
+def _preload_llm() -> None:
+    from LlmGateway.Core import warm_providers
+
+    warm_providers()
+
+
+def _preload_orchestrator() -> None:
+    from Orchestrator.Transport import InProcessTransport, get_transport
+
+    # the http transport only holds sockets, which must be opened after fork
+    transport = get_transport()
+    if isinstance(transport, InProcessTransport):
+        _preload_emotion()
+        _preload_llm()
+
+
+# What to load in the parent for each known app module
+PRELOAD_HOOKS: Dict[str, Callable[[], None]] = {
+    "EmotionService.App": _preload_emotion,
+    "LlmGateway.App": _preload_llm,
+    "Orchestrator.App": _preload_orchestrator,
+}
+
+
+def threads_per_worker(workers: int) -> int:
+    if SERVE_THREADS_PER_WORKER > 0:
+        return SERVE_THREADS_PER_WORKER
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+def _limit_thread_env(threads: int) -> None:
+    # read by OpenMP / MKL / ORT when they initialise, so this has to happen before any import of torch
+    for name in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        os.environ.setdefault(name, str(threads))
+    os.environ.setdefault("EMOTION_ORT_THREADS", str(threads))
+    os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+
+
+def _set_torch_threads(intra: int, interop: Optional[int], import_torch: bool = False) -> None:
+    torch = sys.modules.get("torch")
+    if torch is None and import_torch:
+        try:
+            import torch
+        except ImportError:
+            return
+    if torch is None:
+        return
+    torch.set_num_threads(intra)
+    if interop:
+        try:
+            torch.set_num_interop_threads(interop)
+        except RuntimeError:
+            # only settable once, before the first inter-op parallel call
+            pass
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(SERVE_BACKLOG)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _load_app(target: str):
+    module_name, _, attr = target.partition(":")
+    module = importlib.import_module(module_name)
+    return module_name, getattr(module, attr or "app")
+
+
+class Supervisor:
+    def __init__(self, app, sock: socket.socket, workers: int, threads: int, log_level: str):
+        self.app = app
+        self.sock = sock
+        self.workers = workers
+        self.threads = threads
+        self.log_level = log_level
+        self.children: Dict[int, int] = {}  # pid -> worker index
+        self.started: Dict[int, float] = {}  # pid -> monotonic spawn time
+        self.early_exits: Dict[int, int] = {}  # worker index -> consecutive early exits
+        self.stopping = False
+
+    def spawn(self, index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            self._worker(index)
+        self.children[pid] = index
+        self.started[pid] = time.monotonic()
+
+    def _worker(self, index: int) -> None:
+        import uvicorn
+
+        code = 0
+        try:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            # apps that support reloading install their own SIGHUP handler; the rest ignore it
+            signal.signal(signal.SIGHUP, signal.SIG_IGN)
+            # one log file per worker: rotation in one process must not pull the file from under another
+            set_log_worker(index)
+            gc.enable()
+            _set_torch_threads(self.threads, None)
+            config = uvicorn.Config(self.app, log_level=self.log_level, lifespan="on")
+            server = uvicorn.Server(config)
+            server.run(sockets=[self.sock])
+        except BaseException:
+            # the parent only sees the exit status; keep the reason in the worker's stderr
+            traceback.print_exc()
+            code = 1
+        finally:
+            # os._exit skips atexit, so flush queued log records first
+            close_logs()
+            # never fall back into the parent's supervision loop
+            os._exit(code)
+
+    def stop(self, signum: int, frame) -> None:
+        self.stopping = True
+        self.forward(signum, frame)
+
+    def forward(self, signum: int, _frame) -> None:
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def run(self) -> int:
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGHUP, self.forward)
+        for index in range(self.workers):
+            self.spawn(index)
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            except InterruptedError:
+                continue
+            index = self.children.pop(pid, None)
+            lived = time.monotonic() - self.started.pop(pid, 0.0)
+            if index is None or self.stopping:
+                continue
+            early = self.early_exits.get(index, 0) + 1 if lived < SERVE_EARLY_EXIT_SECONDS else 0
+            self.early_exits[index] = early
+            if early >= SERVE_MAX_EARLY_EXITS:
+                print(
+                    f"[serve] worker {index} (pid {pid}) exited with status {status}, "
+                    f"{early} times in a row within {SERVE_EARLY_EXIT_SECONDS:g}s of starting; giving up on it",
+                    file=sys.stderr,
+                )
+                continue
+            delay = min(RESPAWN_MAX_DELAY_SECONDS, RESPAWN_DELAY_SECONDS * 2 ** max(0, early - 1))
+            print(f"[serve] worker {index} (pid {pid}) exited with status {status}; restarting in {delay:g}s", file=sys.stderr)
+            time.sleep(delay)
+            self.spawn(index)
+        # every worker was given up on: fail so the process manager sees it
+        return 0 if self.stopping else 1
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("app", help="module:attribute, e.g. EmotionService.App:app")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS or (os.cpu_count() or 1))
+    parser.add_argument("--threads", type=int, default=0, help="torch/OpenMP threads per worker (default: cores // workers)")
+    parser.add_argument("--no-preload", action="store_true", help="let every worker load its own models")
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args(argv)
+
+    workers = max(1, args.workers)
+    threads = args.threads or threads_per_worker(workers)
+    _limit_thread_env(threads)
+
+    # No collections while loading: nothing is garbage yet, and the heap stays compact for sharing
+    gc.disable()
+    module_name, app = _load_app(args.app)
+    hook = PRELOAD_HOOKS.get(module_name)
+    if hook is not None and not args.no_preload:
+        started = time.perf_counter()
+        # keep the parent single-threaded: thread pools started here would not exist in the children
+        _set_torch_threads(1, SERVE_INTEROP_THREADS, import_torch=True)
+        hook()
+        print(f"[serve] preloaded {module_name} in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    # Move everything loaded so far into the permanent generation: later collections in the
+    # workers never touch (and therefore never copy) the pages holding the model objects.
+    gc.freeze()
+
+    sock = _bind(args.host, args.port)
+    print(f"[serve] {args.app} on {args.host}:{args.port} with {workers} workers x {threads} threads", file=sys.stderr)
+    return Supervisor(app, sock, workers, threads, args.log_level).run()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,177 @@
+"""
+Token accounting with the tokenizer of the model that will read the text.
+
+get_counter(model) returns one cached TokenCounter per model id, resolved once:
+- tiktoken's encoding for OpenAI model names, when tiktoken is installed,
+- the Hugging Face tokenizer for a local checkpoint or an already-downloaded hub id
+  (never downloads on the request path),
+- otherwise an estimator: one token per CJK character or punctuation mark and about
+  one per four characters of other words; it tends to over-count, so budgets stay safe.
+Counters report `exact`, and usage() marks estimated counts, so callers can tell.
+"""
+
+from __future__ import annotations
+
+import re
+import threading
+from typing import Callable, Dict, List, Optional
+
+# Hiragana/katakana, CJK ideographs and Hangul: roughly a token per character in BPE vocabularies
+_CJK_CHARS = "぀-ヿ㐀-䶿一-鿿가-힯"
+_PIECE = re.compile(rf"[{_CJK_CHARS}]|[^\W{_CJK_CHARS}]+|[^\w\s]")
+ELLIPSIS = " … "
+
+
+class TokenCounter:
+    """
+    The estimator; subclasses count with a real tokenizer.
+    """
+
+    name = "estimate"
+    exact = False
+
+    @staticmethod
+    def _cost(piece: str) -> int:
+        # pieces are single CJK/punctuation characters or runs of other word characters
+        return max(1, (len(piece) + 1) // 4)
+
+    def count(self, text: str) -> int:
+        return sum(self._cost(m.group()) for m in _PIECE.finditer(text))
+
+    def head(self, text: str, tokens: int) -> str:
+        """
+        The longest prefix of text that fits in `tokens`.
+        """
+        used, end = 0, 0
+        for match in _PIECE.finditer(text):
+            used += self._cost(match.group())
+            if used > tokens:
+                break
+            end = match.end()
+        return text[:end]
+
+    def tail(self, text: str, tokens: int) -> str:
+        """
+        The longest suffix of text that fits in `tokens`.
+        """
+        used, start = 0, len(text)
+        for match in reversed(list(_PIECE.finditer(text))):
+            used += self._cost(match.group())
+            if used > tokens:
+                break
+            start = match.start()
+        return text[start:]
+
+
+class EncodingCounter(TokenCounter):
+    """
+    Exact counts from a tokenizer's encode/decode.
+    """
+
+    exact = True
+
+    def __init__(self, name: str, encode: Callable[[str], List[int]], decode: Callable[[List[int]], str]):
+        self.name = name
+        self._encode = encode
+        self._decode = decode
+
+    def count(self, text: str) -> int:
+        return len(self._encode(text))
+
+    def head(self, text: str, tokens: int) -> str:
+        ids = self._encode(text)
+        return text if len(ids) <= tokens else self._decode(ids[: max(0, tokens)])
+
+    def tail(self, text: str, tokens: int) -> str:
+        ids = self._encode(text)
+        if len(ids) <= tokens:
+            return text
+        return self._decode(ids[len(ids) - tokens :]) if tokens > 0 else ""
+
+
+def from_hf_tokenizer(name: str, tokenizer) -> EncodingCounter:
+    return EncodingCounter(
+        name,
+        lambda text: tokenizer.encode(text, add_special_tokens=False),
+        lambda ids: tokenizer.decode(ids, skip_special_tokens=True),
+    )
+
+
+ESTIMATOR = TokenCounter()
+_counters: Dict[str, TokenCounter] = {}
+_lock = threading.Lock()
+
+
+def _load(model: str) -> TokenCounter:
+    try:
+        import tiktoken
+
+        encoding = tiktoken.encoding_for_model(model)
+        return EncodingCounter(f"tiktoken:{encoding.name}", lambda text: encoding.encode(text, disallowed_special=()), encoding.decode)
+    except (ImportError, KeyError):
+        pass
+    try:
+        from transformers import AutoTokenizer
+
+        return from_hf_tokenizer(model, AutoTokenizer.from_pretrained(model, local_files_only=True))
+    except (ImportError, OSError, ValueError):
+        pass
+    return ESTIMATOR
+
+
+def get_counter(model: Optional[str] = None) -> TokenCounter:
+    """
+    Cached counter for `model`; None, "" or "estimate" give the estimator.
+    """
+    if not model or model == "estimate":
+        return ESTIMATOR
+    counter = _counters.get(model)
+    if counter is None:
+        with _lock:
+            counter = _counters.get(model)
+            if counter is None:
+                counter = _counters[model] = _load(model)
+    return counter
+
+
+def register(model: str, tokenizer) -> TokenCounter:
+    """
+    Reuse a tokenizer a provider already loaded instead of loading a second copy.
+    """
+    with _lock:
+        counter = _counters[model] = from_hf_tokenizer(model, tokenizer)
+    return counter
+
+
+def estimate_tokens(text: str) -> int:
+    return ESTIMATOR.count(text)
+
+
+def trim(text: str, tokens: int, counter: TokenCounter = ESTIMATOR, keep: str = "both") -> str:
+    """
+    text cut to at most `tokens`: keep="start" keeps the beginning, "end" the end, "both" a
+    quarter from the beginning and the rest from the end around an ellipsis.
+    """
+    if tokens <= 0:
+        return ""
+    if counter.count(text) <= tokens:
+        return text
+    if keep == "start":
+        return counter.head(text, tokens).rstrip()
+    if keep == "end":
+        return counter.tail(text, tokens).lstrip()
+    room = tokens - counter.count(ELLIPSIS)
+    if room < 2:
+        return counter.tail(text, tokens).lstrip()
+    return counter.head(text, room // 4).rstrip() + ELLIPSIS + counter.tail(text, room - room // 4).lstrip()
+
+
+def usage(counter: TokenCounter, prompt: str, completion: str, **extra) -> Dict:
+    """
+    An OpenAI-style usage dict; estimated counts are flagged.
+    """
+    prompt_tokens, completion_tokens = counter.count(prompt), counter.count(completion)
+    result = {**extra, "prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+    if not counter.exact:
+        result["estimated"] = True
+    return result
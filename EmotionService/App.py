@@ -1,22 +1,106 @@
+import asyncio
+import json
+import os
+from typing import Iterator
+
 from fastapi import FastAPI
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from Common.Admission import admit, admit_stream, install_admission
+from Common.Health import readiness_response
+from Common.Metrics import instrument_app
+from Common.Responses import FastJSONResponse, model_response
+
+from .Batching import get_batcher
+from .Core import classify_batch, iter_analyze_texts, model_state, preload, result_cache
+from .Models import CacheInvalidateRequest, EmotionBatchItem, EmotionBatchRequest, EmotionRequest, EmotionResponse
+
+app = FastAPI(title="EmotionService", version="0.1.0", default_response_class=FastJSONResponse)
+instrument_app(app, "emotion")
+install_admission(app)
+
+_batcher = get_batcher()
+# Load the classifier in the background at startup; /health answers immediately, /health/ready flips once loaded
+PRELOAD = os.environ.get("EMOTION_PRELOAD", "1").lower() not in {"0", "false", "no"}
+
+
+@app.on_event("startup")
+def start_preload():
+    if PRELOAD:
+        preload()
+
 
-from .Core import analyze_text
-from .Models import EmotionRequest, EmotionResponse
+@app.post("/analyze", response_model=EmotionResponse, response_model_exclude_none=True)
+async def analyze(request: EmotionRequest) -> FastJSONResponse:
+    # the cache keeps no segment offsets, so a segments request is always computed
+    cached = None
+    if result_cache is not None and not request.segments:
+        if result_cache.on_disk:
+            cached = await run_in_threadpool(result_cache.get, request.text)
+        else:
+            cached = result_cache.get(request.text)
+    if cached is not None:
+        return model_response(EmotionResponse.construct(emotion=cached), exclude_none=True)
+    # cache hits above never queue; only model work is admission-controlled
+    async with admit("analyze"):
+        if _batcher is None:
+            result = (await run_in_threadpool(classify_batch, [request.text], False))[0]
+        else:
+            # concurrent requests share one forward pass; awaiting keeps threadpool slots free
+            result = await asyncio.wrap_future(_batcher.submit(request.text))
+    if not request.segments and result.segments:
+        result = result.copy(update={"segments": None})
+    # results come out of the classifier as validated models; skip FastAPI's second pass
+    return model_response(EmotionResponse.construct(emotion=result), exclude_none=True)
 
-app = FastAPI(title="EmotionService", version="0.1.0")
 
+def _ndjson(request: EmotionBatchRequest) -> Iterator[str]:
+    try:
+        for index, result in iter_analyze_texts(request.texts, request.batch_size, lookup=not request.segments):
+            if not request.segments:
+                result = result.copy(update={"segments": None})
+            yield EmotionBatchItem(index=index, emotion=result).json(ensure_ascii=False, exclude_none=True) + "\n"
+    except Exception as exc:
+        # the status line is already sent; report the failure in-band and stop
+        yield json.dumps({"error": str(exc)}) + "\n"
 
-@app.post("/analyze", response_model=EmotionResponse)
-def analyze(request: EmotionRequest) -> EmotionResponse:
-    result = analyze_text(request.text)
-    return EmotionResponse(emotion=result)
+
+@app.post("/analyze/batch")
+async def analyze_batch(request: EmotionBatchRequest) -> StreamingResponse:
+    # one JSON object per line, written as each tensor batch finishes (length-sorted, so use "index");
+    # the whole batch holds one "analyze" slot, so bulk jobs queue behind interactive overload
+    lines = await admit_stream("analyze", iterate_in_threadpool(_ndjson(request)))
+    # returns the slot even when the client left before the first line was pulled
+    return StreamingResponse(lines, media_type="application/x-ndjson", background=BackgroundTask(lines.aclose))
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    if result_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **result_cache.stats()}
+
+
+@app.post("/cache/invalidate")
+def cache_invalidate(request: CacheInvalidateRequest):
+    # omit text to flush everything (memory and disk tier)
+    removed = result_cache.invalidate(request.text) if result_cache is not None else 0
+    return {"removed": removed}
 
 
 @app.get("/health")
 def health():
+    # liveness only: never waits for the model
     return {"status": "ok"}
 
 
+@app.get("/health/ready")
+def health_ready():
+    return readiness_response({"classifier": model_state()})
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from Common.Metrics import span
+
+# Comma-separated ORT execution providers, in priority order
+ORT_PROVIDERS = [p.strip() for p in os.environ.get("EMOTION_ORT_PROVIDERS", "CPUExecutionProvider").split(",") if p.strip()]
+# 0 lets ORT pick (one thread per physical core)
+ORT_THREADS = int(os.environ.get("EMOTION_ORT_THREADS", "0"))
+
+# Artifacts written by `download_models.py --export-onnx [--quantize]`, relative to the model dir
+ONNX_SUBDIR = "onnx"
+ONNX_FILES: Dict[str, str] = {"onnx": "model.onnx", "onnx-int8": "model.int8.onnx"}
+
+
+def entailment_ids(label2id: Dict[str, int]) -> Tuple[int, int]:
+    """
+    Resolve (contradiction, entailment) logit columns the same way the HF pipeline does.
+    """
+    entailment_id = -1
+    for label, idx in label2id.items():
+        if label.lower().startswith("entail"):
+            entailment_id = idx
+            break
+    contradiction_id = -1 if entailment_id == 0 else 0
+    return contradiction_id, entailment_id
+
+
+class NliBackend:
+    """
+    Scores (premise, hypothesis) pairs with an NLI model.
+
+    Subclasses only provide _logits(); tokenization and the [contradiction, entailment]
+    softmax are shared so every backend produces comparable probabilities.
+    """
+
+    name = "base"
+    tensor_type = "np"
+
+    def __init__(self, model_dir: Path):
+        # transformers is imported here, not at module level, so importing Core stays cheap
+        from transformers import AutoConfig, AutoTokenizer
+
+        self.model_dir = Path(model_dir)
+        self.tokenizer = AutoTokenizer.from_pretrained(str(self.model_dir), local_files_only=True)
+        config = AutoConfig.from_pretrained(str(self.model_dir), local_files_only=True)
+        self.contradiction_id, self.entailment_id = entailment_ids(config.label2id)
+
+    def entailment_probs(self, premises: List[str], hypotheses: List[str]) -> List[float]:
+        # truncation="only_first" clips the user text, never the hypothesis
+        with span("emotion.tokenize"):
+            inputs = self.tokenizer(
+                premises, hypotheses, padding=True, truncation="only_first", return_tensors=self.tensor_type
+            )
+        with span("emotion.forward"):
+            logits = self._logits(inputs)
+        pair = logits[:, [self.contradiction_id, self.entailment_id]].astype(np.float64)
+        pair -= pair.max(axis=-1, keepdims=True)
+        exp = np.exp(pair)
+        return (exp[:, 1] / exp.sum(axis=-1)).tolist()
+
+    def _logits(self, inputs) -> np.ndarray:
+        raise NotImplementedError
+
+
+class TorchBackend(NliBackend):
+    """
+    Full-precision PyTorch model (the original behaviour).
+    """
+
+    name = "torch"
+    tensor_type = "pt"
+
+    def __init__(self, model_dir: Path):
+        import torch
+        from transformers import AutoModelForSequenceClassification
+
+        super().__init__(model_dir)
+        self._torch = torch
+        self.model = AutoModelForSequenceClassification.from_pretrained(str(self.model_dir), local_files_only=True)
+        self.model.eval()
+
+    def _logits(self, inputs) -> np.ndarray:
+        with self._torch.inference_mode():
+            return self.model(**inputs).logits.float().numpy()
+
+
+class OnnxBackend(NliBackend):
+    """
+    Exported ONNX graph executed by ONNX Runtime; also serves the dynamic int8 variant.
+    """
+
+    tensor_type = "np"
+
+    def __init__(self, model_dir: Path, variant: str = "onnx"):
+        try:
+            import onnxruntime as ort
+        except ImportError as exc:  # pragma: no cover - optional dependency
+            raise RuntimeError(
+                f"EMOTION_BACKEND={variant} requires onnxruntime (`pip install onnxruntime`)."
+            ) from exc
+
+        super().__init__(model_dir)
+        self.name = variant
+        model_path = self.model_dir / ONNX_SUBDIR / ONNX_FILES[variant]
+        if not model_path.exists():
+            flags = "--export-onnx --quantize" if variant == "onnx-int8" else "--export-onnx"
+            raise RuntimeError(f"ONNX model not found at {model_path}. Run `python download_models.py {flags}`.")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if ORT_THREADS > 0:
+            options.intra_op_num_threads = ORT_THREADS
+        available = set(ort.get_available_providers())
+        providers = [p for p in ORT_PROVIDERS if p in available] or ["CPUExecutionProvider"]
+        self.session = ort.InferenceSession(str(model_path), sess_options=options, providers=providers)
+        self._input_names = [i.name for i in self.session.get_inputs()]
+
+    def _logits(self, inputs) -> np.ndarray:
+        feed = {name: inputs[name].astype(np.int64) for name in self._input_names if name in inputs}
+        return self.session.run(None, feed)[0]
+
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+def load_backend(name: str, model_dir: Path) -> NliBackend:
+    name = name.lower()
+    if name == "torch":
+        return TorchBackend(model_dir)
+    if name in ONNX_FILES:
+        return OnnxBackend(model_dir, variant=name)
+    raise ValueError(f"Unknown EMOTION_BACKEND '{name}'. Choose one of: {', '.join(BACKENDS)}")
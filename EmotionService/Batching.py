@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, List, Optional, Tuple
+
+from EmotionService.Models import EmotionResult
+
+BatchFn = Callable[[List[str]], List[EmotionResult]]
+
+# Collect up to N texts or wait at most M milliseconds, whichever comes first.
+BATCH_ENABLED = os.environ.get("EMOTION_BATCH_ENABLED", "1").lower() not in {"0", "false", "no"}
+BATCH_MAX_SIZE = int(os.environ.get("EMOTION_BATCH_MAX_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.environ.get("EMOTION_BATCH_MAX_WAIT_MS", "10"))
+
+
+class MicroBatcher:
+    """
+    Coalesce concurrent classification requests into one forward pass.
+
+    Callers get a Future per text; a single worker thread drains the queue,
+    runs the batch function once and resolves each Future with its own result.
+    """
+
+    def __init__(self, batch_fn: BatchFn, max_batch_size: int = BATCH_MAX_SIZE, max_wait_ms: float = BATCH_MAX_WAIT_MS):
+        self._batch_fn = batch_fn
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self._queue: "queue.Queue[Tuple[str, Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, text: str) -> Future:
+        future: Future = Future()
+        self._ensure_worker()
+        self._queue.put((text, future))
+        return future
+
+    def _ensure_worker(self) -> None:
+        if self._worker is not None:
+            return
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run, name="emotion-batcher", daemon=True)
+                self._worker.start()
+
+    def _collect(self) -> List[Tuple[str, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = [(text, fut) for text, fut in self._collect() if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            try:
+                results = self._batch_fn([text for text, _ in batch])
+            except Exception as exc:
+                for _, fut in batch:
+                    fut.set_exception(exc)
+                continue
+            for (_, fut), result in zip(batch, results):
+                fut.set_result(result)
+
+
+_batcher: Optional[MicroBatcher] = None
+
+
+def get_batcher() -> Optional[MicroBatcher]:
+    """
+    Process-wide batcher in front of Core.classify_batch; None when batching is disabled.
+    """
+    global _batcher
+    if not BATCH_ENABLED:
+        return None
+    if _batcher is None:
+        from EmotionService.Core import classify_batch
+
+        # /analyze checks the result cache before queueing, so the batch skips the lookup
+        _batcher = MicroBatcher(lambda texts: classify_batch(texts, lookup=False))
+    return _batcher
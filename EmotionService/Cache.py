@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import unicodedata
+from typing import Dict, List, Optional
+
+from Common.Cache import TtlLruCache
+from EmotionService.Models import EmotionResult
+
+CACHE_ENABLED = os.environ.get("EMOTION_CACHE_ENABLED", "1").lower() not in {"0", "false", "no"}
+CACHE_MAX_ENTRIES = int(os.environ.get("EMOTION_CACHE_MAX_ENTRIES", "10000"))
+CACHE_TTL = float(os.environ.get("EMOTION_CACHE_TTL", "3600"))
+# Optional SQLite file so cached results survive restarts (memory-only when unset)
+CACHE_DB = os.environ.get("EMOTION_CACHE_DB")
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """
+    Fold away differences that do not change meaning: Unicode width/compat forms, case, whitespace.
+    """
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text)).strip().casefold()
+
+
+class EmotionCache:
+    """
+    Classification results keyed by hash(model id, label set, normalized text).
+    """
+
+    def __init__(self, model_id: str, labels: List[str], store: TtlLruCache):
+        self.model_id = model_id
+        self.labels = list(labels)
+        self.store = store
+
+    @property
+    def on_disk(self) -> bool:
+        # lookups may hit SQLite; async callers should not run them on the event loop
+        return self.store.db_path is not None
+
+    def key(self, text: str) -> str:
+        raw = "\x1f".join([self.model_id, ",".join(self.labels), normalize_text(text)])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, text: str) -> Optional[EmotionResult]:
+        cached = self.store.get(self.key(text))
+        return EmotionResult(**cached) if cached is not None else None
+
+    def put(self, text: str, result: EmotionResult) -> None:
+        # segment offsets belong to one spelling of the text, not to its normalized key
+        self.store.set(self.key(text), result.dict(exclude={"segments"}))
+
+    def invalidate(self, text: Optional[str] = None) -> int:
+        return self.store.invalidate(self.key(text) if text is not None else None)
+
+    def stats(self) -> Dict:
+        return {"model": self.model_id, **self.store.stats()}
+
+
+def build_cache(model_id: str, labels: List[str]) -> Optional[EmotionCache]:
+    if not CACHE_ENABLED:
+        return None
+    store = TtlLruCache(max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL, db_path=CACHE_DB, namespace="emotion")
+    return EmotionCache(model_id, labels, store)
@@ -0,0 +1,106 @@
+"""
+Sentence-aligned windows for long inputs.
+
+A journal-style paste used to be cut at the model's max length, so only its opening
+counted. Texts longer than EMOTION_CHUNK_CHARS are split on sentence boundaries into
+windows of at most that many characters (before any tokenization), classified in one
+batch and their per-label scores aggregated. At most EMOTION_CHUNK_MAX_WINDOWS windows
+are scored per text; beyond that, evenly spaced windows are kept (always including
+the last one), so cost stays bounded however long the paste is.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from typing import Dict, List, NamedTuple
+
+CHUNK_ENABLED = os.environ.get("EMOTION_CHUNK_ENABLED", "1").lower() not in {"0", "false", "no"}
+# ~400 characters stays well inside the NLI model's window in English and Chinese alike
+CHUNK_CHARS = int(os.environ.get("EMOTION_CHUNK_CHARS", "400"))
+CHUNK_MAX_WINDOWS = int(os.environ.get("EMOTION_CHUNK_MAX_WINDOWS", "8"))
+# max | mean | recency
+CHUNK_AGGREGATE = os.environ.get("EMOTION_CHUNK_AGGREGATE", "max").lower()
+# recency: each earlier window weighs this much of the one after it
+CHUNK_RECENCY_DECAY = float(os.environ.get("EMOTION_CHUNK_RECENCY_DECAY", "0.7"))
+AGGREGATES = ("max", "mean", "recency")
+
+# A sentence ends at terminal punctuation (Latin or CJK, plus closing quotes) or a line break
+_SENTENCE = re.compile(r"[^.!?。！？…\n]*(?:[.!?。！？…]+[\"'”’）)]*|\n+|$)")
+
+
+class Segment(NamedTuple):
+    start: int
+    end: int
+    text: str
+
+
+def _sentences(text: str) -> List[Segment]:
+    spans = []
+    for match in _SENTENCE.finditer(text):
+        if match.group().strip():
+            spans.append(Segment(match.start(), match.end(), match.group()))
+    return spans
+
+
+def _stripped(text: str, start: int, end: int) -> Segment:
+    # trim surrounding whitespace and move the offsets with it, so text[start:end] == segment.text
+    chunk = text[start:end]
+    lead = len(chunk) - len(chunk.lstrip())
+    trail = len(chunk) - len(chunk.rstrip())
+    return Segment(start + lead, end - trail, chunk.strip())
+
+
+def split_windows(text: str, window_chars: int = CHUNK_CHARS, max_windows: int = CHUNK_MAX_WINDOWS) -> List[Segment]:
+    """
+    Pack whole sentences into windows of <= window_chars (a longer sentence is cut hard),
+    then keep at most max_windows of them. Offsets index into the original text.
+    """
+    window_chars = max(1, window_chars)
+    if len(text) <= window_chars:
+        return [Segment(0, len(text), text)]
+
+    pieces: List[Segment] = []
+    for sentence in _sentences(text):
+        for start in range(sentence.start, sentence.end, window_chars):
+            end = min(start + window_chars, sentence.end)
+            pieces.append(Segment(start, end, text[start:end]))
+
+    windows: List[Segment] = []
+    start = end = None
+    for piece in pieces:
+        if start is not None and piece.end - start > window_chars:
+            windows.append(_stripped(text, start, end))
+            start = None
+        if start is None:
+            start = piece.start
+        end = piece.end
+    if start is not None:
+        windows.append(_stripped(text, start, end))
+    # a hard cut can leave a window of nothing but whitespace
+    windows = [window for window in windows if window.text]
+
+    if len(windows) > max_windows > 0:
+        if max_windows == 1:
+            return windows[-1:]
+        step = (len(windows) - 1) / (max_windows - 1)
+        windows = [windows[round(i * step)] for i in range(max_windows)]
+    return windows
+
+
+def aggregate(window_scores: List[Dict[str, float]], method: str = CHUNK_AGGREGATE, decay: float = CHUNK_RECENCY_DECAY) -> Dict[str, float]:
+    """
+    Combine per-window label scores, label by label; windows are in text order.
+    """
+    if method not in AGGREGATES:
+        raise ValueError(f"Unknown EMOTION_CHUNK_AGGREGATE '{method}'. Choose one of: {', '.join(AGGREGATES)}")
+    if len(window_scores) == 1:
+        return dict(window_scores[0])
+    labels = list(window_scores[0])
+    if method == "mean":
+        return {label: sum(s[label] for s in window_scores) / len(window_scores) for label in labels}
+    if method == "recency":
+        weights = [decay ** (len(window_scores) - 1 - i) for i in range(len(window_scores))]
+        total = sum(weights)
+        return {label: sum(w * s[label] for w, s in zip(weights, window_scores)) / total for label in labels}
+    return {label: max(s[label] for s in window_scores) for label in labels}
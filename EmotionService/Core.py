@@ -1,33 +1,45 @@
 from __future__ import annotations
 
 import os
+import threading
 from pathlib import Path
-from typing import Dict, List
+from typing import TYPE_CHECKING, Dict, Iterator, List, Optional, Tuple
 
-from huggingface_hub import snapshot_download
-from transformers import pipeline
+from EmotionService.Cache import build_cache
+from EmotionService.Chunking import CHUNK_AGGREGATE, CHUNK_CHARS, CHUNK_ENABLED, CHUNK_MAX_WINDOWS, aggregate, split_windows
+from EmotionService.Models import EmotionResult, EmotionSegment
 
-from EmotionService.Models import EmotionResult
+if TYPE_CHECKING:
+    from EmotionService.Backends import NliBackend
 
 EMOTION_LABELS: List[str] = ["anxious", "angry", "sad", "tired", "neutral"]
 MODEL_ID = "facebook/bart-large-mnli"
+# Inference backend, see Backends.py: torch (default) | onnx | onnx-int8; embedding is the
+# single-encoder fast path (Embedding.py), keyword the offline fixture (Fixtures.py)
+EMOTION_BACKEND = os.environ.get("EMOTION_BACKEND", "torch").lower()
+# Same hypothesis the HF zero-shot pipeline uses by default
+HYPOTHESIS_TEMPLATE = "This example is {}."
+# Texts per forward pass for analyze_texts / /analyze/batch (each text expands to len(EMOTION_LABELS) pairs)
+ANALYZE_BATCH_SIZE = int(os.environ.get("EMOTION_ANALYZE_BATCH_SIZE", "32"))
 # Keep in sync with download_models.py default path
 DEFAULT_MODEL_DIR = Path(__file__).resolve().parent / ".models" / MODEL_ID.split("/")[-1]
 
-def _resolve_model_dir() -> Path:
+def _resolve_model_dir(model_id: str = MODEL_ID, env_var: str = "EMOTION_MODEL_DIR", default_dir: Path = DEFAULT_MODEL_DIR) -> Path:
     """
     Locate a locally cached HF model without hitting the network.
     """
-    configured_dir = Path(os.environ.get("EMOTION_MODEL_DIR", DEFAULT_MODEL_DIR))
+    configured_dir = Path(os.environ.get(env_var, default_dir))
 
     if configured_dir.exists():
         return configured_dir
 
     # If the model was downloaded to the default HF cache, reuse it.
+    from huggingface_hub import snapshot_download
+
     try:
         cached = Path(
             snapshot_download(
-                repo_id=MODEL_ID,
+                repo_id=model_id,
                 local_files_only=True,
             )
         )
@@ -35,17 +47,79 @@ def _resolve_model_dir() -> Path:
     except Exception as exc:  # pragma: no cover - fail fast with hint
         raise RuntimeError(
             f"Model not found at {configured_dir}. "
-            "Run `python download_models.py` (or set EMOTION_MODEL_DIR to a pre-downloaded path)."
+            f"Run `python download_models.py` (or set {env_var} to a pre-downloaded path)."
         ) from exc
 
 
-_MODEL_DIR = _resolve_model_dir()
-_classifier = pipeline(
-    "zero-shot-classification",
-    model=str(_MODEL_DIR),
-    tokenizer=str(_MODEL_DIR),
-    local_files_only=True,
-)
+# Loaded on first use (or by preload()), so importing this module never touches the model:
+# validation, safety blocks and cache hits are served before the weights are in memory.
+_backend: Optional["NliBackend"] = None
+_backend_lock = threading.Lock()
+_load_error: Optional[str] = None
+# None when EMOTION_CACHE_ENABLED=0; quantized scores differ slightly, so keys include the backend,
+# and long texts score differently under another window setup, so they include that too
+_CHUNKING = f"chunk={CHUNK_CHARS}x{CHUNK_MAX_WINDOWS}:{CHUNK_AGGREGATE}" if CHUNK_ENABLED else "truncate"
+result_cache = build_cache(f"{MODEL_ID}:{EMOTION_BACKEND}:{_CHUNKING}", EMOTION_LABELS)
+
+
+def get_backend() -> "NliBackend":
+    """
+    Return the inference backend (torch / onnx / onnx-int8 / embedding / keyword), loading it once.
+    """
+    global _backend, _load_error
+    if _backend is not None:
+        return _backend
+    with _backend_lock:
+        if _backend is None:
+            try:
+                if EMOTION_BACKEND == "keyword":
+                    from EmotionService.Fixtures import KeywordBackend
+
+                    _backend = KeywordBackend()
+                elif EMOTION_BACKEND == "embedding":
+                    from EmotionService.Embedding import DEFAULT_EMBED_MODEL_DIR, EMBED_MODEL_ID, EmbeddingBackend
+
+                    model_dir = _resolve_model_dir(EMBED_MODEL_ID, "EMOTION_EMBED_MODEL_DIR", DEFAULT_EMBED_MODEL_DIR)
+                    _backend = EmbeddingBackend(model_dir, EMOTION_LABELS, HYPOTHESIS_TEMPLATE)
+                else:
+                    from EmotionService.Backends import load_backend
+
+                    _backend = load_backend(EMOTION_BACKEND, _resolve_model_dir())
+                _load_error = None
+            except Exception as exc:
+                _load_error = str(exc)
+                raise
+    return _backend
+
+
+def model_state() -> str:
+    """
+    ready | loading | error | cold, for readiness probes.
+    """
+    if _backend is not None:
+        return "ready"
+    if _backend_lock.locked():
+        return "loading"
+    return "error" if _load_error else "cold"
+
+
+def preload(background: bool = True) -> Optional[threading.Thread]:
+    """
+    Load the classifier ahead of the first request; in a daemon thread unless background=False.
+    """
+    def _load() -> None:
+        try:
+            get_backend()
+        except Exception:
+            # surfaced through model_state() / readiness; requests will retry the load
+            pass
+
+    if not background:
+        _load()
+        return None
+    thread = threading.Thread(target=_load, name="emotion-preload", daemon=True)
+    thread.start()
+    return thread
 
 
 def _scores_to_intensity(max_score: float) -> int:
@@ -62,20 +136,109 @@ def _scores_to_intensity(max_score: float) -> int:
     return 1
 
 
-def analyze_text(text: str) -> EmotionResult:
+def _score_texts(texts: List[str], backend: Optional["NliBackend"] = None) -> List[Dict[str, float]]:
     """
-    Use HF zero-shot classification to map text into predefined emotion labels.
-    """
-    # truncation=True to avoid over-length inputs throwing tokenizer errors
-    result = _classifier(text, candidate_labels=EMOTION_LABELS, multi_label=True, truncation=True)
-    label_scores: Dict[str, float] = {label: 0.0 for label in EMOTION_LABELS}
-
-    for label, score in zip(result["labels"], result["scores"]):
-        if label in label_scores:
-            label_scores[label] = float(score)
+    Score every text against every label in one padded forward pass.
 
+    Mirrors the pipeline's multi_label behaviour: each (text, hypothesis) pair gets an
+    independent softmax over [contradiction, entailment]. Backends with label_probs()
+    (embedding) score each text against all labels in one pass instead.
+    """
+    backend = backend or get_backend()
+    label_probs = getattr(backend, "label_probs", None)
+    if label_probs is not None:
+        return [dict(zip(EMOTION_LABELS, map(float, row))) for row in label_probs(texts)]
+    premises = [text for text in texts for _ in EMOTION_LABELS]
+    hypotheses = [HYPOTHESIS_TEMPLATE.format(label) for _ in texts for label in EMOTION_LABELS]
+    probs = backend.entailment_probs(premises, hypotheses)
+    width = len(EMOTION_LABELS)
+    return [dict(zip(EMOTION_LABELS, map(float, probs[i : i + width]))) for i in range(0, len(probs), width)]
+
+
+def _to_result(label_scores: Dict[str, float]) -> EmotionResult:
     # normalize to top-1 dominant emotion
     dominant = max(label_scores.items(), key=lambda kv: kv[1])
     intensity = _scores_to_intensity(dominant[1])
-
     return EmotionResult(emotion=dominant[0], intensity=intensity, scores=label_scores)
+
+
+def _classify(texts: List[str]) -> List[EmotionResult]:
+    """
+    Score texts; long ones are split into sentence windows (Chunking.py) that share the
+    batch, and their window scores are aggregated and returned as segments.
+    """
+    if not CHUNK_ENABLED:
+        return [_to_result(scores) for scores in _score_texts(texts)]
+    windows = [split_windows(text) for text in texts]
+    flat = [window.text for per_text in windows for window in per_text]
+    step = max(ANALYZE_BATCH_SIZE, CHUNK_MAX_WINDOWS)
+    scores: List[Dict[str, float]] = []
+    for start in range(0, len(flat), step):
+        scores.extend(_score_texts(flat[start : start + step]))
+
+    results: List[EmotionResult] = []
+    position = 0
+    for per_text in windows:
+        window_scores = scores[position : position + len(per_text)]
+        position += len(per_text)
+        result = _to_result(aggregate(window_scores))
+        if len(per_text) > 1:
+            result.segments = [
+                EmotionSegment(start=w.start, end=w.end, emotion=max(s, key=s.get), scores=s)
+                for w, s in zip(per_text, window_scores)
+            ]
+        results.append(result)
+    return results
+
+
+def classify_batch(texts: List[str], lookup: bool = True) -> List[EmotionResult]:
+    """
+    Classify several texts with a single text x label tensor batch; cached texts skip the model.
+    Pass lookup=False when the caller already checked the cache (results are still stored).
+    """
+    if not texts:
+        return []
+    if result_cache is None:
+        return _classify(texts)
+
+    results: List[Optional[EmotionResult]] = [result_cache.get(text) if lookup else None for text in texts]
+    misses = [idx for idx, result in enumerate(results) if result is None]
+    if misses:
+        for idx, result in zip(misses, _classify([texts[i] for i in misses])):
+            results[idx] = result
+            result_cache.put(texts[idx], result)
+    return results
+
+
+def analyze_text(text: str) -> EmotionResult:
+    """
+    Use zero-shot NLI classification to map text into predefined emotion labels.
+    """
+    return classify_batch([text])[0]
+
+
+def iter_analyze_texts(
+    texts: List[str], batch_size: Optional[int] = None, lookup: bool = True
+) -> Iterator[Tuple[int, EmotionResult]]:
+    """
+    Classify many texts, yielding (input index, result) one tensor batch at a time.
+
+    Texts are sorted by length first so each batch pads to similar lengths; results
+    therefore come back out of input order and carry their original index.
+    lookup=False skips the cache, e.g. when segments (never cached) are wanted.
+    """
+    size = max(1, batch_size or ANALYZE_BATCH_SIZE)
+    order = sorted(range(len(texts)), key=lambda idx: len(texts[idx]))
+    for start in range(0, len(order), size):
+        chunk = order[start : start + size]
+        yield from zip(chunk, classify_batch([texts[idx] for idx in chunk], lookup))
+
+
+def analyze_texts(texts: List[str], batch_size: Optional[int] = None) -> List[EmotionResult]:
+    """
+    Classify many texts in length-sorted batches; results are returned in input order.
+    """
+    results: List[Optional[EmotionResult]] = [None] * len(texts)
+    for idx, result in iter_analyze_texts(texts, batch_size):
+        results[idx] = result
+    return results
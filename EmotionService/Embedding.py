@@ -0,0 +1,151 @@
+"""
+Single-encoder fast path: EMOTION_BACKEND=embedding.
+
+The NLI backends run the cross-encoder once per (text, hypothesis) pair, i.e.
+len(EMOTION_LABELS) forward passes per text, re-reading the same hypotheses every
+time. Here a small sentence-embedding model encodes each label's hypotheses once at
+load into a prototype vector, and each request encodes the user text once; a label's
+score is a calibrated sigmoid of the cosine similarity to its prototype.
+
+Calibration (per-label scale/bias) is fitted against the NLI pipeline's probabilities
+by `python -m benchmarks.EmbeddingParity --calibrate`, so scores keep the meaning the
+intensity thresholds assume; it is read from EMOTION_EMBED_CALIBRATION, defaulting to
+calibration.json next to the model.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+from Common.Metrics import span
+
+EMBED_MODEL_ID = os.environ.get("EMOTION_EMBED_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+# Keep in sync with download_models.py --embedding
+DEFAULT_EMBED_MODEL_DIR = Path(__file__).resolve().parent / ".models" / EMBED_MODEL_ID.split("/")[-1]
+EMBED_MAX_LENGTH = int(os.environ.get("EMOTION_EMBED_MAX_LENGTH", "256"))
+CALIBRATION_FILE = "calibration.json"
+# Uncalibrated fallback: similarity 1/3 maps to 0.5
+DEFAULT_SCALE = 12.0
+DEFAULT_BIAS = -4.0
+
+# Extra phrasings averaged into each label's prototype next to the NLI hypothesis,
+# in both languages the product serves; the multilingual encoder maps them together
+LABEL_DESCRIPTIONS: Dict[str, List[str]] = {
+    "anxious": ["I feel anxious, worried and nervous.", "我很焦虑，很担心，很紧张。"],
+    "angry": ["I feel angry, annoyed and frustrated.", "我很生气，很愤怒，很烦躁。"],
+    "sad": ["I feel sad, lonely and down.", "我很难过，很伤心，很失落。"],
+    "tired": ["I feel tired, exhausted and drained.", "我很累，很疲惫，没有力气。"],
+    "neutral": ["Nothing special, just describing an ordinary day.", "没什么特别的，只是平常的一天。"],
+}
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+class Calibration:
+    """
+    Per-label Platt scaling of cosine similarity: p = sigmoid(scale * cos + bias).
+    """
+
+    def __init__(self, labels: Sequence[str], scale: Optional[Sequence[float]] = None, bias: Optional[Sequence[float]] = None):
+        self.labels = list(labels)
+        self.scale = np.asarray(scale if scale is not None else [DEFAULT_SCALE] * len(self.labels), dtype=np.float64)
+        self.bias = np.asarray(bias if bias is not None else [DEFAULT_BIAS] * len(self.labels), dtype=np.float64)
+        self.fitted = scale is not None
+
+    def apply(self, similarities: np.ndarray) -> np.ndarray:
+        return _sigmoid(similarities * self.scale + self.bias)
+
+    @classmethod
+    def load(cls, path: Path, labels: Sequence[str]) -> "Calibration":
+        data = json.loads(Path(path).read_text(encoding="utf-8"))["labels"]
+        missing = [label for label in labels if label not in data]
+        if missing:
+            raise ValueError(f"{path} has no calibration for {', '.join(missing)}")
+        return cls(labels, [data[label]["scale"] for label in labels], [data[label]["bias"] for label in labels])
+
+    def save(self, path: Path, model_id: str) -> None:
+        labels = {label: {"scale": float(s), "bias": float(b)} for label, s, b in zip(self.labels, self.scale, self.bias)}
+        Path(path).write_text(json.dumps({"model": model_id, "labels": labels}, indent=2), encoding="utf-8")
+
+    @classmethod
+    def fit(cls, similarities: np.ndarray, targets: np.ndarray, labels: Sequence[str], iterations: int = 50) -> "Calibration":
+        """
+        Fit each label's (scale, bias) to soft targets (the NLI probabilities) by Newton's method
+        on the cross-entropy; similarities and targets are (texts, labels).
+        """
+        scales, biases = [], []
+        for column in range(similarities.shape[1]):
+            x = similarities[:, column].astype(np.float64)
+            y = np.clip(targets[:, column].astype(np.float64), 1e-4, 1 - 1e-4)
+            w = np.array([DEFAULT_SCALE, DEFAULT_BIAS])
+            design = np.stack([x, np.ones_like(x)], axis=1)
+            for _ in range(iterations):
+                p = _sigmoid(design @ w)
+                grad = design.T @ (p - y)
+                # small ridge keeps the step defined when all similarities are nearly equal
+                hessian = (design * (p * (1 - p))[:, None]).T @ design + 1e-6 * np.eye(2)
+                step = np.linalg.solve(hessian, grad)
+                w -= step
+                if np.abs(step).max() < 1e-8:
+                    break
+            scales.append(w[0])
+            biases.append(w[1])
+        return cls(labels, scales, biases)
+
+
+class EmbeddingBackend:
+    """
+    Mean-pooled sentence encoder scored against precomputed label prototypes.
+    """
+
+    name = "embedding"
+
+    def __init__(self, model_dir: Path, labels: Sequence[str], hypothesis_template: str, calibration: Optional[Path] = None):
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+
+        self._torch = torch
+        self.model_dir = Path(model_dir)
+        self.labels = list(labels)
+        self.tokenizer = AutoTokenizer.from_pretrained(str(self.model_dir), local_files_only=True)
+        self.model = AutoModel.from_pretrained(str(self.model_dir), local_files_only=True)
+        self.model.eval()
+
+        path = Path(calibration or os.environ.get("EMOTION_EMBED_CALIBRATION", self.model_dir / CALIBRATION_FILE))
+        self.calibration = Calibration.load(path, self.labels) if path.exists() else Calibration(self.labels)
+
+        # one (labels, dim) matrix, computed once; requests only encode their own text
+        rows = []
+        for label in self.labels:
+            phrases = [hypothesis_template.format(label), *LABEL_DESCRIPTIONS.get(label, [])]
+            rows.append(self.encode(phrases).mean(axis=0))
+        self.prototypes = self._normalize(np.stack(rows))
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        with span("emotion.tokenize"):
+            inputs = self.tokenizer(texts, padding=True, truncation=True, max_length=EMBED_MAX_LENGTH, return_tensors="pt")
+        with span("emotion.forward"), self._torch.inference_mode():
+            hidden = self.model(**inputs).last_hidden_state
+            mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        return self._normalize(pooled.float().numpy())
+
+    def similarities(self, texts: List[str]) -> np.ndarray:
+        """
+        Cosine similarity of each text to each label prototype, shape (texts, labels).
+        """
+        return self.encode(texts) @ self.prototypes.T
+
+    def label_probs(self, texts: List[str]) -> List[List[float]]:
+        return self.calibration.apply(self.similarities(texts)).tolist()
@@ -0,0 +1,51 @@
+"""
+Deterministic keyword classifier used as EMOTION_BACKEND=keyword.
+
+It needs no model download, numpy or torch, so load tests, CI and frontend work can
+run the whole stack offline. It implements the same entailment_probs() contract as
+the NLI backends; scores come from a small bilingual lexicon, not a model, so the
+labels are only as good as the keywords.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import time
+from typing import Dict, List, Tuple
+
+# Optional simulated inference cost, to give load tests a CPU-bound-looking stage
+FIXTURE_MS_PER_PAIR = float(os.environ.get("EMOTION_FIXTURE_MS_PER_PAIR", "0"))
+
+LEXICON: Dict[str, Tuple[str, ...]] = {
+    "anxious": ("anxious", "worry", "worried", "nervous", "panic", "tense", "afraid", "scared", "焦虑", "紧张", "担心", "害怕", "慌"),
+    "angry": ("angry", "annoyed", "furious", "mad", "unfair", "hate", "生气", "愤怒", "烦", "气死"),
+    "sad": ("sad", "lonely", "cry", "crying", "hopeless", "lost", "down", "难过", "伤心", "孤独", "哭", "失落"),
+    "tired": ("tired", "exhausted", "sleepy", "burned out", "drained", "no energy", "累", "疲惫", "困", "没力气"),
+}
+
+_HYPOTHESIS = re.compile(r"^This example is (\w+)\.$")
+
+
+def _hits(text: str, words: Tuple[str, ...]) -> int:
+    lowered = text.casefold()
+    return sum(1 for word in words if word in lowered)
+
+
+class KeywordBackend:
+    name = "keyword"
+
+    def entailment_probs(self, premises: List[str], hypotheses: List[str]) -> List[float]:
+        if FIXTURE_MS_PER_PAIR > 0:
+            time.sleep(FIXTURE_MS_PER_PAIR * len(premises) / 1000.0)
+        probs: List[float] = []
+        for premise, hypothesis in zip(premises, hypotheses):
+            match = _HYPOTHESIS.match(hypothesis)
+            label = match.group(1) if match else hypothesis
+            if label == "neutral":
+                emotional = sum(_hits(premise, words) for words in LEXICON.values())
+                probs.append(0.7 if emotional == 0 else 0.1)
+            else:
+                hits = _hits(premise, LEXICON.get(label, ()))
+                probs.append(min(0.95, 0.05 + 0.3 * hits))
+        return probs
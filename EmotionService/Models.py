@@ -1,15 +1,50 @@
+import os
+from typing import List, Optional
+
 from pydantic import BaseModel, Field
 
 
+# Upper bound on texts per /analyze/batch request; larger jobs should be split by the client
+ANALYZE_MAX_TEXTS = int(os.environ.get("EMOTION_ANALYZE_MAX_TEXTS", "1000"))
+
+
 class EmotionRequest(BaseModel):
     text: str = Field(..., description="User input text to analyze")
+    segments: bool = Field(default=False, description="Include per-window scores for texts long enough to be chunked")
+
+
+class EmotionSegment(BaseModel):
+    start: int = Field(..., description="Character offset of the window in the input text")
+    end: int = Field(..., description="End offset (exclusive)")
+    emotion: str = Field(..., description="Dominant emotion within the window")
+    scores: dict[str, float] = Field(default_factory=dict, description="Per-emotion scores for the window")
 
 
 class EmotionResult(BaseModel):
     emotion: str = Field(..., description="anxious|angry|sad|tired|neutral")
     intensity: int = Field(..., ge=1, le=4, description="Discrete intensity level 1-4")
     scores: dict[str, float] = Field(default_factory=dict, description="Per-emotion probability scores")
+    segments: Optional[List[EmotionSegment]] = Field(
+        default=None, description="Per-window scores when the text was chunked (aggregated into scores)"
+    )
 
 
 class EmotionResponse(BaseModel):
     emotion: EmotionResult
+
+
+class EmotionBatchRequest(BaseModel):
+    texts: List[str] = Field(
+        ..., max_items=ANALYZE_MAX_TEXTS, description="Texts to analyze (at most EMOTION_ANALYZE_MAX_TEXTS); results stream back as NDJSON"
+    )
+    batch_size: Optional[int] = Field(default=None, ge=1, le=256, description="Texts per forward pass (default EMOTION_ANALYZE_BATCH_SIZE)")
+    segments: bool = Field(default=False, description="Include per-window scores for chunked texts")
+
+
+class EmotionBatchItem(BaseModel):
+    index: int = Field(..., description="Position of the text in the request")
+    emotion: EmotionResult
+
+
+class CacheInvalidateRequest(BaseModel):
+    text: Optional[str] = Field(default=None, description="Invalidate only this text; omit to clear the whole cache")
@@ -1,11 +1,12 @@
-from __future__ import annotations
-
 """
 Utility to pre-download the Hugging Face model so runtime stays offline.
 This version downloads *only* the PyTorch + tokenizer files, 
 avoiding huge Flax/Rust snapshots and wrong directory structures.
 """
 
+from __future__ import annotations
+
+import argparse
 import os
 from pathlib import Path
 from transformers import (
@@ -19,6 +20,10 @@ MODEL_ID = "facebook/bart-large-mnli"
 # This directory uses a clean, correct HF-style name
 DEFAULT_MODEL_DIR = Path(__file__).resolve().parent / ".models" / MODEL_ID.split("/")[-1]
 
+# Keep in sync with Embedding.py
+EMBED_MODEL_ID = os.environ.get("EMOTION_EMBED_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2")
+DEFAULT_EMBED_MODEL_DIR = Path(__file__).resolve().parent / ".models" / EMBED_MODEL_ID.split("/")[-1]
+
 
 def download_model(model_id: str = MODEL_ID, target_dir: Path | None = None) -> Path:
     """
@@ -42,6 +47,78 @@ def download_model(model_id: str = MODEL_ID, target_dir: Path | None = None) ->
     return dest
 
 
+def download_embedding_model(target_dir: Path | None = None) -> Path:
+    """
+    Download the sentence-embedding encoder used by EMOTION_BACKEND=embedding (weights + tokenizer only).
+    """
+    from transformers import AutoModel
+
+    dest = target_dir or Path(os.environ.get("EMOTION_EMBED_MODEL_DIR", DEFAULT_EMBED_MODEL_DIR))
+    dest.mkdir(parents=True, exist_ok=True)
+    AutoModel.from_pretrained(EMBED_MODEL_ID).save_pretrained(dest)
+    AutoTokenizer.from_pretrained(EMBED_MODEL_ID).save_pretrained(dest)
+    return dest
+
+
+def export_onnx(model_dir: Path, opset: int = 17) -> Path:
+    """
+    Export the cached PyTorch model to <model_dir>/onnx/model.onnx with dynamic batch/sequence axes.
+    """
+    import torch
+
+    onnx_dir = model_dir / "onnx"
+    onnx_dir.mkdir(parents=True, exist_ok=True)
+    target = onnx_dir / "model.onnx"
+
+    model = AutoModelForSequenceClassification.from_pretrained(model_dir, local_files_only=True)
+    model.eval()
+    model.config.return_dict = False
+    tokenizer = AutoTokenizer.from_pretrained(model_dir, local_files_only=True)
+    sample = tokenizer(["I feel fine"], ["This example is neutral."], return_tensors="pt")
+
+    axes = {0: "batch", 1: "sequence"}
+    with torch.inference_mode():
+        torch.onnx.export(
+            model,
+            (sample["input_ids"], sample["attention_mask"]),
+            str(target),
+            input_names=["input_ids", "attention_mask"],
+            output_names=["logits"],
+            dynamic_axes={"input_ids": axes, "attention_mask": axes, "logits": {0: "batch"}},
+            opset_version=opset,
+            do_constant_folding=True,
+        )
+    return target
+
+
+def quantize_onnx(model_dir: Path) -> Path:
+    """
+    Dynamic int8 quantization of the exported graph (weights int8, activations quantized at runtime).
+    """
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    source = model_dir / "onnx" / "model.onnx"
+    if not source.exists():
+        raise FileNotFoundError(f"{source} missing; run with --export-onnx first.")
+    target = source.with_name("model.int8.onnx")
+    quantize_dynamic(str(source), str(target), weight_type=QuantType.QInt8)
+    return target
+
+
 if __name__ == "__main__":
-    path = download_model()
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--skip-download", action="store_true", help="reuse the model already in EMOTION_MODEL_DIR")
+    parser.add_argument("--export-onnx", action="store_true", help="write onnx/model.onnx for EMOTION_BACKEND=onnx")
+    parser.add_argument("--quantize", action="store_true", help="write onnx/model.int8.onnx for EMOTION_BACKEND=onnx-int8")
+    parser.add_argument("--embedding", action="store_true", help="also fetch the encoder for EMOTION_BACKEND=embedding")
+    parser.add_argument("--opset", type=int, default=17)
+    args = parser.parse_args()
+
+    path = Path(os.environ.get("EMOTION_MODEL_DIR", DEFAULT_MODEL_DIR)) if args.skip_download else download_model()
     print(f"Model cached at: {path}")
+    if args.export_onnx:
+        print(f"ONNX model written to: {export_onnx(path, args.opset)}")
+    if args.quantize:
+        print(f"Int8 model written to: {quantize_onnx(path)}")
+    if args.embedding:
+        print(f"Embedding model cached at: {download_embedding_model()}")
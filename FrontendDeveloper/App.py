@@ -146,6 +146,9 @@ if "last_response" not in st.session_state:
     st.session_state["last_response"] = None
 if "dev_mode" not in st.session_state:
     st.session_state["dev_mode"] = False
+if "session_id" not in st.session_state:
+    # assigned by the orchestrator on the first reply; earlier turns are kept server-side
+    st.session_state["session_id"] = None
 
 header_left, header_right = st.columns([6, 2])
 with header_left:
@@ -188,7 +191,8 @@ with st.form("chat_form"):
 response = st.session_state.get("last_response")
 if submitted:
     with st.spinner("Calling chat flow..."):
-        response = call_orchestrator("/chat", {"text": user_text})
+        response = call_orchestrator("/chat", {"text": user_text, "session_id": st.session_state["session_id"]})
+    st.session_state["session_id"] = response.get("session_id") or st.session_state["session_id"]
     st.session_state["last_response"] = response
     st.session_state["history"].insert(0, {"flow": "chat", "input": user_text, "response": response})
     st.session_state["history"] = st.session_state["history"][:8]
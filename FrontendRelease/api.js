@@ -4,6 +4,17 @@ const defaultHeaders = {
   "Content-Type": "application/json",
 };
 
+// Server-side conversation session: sent with every turn so the reply sees earlier turns.
+let sessionId = null;
+
+const rememberSession = (payload) => {
+  if (payload && payload.session_id) sessionId = payload.session_id;
+};
+
+export function resetSession() {
+  sessionId = null;
+}
+
 const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
 
 const wrapError = (message, cause) => ({
@@ -49,8 +60,9 @@ export async function requestChat(text, mode) {
   try {
     const payload = await doFetch(CONFIG.endpoints.chat, {
       method: "POST",
-      body: JSON.stringify({ text, mode }),
+      body: JSON.stringify({ text, mode, session_id: sessionId }),
     });
+    rememberSession(payload);
     return { ok: true, data: payload };
   } catch (err) {
     if (CONFIG.fallbackToMockOnError) {
@@ -60,6 +72,76 @@ export async function requestChat(text, mode) {
   }
 }
 
+const parseSseBlock = (block) => {
+  let type = "message";
+  const dataLines = [];
+  block.split("\n").forEach((line) => {
+    if (line.startsWith("event:")) type = line.slice(6).trim();
+    else if (line.startsWith("data:")) dataLines.push(line.slice(5).trimStart());
+  });
+  if (!dataLines.length) return null;
+  try {
+    return { type, ...JSON.parse(dataLines.join("\n")) };
+  } catch (e) {
+    return null;
+  }
+};
+
+// Stream /chat/stream: onEvent receives meta/delta/done events as they arrive.
+// Resolves with the same {ok, data} shape as requestChat once the stream ends.
+export async function requestChatStream(text, mode, onEvent = () => {}) {
+  const controller = new AbortController();
+  const timer = setTimeout(() => controller.abort(), CONFIG.requestTimeoutMs);
+  const data = { reply: "", meta: {} };
+  let received = false;
+  try {
+    const response = await fetch(`${CONFIG.apiBaseUrl}${CONFIG.endpoints.chatStream}`, {
+      method: "POST",
+      headers: { ...defaultHeaders, Accept: "text/event-stream" },
+      body: JSON.stringify({ text, mode, session_id: sessionId }),
+      signal: controller.signal,
+    });
+    if (!response.ok || !response.body) {
+      throw new Error(`HTTP ${response.status}`);
+    }
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    for (;;) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+      let sep;
+      while ((sep = buffer.indexOf("\n\n")) >= 0) {
+        const event = parseSseBlock(buffer.slice(0, sep));
+        buffer = buffer.slice(sep + 2);
+        if (!event) continue;
+        received = true;
+        if (event.type === "meta") {
+          rememberSession(event);
+          Object.assign(data, event, { meta: { ...data.meta, ...(event.meta || {}) } });
+        } else if (event.type === "delta") {
+          data.reply += event.text || "";
+        } else if (event.type === "done") {
+          data.meta = { ...data.meta, ...(event.meta || {}) };
+        } else if (event.type === "error") {
+          return wrapError(event.error?.detail || "服务暂时不可用，请稍后重试。", event.error);
+        }
+        onEvent(event, data);
+      }
+    }
+    return { ok: true, data };
+  } catch (err) {
+    if (!received) {
+      // nothing rendered yet: retry through the regular endpoint (and its mock fallback)
+      return requestChat(text, mode);
+    }
+    return { ok: true, data: { ...data, meta: { ...data.meta, streamError: String(err) } } };
+  } finally {
+    clearTimeout(timer);
+  }
+}
+
 export async function fetchHistory() {
   try {
     const payload = await doFetch(CONFIG.endpoints.history, { method: "GET" });
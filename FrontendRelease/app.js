@@ -1,5 +1,5 @@
 import { CONFIG } from "./config.js";
-import { fetchHistory, requestChat } from "./api.js";
+import { fetchHistory, requestChat, requestChatStream } from "./api.js";
 import { hideToast, renderCharts, renderHistory, renderMessages, renderTips, resetInput, setLoading, setMode, showToast } from "./ui.js";
 
 const state = {
@@ -84,8 +84,24 @@ async function handleSubmit(event) {
   renderMessages(state.messages);
   renderCharts(state.messages);
 
-  const result = await requestChat(text, state.mode);
+  const streaming = CONFIG.streamResponses && !CONFIG.mockResponses;
+  let draftIndex = -1;
+  const onStreamEvent = (event, partial) => {
+    // show the reply as it grows; emotion/mode arrive in the first (meta) event
+    const draft = buildAssistantMessage({ ...partial, reply: partial.reply || "…" }, state.mode);
+    if (draftIndex < 0) {
+      draftIndex = state.messages.push(draft) - 1;
+    } else {
+      state.messages[draftIndex] = draft;
+    }
+    renderMessages(state.messages);
+    if (event.type === "meta") renderCharts(state.messages);
+  };
+
+  const result = streaming ? await requestChatStream(text, state.mode, onStreamEvent) : await requestChat(text, state.mode);
   if (!result.ok) {
+    if (draftIndex >= 0) state.messages.splice(draftIndex, 1);
+    renderMessages(state.messages);
     showToast(result.error || "服务暂时不可用，请稍后重试。");
     state.loading = false;
     setLoading(false);
@@ -93,7 +109,11 @@ async function handleSubmit(event) {
   }
 
   const assistantMessage = buildAssistantMessage(result.data || {}, state.mode);
-  state.messages.push(assistantMessage);
+  if (draftIndex >= 0) {
+    state.messages[draftIndex] = assistantMessage;
+  } else {
+    state.messages.push(assistantMessage);
+  }
   renderMessages(state.messages);
   renderCharts(state.messages);
 
@@ -2,12 +2,15 @@ export const CONFIG = {
   apiBaseUrl: "http://127.0.0.1:8003",
   endpoints: {
     chat: "/chat",
+    chatStream: "/chat/stream",
     history: "/history",
     stats: "/stats",
   },
   defaultMode: "chat",
   requestTimeoutMs: 60000,
   mockResponses: false,
+  // render reply tokens as they arrive via /chat/stream (falls back to /chat on failure)
+  streamResponses: true,
   fallbackToMockOnError: true,
   mockDelayMs: 320,
   toastDurationMs: 4200,
@@ -1,14 +1,120 @@
-from fastapi import FastAPI
+import asyncio
+import json
+import signal
+import threading
 
-from .Core import generate_text
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+
+from Common.Admission import admit, admit_stream, install_admission, priority_of
+from Common.Health import readiness_response
+from Common.Metrics import instrument_app
+from Common.Responses import FastJSONResponse, model_response
+
+from .Cache import get_cache
+from .Chain import get_chain
+from .Config import get_config, get_holder, reload_config
+from .Core import agenerate_text, astream_text, provider_states, warm_providers
 from .Models import GenerateRequest, GenerateResponse
+from .Providers import get_http_pool
+from .Registry import get_registry
+
+app = FastAPI(title="LlmGateway", version="0.1.0", default_response_class=FastJSONResponse)
+instrument_app(app, "llm-gateway")
+install_admission(app)
+
+
+@app.on_event("startup")
+def start_warmup():
+    # Load the configured model(s) once so the first request does not pay for it. This runs in
+    # the background so /health is live immediately; /health/ready reports when loading is done.
+    threading.Thread(target=warm_providers, name="llm-warm", daemon=True).start()
+
 
-app = FastAPI(title="LlmGateway", version="0.1.0")
+@app.on_event("startup")
+async def watch_config():
+    # Hot reload: `kill -HUP <pid>` or editing .env swaps in a new config snapshot.
+    get_holder().start_watcher()
+    loop = asyncio.get_running_loop()
+    try:
+        # try_reload reports a bad .env itself, so the executor future never holds an unseen error
+        loop.add_signal_handler(signal.SIGHUP, lambda: loop.run_in_executor(None, get_holder().try_reload, "SIGHUP"))
+    except (AttributeError, NotImplementedError, RuntimeError):
+        # no SIGHUP (Windows) or not the main thread; the .env watcher still applies
+        pass
+
+
+@app.on_event("shutdown")
+async def close_http_pool():
+    await get_http_pool(get_config()).aclose()
+
+
+async def _sse(events):
+    try:
+        async for event in events:
+            yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+    finally:
+        # closes the upstream generator and returns an admission slot even on a disconnect
+        await events.aclose()
 
 
 @app.post("/generate", response_model=GenerateResponse)
-def generate(request: GenerateRequest) -> GenerateResponse:
-    return generate_text(request)
+async def generate(request: GenerateRequest):
+    priority = priority_of(request.priority)
+    if request.stream:
+        # delta events as tokens arrive, then a done event with provider/usage; the admission
+        # slot is taken before the response starts and held until the stream ends
+        events = await admit_stream("generate", astream_text(request), priority)
+        # runs even when the client left before the first chunk was pulled
+        return StreamingResponse(_sse(events), media_type="text/event-stream", background=BackgroundTask(events.aclose))
+    # API calls are awaited on the shared keep-alive pool; local models run in a worker thread
+    async with admit("generate", priority):
+        response = await agenerate_text(request)
+    return model_response(response)
+
+
+@app.get("/providers/stats")
+def provider_stats():
+    return get_registry(get_config()).stats()
+
+
+@app.get("/providers/health")
+def provider_health():
+    # per chain link: health score, success rate, latency EWMA and circuit breaker state
+    return get_chain().stats()
+
+
+@app.get("/config")
+def config_snapshot():
+    # credentials are masked
+    return get_holder().describe()
+
+
+@app.post("/config/reload")
+def config_reload():
+    # the previous snapshot keeps serving if the new values do not parse
+    try:
+        changed = reload_config()
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    holder = get_holder()
+    return {"changed": changed, "version": holder.version, "pending_restart": holder.pending_restart()}
+
+
+@app.get("/cache/stats")
+def cache_stats():
+    cache = get_cache(get_config())
+    if cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **cache.stats()}
+
+
+@app.post("/cache/invalidate")
+def cache_invalidate():
+    # flushes the memory and disk tier
+    cache = get_cache(get_config())
+    return {"removed": cache.invalidate() if cache is not None else 0}
 
 
 @app.get("/health")
@@ -16,6 +122,11 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/health/ready")
+def health_ready():
+    return readiness_response(provider_states())
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,235 @@
+"""
+Opt-in completion cache for the gateway (LLM_CACHE_ENABLED=1).
+
+Requests with the same provider, model, prompt, max_tokens and temperature are
+answered from memory (or the optional SQLite tier) instead of paying for another
+upstream call, and concurrent identical requests share a single upstream call.
+Every response served through the cache carries `usage.cache`:
+"hit" (stored answer), "miss" (fresh upstream call) or "coalesced" (waited on
+an identical in-flight request).
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import threading
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from Common.Cache import TtlLruCache
+from Common.Metrics import REGISTRY
+
+from .Config import LlmConfig
+from .Models import GenerateRequest, GenerateResponse
+from .Registry import registry_key
+
+HIT = "hit"
+MISS = "miss"
+COALESCED = "coalesced"
+
+CACHE_LOOKUPS = REGISTRY.counter("mindful_llm_cache_total", "Completion cache lookups by outcome.", ("result",))
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Optional[GenerateResponse] = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one; the others wait for its result.
+
+    Threads share a leader's call; coroutines share one task, which is shielded so a
+    disconnecting caller does not cancel the upstream call for everyone else.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, _Call] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self.coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], GenerateResponse]) -> tuple[GenerateResponse, bool]:
+        """
+        Run fn once per key at a time; returns (result, shared) where shared marks a follower.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                self.coalesced += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+        try:
+            call.result = fn()
+        except BaseException as exc:
+            call.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    async def ado(self, key: str, factory: Callable[[], Awaitable[GenerateResponse]]) -> tuple[GenerateResponse, bool]:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            task = self._tasks.get(key)
+            shared = task is not None and task.get_loop() is loop
+            if shared:
+                self.coalesced += 1
+            else:
+                task = self._tasks[key] = loop.create_task(factory())
+                task.add_done_callback(lambda done, key=key: self._forget(key, done))
+        return await asyncio.shield(task), shared
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        with self._lock:
+            if self._tasks.get(key) is task:
+                del self._tasks[key]
+        if not task.cancelled():
+            # mark the exception as retrieved even if every caller went away
+            task.exception()
+
+
+def _cacheable(response: GenerateResponse) -> bool:
+    # never pin a fallback or an upstream error in the cache, nor an answer from a later chain
+    # link: the key names the requested provider, and that entry would outlive its recovery
+    usage = response.usage or {}
+    return not {"error", "fallback_from", "served_by", "attempts"} & usage.keys()
+
+
+def _marked(response: GenerateResponse, marker: str) -> GenerateResponse:
+    return response.copy(update={"usage": {**(response.usage or {}), "cache": marker}})
+
+
+class CompletionCache:
+    """
+    Completions keyed by hash(provider, model, base_url, credentials hash, prompt, max_tokens, temperature).
+    """
+
+    def __init__(self, store: TtlLruCache):
+        self.store = store
+        self.flight = SingleFlight()
+
+    def key(self, request: GenerateRequest, config: LlmConfig) -> str:
+        # the same identity the provider registry uses: a per-request api_key (another account,
+        # possibly another deployment behind the same URL) never shares entries with the default one
+        provider, model, base_url, credentials = registry_key(
+            request.provider or config.provider,
+            config,
+            api_key=request.api_key,
+            base_url=request.base_url,
+            api_model=request.api_model,
+        )
+        raw = json.dumps(
+            [provider, model, base_url, credentials, request.prompt, request.max_tokens, request.temperature], ensure_ascii=False
+        )
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @property
+    def on_disk(self) -> bool:
+        # lookups and stores may hit SQLite; async callers should not run them on the event loop
+        return self.store.db_path is not None
+
+    def get(self, key: str) -> Optional[GenerateResponse]:
+        cached = self.store.get(key)
+        if cached is None:
+            return None
+        CACHE_LOOKUPS.inc(result=HIT)
+        return _marked(GenerateResponse(**cached), HIT)
+
+    def put(self, key: str, response: GenerateResponse) -> None:
+        if _cacheable(response):
+            self.store.set(key, response.dict())
+
+    def resolve(self, key: str, fn: Callable[[], GenerateResponse]) -> GenerateResponse:
+        """
+        Cached response for key, or run fn (once across concurrent identical requests) and store it.
+        """
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        def run() -> GenerateResponse:
+            response = fn()
+            self.put(key, response)
+            return response
+
+        response, shared = self.flight.do(key, run)
+        return self._finish(response, shared)
+
+    async def aresolve(self, key: str, factory: Callable[[], Awaitable[GenerateResponse]]) -> GenerateResponse:
+        cached = await asyncio.to_thread(self.get, key) if self.on_disk else self.get(key)
+        if cached is not None:
+            return cached
+
+        async def run() -> GenerateResponse:
+            response = await factory()
+            if self.on_disk:
+                await asyncio.to_thread(self.put, key, response)
+            else:
+                self.put(key, response)
+            return response
+
+        response, shared = await self.flight.ado(key, run)
+        return self._finish(response, shared)
+
+    def _finish(self, response: GenerateResponse, shared: bool) -> GenerateResponse:
+        marker = COALESCED if shared else MISS
+        CACHE_LOOKUPS.inc(result=marker)
+        return _marked(response, marker)
+
+    def invalidate(self) -> int:
+        return self.store.invalidate()
+
+    def stats(self) -> Dict:
+        return {**self.store.stats(), "coalesced": self.flight.coalesced}
+
+
+# LlmConfig fields the store is built from; they apply on restart (cache_enabled applies at once)
+CACHE_STORE_FIELDS = ("cache_max_entries", "cache_max_bytes", "cache_ttl", "cache_db")
+
+_cache: Optional[CompletionCache] = None
+_cache_config: Optional[LlmConfig] = None
+_cache_lock = threading.Lock()
+
+
+def get_cache(config: LlmConfig) -> Optional[CompletionCache]:
+    """
+    Process-wide completion cache, or None while LLM_CACHE_ENABLED is off.
+    """
+    global _cache, _cache_config
+    if not config.cache_enabled:
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                store = TtlLruCache(
+                    max_entries=config.cache_max_entries,
+                    ttl=config.cache_ttl,
+                    db_path=config.cache_db,
+                    namespace="llm",
+                    max_bytes=config.cache_max_bytes,
+                )
+                _cache = CompletionCache(store)
+                _cache_config = config
+    return _cache
+
+
+def cache_pending(config: LlmConfig) -> List[str]:
+    """
+    Store settings in `config` that differ from the ones the running cache was built with.
+    """
+    built = _cache_config
+    if built is None:
+        return []
+    return [name for name in CACHE_STORE_FIELDS if getattr(built, name) != getattr(config, name)]
@@ -0,0 +1,355 @@
+"""
+Provider fallback chain with circuit breakers, health scoring and hedged requests.
+
+The chain is LLM_FALLBACK_CHAIN (default: just LLM_PROVIDER) with the request's own
+provider first; mock is not a link (unless it was asked for directly) but the
+terminal answer when every link failed.
+Each link has a circuit breaker, so a provider that keeps failing is skipped
+outright instead of costing a full timeout per request, and a health record
+(success EWMA, recent latencies). Links whose success rate has dropped below
+HEALTH_MIN_SUCCESS are tried after the healthy ones.
+
+On the async path the next link is fired as a hedge once the in-flight one runs
+past its own recent latency percentile; the first good answer wins and the rest
+are cancelled. The sync path walks the chain serially.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+from Common.Metrics import REGISTRY
+from Common.Resilience import CircuitBreaker
+
+from .Config import LlmConfig
+from .Models import GenerateRequest
+from .Providers import ProviderError, normalize_provider
+from .Registry import RegistryKey, registry_key
+
+# Latencies kept per link for the hedge percentile
+LATENCY_WINDOW = 200
+# Below this many samples the configured LLM_HEDGE_DELAY_MS is used
+MIN_LATENCY_SAMPLES = 20
+HEALTH_ALPHA = 0.2
+HEALTH_MIN_SUCCESS = 0.5
+# Upstream targets tracked at once; per-request api_key/base_url overrides each get their own
+MAX_TRACKED_TARGETS = 256
+
+HEDGES = REGISTRY.counter("mindful_llm_hedges_total", "Backup requests fired by the fallback chain.", ("link",))
+CHAIN_WINS = REGISTRY.counter("mindful_llm_chain_served_total", "Requests answered by each chain link.", ("link",))
+
+# (text, usage, provider name) as returned by one attempt
+Attempt = Tuple[str, Dict, str]
+
+
+@dataclass(frozen=True)
+class ChainLink:
+    label: str
+    provider: str
+    overrides: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class ChainResult:
+    link: Optional[ChainLink]
+    text: str = ""
+    usage: Dict = field(default_factory=dict)
+    provider: str = ""
+    hedged: bool = False
+    errors: List[str] = field(default_factory=list)
+
+
+class ProviderHealth:
+    """
+    Rolling health of one link: success EWMA plus a window of successful latencies.
+    """
+
+    def __init__(self):
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.success_rate = 1.0
+        self.latency_ewma: Optional[float] = None
+        self.successes = 0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def record(self, ok: bool, seconds: float) -> None:
+        with self._lock:
+            self.success_rate += HEALTH_ALPHA * ((1.0 if ok else 0.0) - self.success_rate)
+            if ok:
+                self.successes += 1
+                self.latencies.append(seconds)
+                self.latency_ewma = seconds if self.latency_ewma is None else self.latency_ewma + HEALTH_ALPHA * (seconds - self.latency_ewma)
+            else:
+                self.failures += 1
+
+    def percentile(self, q: float) -> Optional[float]:
+        with self._lock:
+            if len(self.latencies) < MIN_LATENCY_SAMPLES:
+                return None
+            ordered = sorted(self.latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * q / 100.0))]
+
+    @property
+    def healthy(self) -> bool:
+        return self.success_rate >= HEALTH_MIN_SUCCESS
+
+    @property
+    def score(self) -> float:
+        # success rate discounted by typical latency (seconds); 1.0 is a fast, reliable link
+        return self.success_rate / (1.0 + (self.latency_ewma or 0.0))
+
+    def stats(self) -> Dict:
+        return {
+            "score": round(self.score, 4),
+            "success_rate": round(self.success_rate, 4),
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 1) if self.latency_ewma is not None else None,
+            "successes": self.successes,
+            "failures": self.failures,
+        }
+
+
+class FallbackChain:
+    """
+    Breakers and health are kept per upstream target (the registry key: provider, model,
+    base_url, credentials), not per label, so a client's own bad api_key or base_url only
+    trips its own breaker and never degrades the shared default provider.
+    """
+
+    def __init__(self):
+        self._breakers: "OrderedDict[RegistryKey, CircuitBreaker]" = OrderedDict()
+        self._health: "OrderedDict[RegistryKey, ProviderHealth]" = OrderedDict()
+        self._labels: Dict[RegistryKey, str] = {}
+        self._lock = threading.Lock()
+
+    def links(self, request: GenerateRequest, config: LlmConfig) -> List[ChainLink]:
+        """
+        The request's provider (with its per-request overrides) followed by the configured chain.
+        """
+        first = request.provider or config.provider
+        candidates = [
+            ChainLink(
+                normalize_provider(first),
+                first,
+                {"api_key": request.api_key, "base_url": request.base_url, "api_model": request.api_model},
+            )
+        ]
+        for name in config.fallback_chain:
+            if name.lower() == "secondary":
+                if not config.secondary_api_key:
+                    continue
+                overrides = {
+                    "api_key": config.secondary_api_key,
+                    "base_url": config.secondary_base_url,
+                    "api_model": config.secondary_api_model,
+                }
+                candidates.append(ChainLink("secondary", "openai-compatible", overrides))
+            elif normalize_provider(name) != "mock":
+                candidates.append(ChainLink(normalize_provider(name), name))
+
+        links: List[ChainLink] = []
+        seen = set()
+        for index, link in enumerate(candidates):
+            if index and normalize_provider(link.provider) == "mock":
+                continue
+            key = registry_key(link.provider, config, **link.overrides)
+            if key in seen:
+                continue
+            seen.add(key)
+            links.append(link)
+        # stable: healthy links keep their configured order, degraded ones move to the back
+        return sorted(links, key=lambda link: not self.health(link, config).healthy)
+
+    def configure(self, config: LlmConfig) -> None:
+        """
+        Apply reloaded breaker settings to the breakers that already exist.
+        """
+        with self._lock:
+            for breaker in self._breakers.values():
+                breaker.failure_threshold = max(1, config.breaker_failures)
+                breaker.reset_timeout = config.breaker_reset
+
+    def breaker(self, link: ChainLink, config: LlmConfig) -> CircuitBreaker:
+        key = registry_key(link.provider, config, **link.overrides)
+        with self._lock:
+            breaker = self._tracked(self._breakers, key, link)
+            if breaker is None:
+                breaker = self._breakers[key] = CircuitBreaker(f"llm:{link.label}", config.breaker_failures, config.breaker_reset)
+            return breaker
+
+    def health(self, link: ChainLink, config: LlmConfig) -> ProviderHealth:
+        key = registry_key(link.provider, config, **link.overrides)
+        with self._lock:
+            health = self._tracked(self._health, key, link)
+            if health is None:
+                health = self._health[key] = ProviderHealth()
+            return health
+
+    def _tracked(self, records: OrderedDict, key: RegistryKey, link: ChainLink):
+        # LRU over targets (caller holds the lock): one-off overrides cannot grow the maps without bound
+        self._labels[key] = link.label
+        record = records.get(key)
+        if record is not None:
+            records.move_to_end(key)
+            return record
+        while len(records) >= MAX_TRACKED_TARGETS:
+            evicted, _ = records.popitem(last=False)
+            if evicted not in self._breakers and evicted not in self._health:
+                self._labels.pop(evicted, None)
+        return None
+
+    def hedge_delay(self, link: ChainLink, config: LlmConfig) -> float:
+        observed = self.health(link, config).percentile(config.hedge_percentile)
+        delay = observed if observed is not None else config.hedge_delay_ms / 1000.0
+        return max(config.hedge_min_ms / 1000.0, delay)
+
+    def begin(self, link: ChainLink, config: LlmConfig) -> bool:
+        """
+        Whether link may be tried now (its breaker is closed, or this is the half-open probe).
+        """
+        return self.breaker(link, config).allow()
+
+    def succeeded(self, link: ChainLink, config: LlmConfig, seconds: float) -> None:
+        self.breaker(link, config).record_success()
+        self.health(link, config).record(True, seconds)
+
+    def failed(self, link: ChainLink, config: LlmConfig, seconds: float) -> None:
+        self.breaker(link, config).record_failure()
+        self.health(link, config).record(False, seconds)
+
+    def generate(self, links: List[ChainLink], config: LlmConfig, attempt: Callable[[ChainLink], Attempt]) -> ChainResult:
+        """
+        Serial walk: the first link that answers wins.
+        """
+        errors: List[str] = []
+        for link in links:
+            if not self.begin(link, config):
+                errors.append(f"{link.label}: circuit open")
+                continue
+            started = time.perf_counter()
+            try:
+                text, usage, provider = attempt(link)
+            except ProviderError as exc:
+                self.failed(link, config, time.perf_counter() - started)
+                errors.append(f"{link.label}: {exc}")
+                continue
+            except BaseException:
+                self.breaker(link, config).release()
+                raise
+            self.succeeded(link, config, time.perf_counter() - started)
+            return self._won(ChainResult(link, text, usage, provider, errors=errors))
+        return ChainResult(None, errors=errors)
+
+    async def agenerate(
+        self, links: List[ChainLink], config: LlmConfig, attempt: Callable[[ChainLink], Awaitable[Attempt]]
+    ) -> ChainResult:
+        """
+        Hedged walk: a failure moves on at once; a slow link gets a backup after its hedge delay.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + config.chain_timeout
+        queue = list(links)
+        errors: List[str] = []
+        pending: Dict[asyncio.Task, ChainLink] = {}
+        hedges = 0
+        last_launch = loop.time()
+        last_link: Optional[ChainLink] = None
+
+        async def timed(link: ChainLink) -> Attempt:
+            started = time.perf_counter()
+            try:
+                result = await attempt(link)
+            except ProviderError:
+                self.failed(link, config, time.perf_counter() - started)
+                raise
+            except BaseException:
+                # cancelled hedge (or a bug): no verdict on the upstream, free a half-open probe
+                self.breaker(link, config).release()
+                raise
+            self.succeeded(link, config, time.perf_counter() - started)
+            return result
+
+        def launch() -> bool:
+            nonlocal last_launch, last_link
+            while queue:
+                link = queue.pop(0)
+                if not self.begin(link, config):
+                    errors.append(f"{link.label}: circuit open")
+                    continue
+                pending[loop.create_task(timed(link))] = link
+                last_launch, last_link = loop.time(), link
+                return True
+            return False
+
+        launch()
+        try:
+            while pending:
+                now = loop.time()
+                if now >= deadline:
+                    errors.append(f"chain timeout after {config.chain_timeout:g}s")
+                    break
+                timeout = deadline - now
+                can_hedge = config.hedge_enabled and queue and len(pending) < max(1, config.hedge_max_parallel)
+                if can_hedge:
+                    timeout = min(timeout, max(0.0, last_launch + self.hedge_delay(last_link, config) - now))
+                done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    if can_hedge and loop.time() < deadline and launch():
+                        hedges += 1
+                        HEDGES.inc(link=last_link.label)
+                    continue
+                for task in done:
+                    link = pending.pop(task)
+                    exc = task.exception()
+                    if exc is None:
+                        text, usage, provider = task.result()
+                        return self._won(ChainResult(link, text, usage, provider, hedged=hedges > 0, errors=errors))
+                    if not isinstance(exc, ProviderError):
+                        raise exc
+                    errors.append(f"{link.label}: {exc}")
+                if not pending:
+                    launch()
+        finally:
+            for task in pending:
+                task.cancel()
+        return ChainResult(None, errors=errors)
+
+    def _won(self, result: ChainResult) -> ChainResult:
+        CHAIN_WINS.inc(link=result.link.label)
+        return result
+
+    def stats(self) -> Dict:
+        with self._lock:
+            keys = list(dict.fromkeys([*self._breakers, *self._health]))
+            breakers = dict(self._breakers)
+            health = dict(self._health)
+            labels = dict(self._labels)
+        counts = Counter(labels.values())
+        result = {}
+        for key in keys:
+            label = labels.get(key, key[0])
+            if counts[label] > 1:
+                # several targets behind one label (per-request overrides): name the target, never the key
+                label = f"{label} ({key[1] or '-'} @ {key[2] or '-'}, key {key[3]})"
+            result[label] = {
+                **(health[key].stats() if key in health else {}),
+                "breaker": breakers[key].stats() if key in breakers else None,
+            }
+        return dict(sorted(result.items()))
+
+
+_chain: Optional[FallbackChain] = None
+_chain_lock = threading.Lock()
+
+
+def get_chain() -> FallbackChain:
+    global _chain
+    if _chain is None:
+        with _chain_lock:
+            if _chain is None:
+                _chain = FallbackChain()
+    return _chain
@@ -1,23 +1,85 @@
 import os
-from dataclasses import dataclass
-from dotenv import load_dotenv
+import sys
+import threading
+import time
+from dataclasses import asdict, dataclass, fields
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
 
-load_dotenv()
-@dataclass
+from dotenv import dotenv_values
+
+# .env consulted at startup and on every reload (SIGHUP, file change or POST /config/reload)
+ENV_FILE = Path(os.getenv("LLM_ENV_FILE", Path(__file__).resolve().parent.parent / ".env"))
+# How often the .env mtime is checked; 0 disables the watcher (SIGHUP / POST /config/reload still work)
+CONFIG_POLL_SECONDS = float(os.getenv("LLM_CONFIG_POLL_SECONDS", "5"))
+SECRET_FIELDS = ("api_key", "secondary_api_key")
+# Variables set by the launching environment (e.g. StartAll.sh exports) win over .env, at startup and on reload alike
+_INHERITED_ENV = frozenset(os.environ)
+
+
+def _apply_env_file() -> None:
+    """
+    Copy .env into os.environ with one precedence for startup and reloads: inherited variables
+    are never overridden, and an empty value (`LLM_PROVIDER=`) counts as unset, so defaults apply.
+    """
+    for key, value in dotenv_values(ENV_FILE).items():
+        if key in _INHERITED_ENV:
+            continue
+        if value:
+            os.environ[key] = value
+        else:
+            os.environ.pop(key, None)
+
+
+_apply_env_file()
+@dataclass(frozen=True)
 class LlmConfig:
     provider: str
     api_key: str | None
     base_url: str | None
     api_model: str
     local_model: str
+    local_max_new_tokens: int
     request_timeout: float
+    registry_max_entries: int
+    registry_ttl: float
+    warm_providers: tuple[str, ...]
+    http_max_connections: int
+    http_max_keepalive: int
+    http_keepalive_expiry: float
+    http_per_host_limit: int
+    http2: bool
+    cache_enabled: bool
+    cache_max_entries: int
+    cache_max_bytes: int
+    cache_ttl: float
+    cache_db: str | None
+    fallback_chain: tuple[str, ...]
+    secondary_api_key: str | None
+    secondary_base_url: str | None
+    secondary_api_model: str
+    hedge_enabled: bool
+    hedge_percentile: float
+    hedge_delay_ms: float
+    hedge_min_ms: float
+    hedge_max_parallel: int
+    breaker_failures: int
+    breaker_reset: float
+    chain_timeout: float
 
 _OPENAI_COMPAT_DEFAULT_BASE = "https://api.openai.com/v1"
 _OPENAI_COMPAT_DEFAULT_MODEL = "gpt-3.5-turbo"
 _LOCAL_DEFAULT_MODEL = "sshleifer/tiny-gpt2"
 
 
+def _flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() not in {"0", "false", "no"}
+
+
 def load_config() -> LlmConfig:
+    """
+    Build a config from the current environment; request paths use the get_config() snapshot instead.
+    """
     provider = os.getenv("LLM_PROVIDER", "tiny-local")
     base_url = os.getenv("LLM_BASE_URL")
     api_model = os.getenv("LLM_API_MODEL")
@@ -29,12 +91,196 @@ def load_config() -> LlmConfig:
     else:
         api_model = api_model or _OPENAI_COMPAT_DEFAULT_MODEL
 
+    request_timeout = float(os.getenv("LLM_TIMEOUT", "60"))
+
     return LlmConfig(
         provider=provider,
         api_key=os.getenv("LLM_API_KEY"),
         base_url=base_url,
         api_model=api_model,
         local_model=os.getenv("LLM_LOCAL_MODEL", _LOCAL_DEFAULT_MODEL),
+        # Completion length when a request sets no max_tokens; always capped by what is left of the context window
+        local_max_new_tokens=int(os.getenv("LLM_LOCAL_MAX_NEW_TOKENS", "512")),
         # Unified LLM timeout sourced from .env (fallback 60s to match StartAll template)
-        request_timeout=float(os.getenv("LLM_TIMEOUT", "60")),
+        request_timeout=request_timeout,
+        # Provider registry: loaded models/clients are reused until idle for registry_ttl seconds
+        registry_max_entries=int(os.getenv("LLM_REGISTRY_MAX_ENTRIES", "8")),
+        registry_ttl=float(os.getenv("LLM_REGISTRY_TTL", "1800")),
+        # Comma-separated providers to load at startup; defaults to the configured provider
+        warm_providers=tuple(
+            p.strip() for p in os.getenv("LLM_WARM_PROVIDERS", provider).split(",") if p.strip()
+        ),
+        # Shared keep-alive HTTP pool for openai-compatible upstreams
+        http_max_connections=int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "100")),
+        http_max_keepalive=int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "20")),
+        http_keepalive_expiry=float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "30")),
+        http_per_host_limit=int(os.getenv("LLM_HTTP_PER_HOST_LIMIT", "16")),
+        http2=_flag("LLM_HTTP2", "1"),
+        # Opt-in completion cache keyed by (provider, model, prompt, max_tokens, temperature)
+        cache_enabled=os.getenv("LLM_CACHE_ENABLED", "0").lower() in {"1", "true", "yes"},
+        cache_max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "2000")),
+        cache_max_bytes=int(os.getenv("LLM_CACHE_MAX_BYTES", str(64 * 1024 * 1024))),
+        cache_ttl=float(os.getenv("LLM_CACHE_TTL", "3600")),
+        # Optional SQLite file so cached completions survive restarts (memory-only when unset)
+        cache_db=os.getenv("LLM_CACHE_DB") or None,
+        # Providers tried in order, e.g. "openai,secondary,tiny-local,mock"; defaults to LLM_PROVIDER.
+        # "secondary" is an openai-compatible upstream configured by LLM_SECONDARY_*; mock always ends the chain.
+        fallback_chain=tuple(p.strip() for p in os.getenv("LLM_FALLBACK_CHAIN", provider).split(",") if p.strip()),
+        secondary_api_key=os.getenv("LLM_SECONDARY_API_KEY"),
+        secondary_base_url=os.getenv("LLM_SECONDARY_BASE_URL"),
+        secondary_api_model=os.getenv("LLM_SECONDARY_API_MODEL", api_model),
+        # Async requests fire the next provider once the current one is slower than its recent
+        # p<LLM_HEDGE_PERCENTILE> latency (LLM_HEDGE_DELAY_MS until enough samples exist)
+        hedge_enabled=_flag("LLM_HEDGE", "1"),
+        hedge_percentile=float(os.getenv("LLM_HEDGE_PERCENTILE", "95")),
+        hedge_delay_ms=float(os.getenv("LLM_HEDGE_DELAY_MS", "2000")),
+        hedge_min_ms=float(os.getenv("LLM_HEDGE_MIN_MS", "200")),
+        hedge_max_parallel=int(os.getenv("LLM_HEDGE_MAX_PARALLEL", "2")),
+        # Per-provider circuit breakers: skip a provider after N consecutive failures for RESET seconds
+        breaker_failures=int(os.getenv("LLM_BREAKER_FAILURES", "3")),
+        breaker_reset=float(os.getenv("LLM_BREAKER_RESET", "30")),
+        # Whole-chain budget before answering with the mock fallback
+        chain_timeout=float(os.getenv("LLM_CHAIN_TIMEOUT", str(request_timeout))),
     )
+
+
+def redacted(config: LlmConfig) -> Dict:
+    """
+    The config as a dict with credentials masked, safe to return from /config.
+    """
+    data = asdict(config)
+    for name in SECRET_FIELDS:
+        if data.get(name):
+            data[name] = "***"
+    return data
+
+
+def _env_mtime() -> Optional[float]:
+    try:
+        return ENV_FILE.stat().st_mtime
+    except OSError:
+        return None
+
+
+class ConfigHolder:
+    """
+    Immutable LlmConfig snapshot, swapped in one assignment when a reload finds a change.
+
+    Readers never lock: they get either the old or the new snapshot. Listeners are told
+    which fields changed so expensive work (reloading providers) only follows real changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._config = load_config()
+        self._env_mtime = _env_mtime()
+        self._listeners: List[Callable[[LlmConfig, LlmConfig, List[str]], None]] = []
+        self._restart_checks: List[Callable[[LlmConfig], List[str]]] = []
+        self._watcher: Optional[threading.Thread] = None
+        self.version = 1
+        self.loaded_at = time.time()
+        self.errors: List[str] = []
+
+    @property
+    def config(self) -> LlmConfig:
+        return self._config
+
+    def subscribe(self, listener: Callable[[LlmConfig, LlmConfig, List[str]], None]) -> None:
+        self._listeners.append(listener)
+
+    def track_restart(self, check: Callable[[LlmConfig], List[str]]) -> None:
+        """
+        Register a check returning the fields of a config that only apply after a restart and differ from the live state.
+        """
+        self._restart_checks.append(check)
+
+    def pending_restart(self) -> List[str]:
+        config = self._config
+        return sorted({name for check in self._restart_checks for name in check(config)})
+
+    def reload(self) -> List[str]:
+        """
+        Re-read .env (same precedence as startup, see _apply_env_file) and rebuild the snapshot;
+        returns the names of the fields that changed. A key deleted from .env keeps its last value.
+        """
+        with self._lock:
+            self._env_mtime = _env_mtime()
+            if self._env_mtime is not None:
+                _apply_env_file()
+            try:
+                updated = load_config()
+            except ValueError as exc:
+                # e.g. a non-numeric LLM_TIMEOUT: keep serving the last good snapshot
+                self.errors = [str(exc)]
+                raise
+            self.errors = []
+            previous = self._config
+            changed = [f.name for f in fields(LlmConfig) if getattr(previous, f.name) != getattr(updated, f.name)]
+            if not changed:
+                return []
+            self._config = updated
+            self.version += 1
+            self.loaded_at = time.time()
+            listeners = list(self._listeners)
+        for listener in listeners:
+            listener(previous, updated, changed)
+        return changed
+
+    def try_reload(self, source: str) -> List[str]:
+        """
+        reload() for background triggers (file watcher, SIGHUP): a failure is reported on stderr
+        and in describe()["errors"], and the last good snapshot keeps serving.
+        """
+        try:
+            return self.reload()
+        except Exception as exc:
+            print(f"[config] reload ({source}) failed, keeping version {self.version}: {exc!r}", file=sys.stderr)
+            return []
+
+    def start_watcher(self, interval: float = CONFIG_POLL_SECONDS) -> None:
+        if interval <= 0 or self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="config-watcher", daemon=True)
+        self._watcher.start()
+
+    def _watch(self, interval: float) -> None:
+        while True:
+            time.sleep(interval)
+            if _env_mtime() == self._env_mtime:
+                continue
+            self.try_reload("watcher")
+
+    def describe(self) -> Dict:
+        return {
+            "version": self.version,
+            "loaded_at": self.loaded_at,
+            "env_file": str(ENV_FILE),
+            "errors": self.errors,
+            "config": redacted(self._config),
+            # changed in .env but still running with the startup values
+            "pending_restart": self.pending_restart(),
+        }
+
+
+_holder: Optional[ConfigHolder] = None
+_holder_lock = threading.Lock()
+
+
+def get_holder() -> ConfigHolder:
+    global _holder
+    if _holder is None:
+        with _holder_lock:
+            if _holder is None:
+                _holder = ConfigHolder()
+    return _holder
+
+
+def get_config() -> LlmConfig:
+    """
+    Current config snapshot (built once, replaced only by reload_config()).
+    """
+    return get_holder().config
+
+
+def reload_config() -> List[str]:
+    return get_holder().reload()
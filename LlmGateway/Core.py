@@ -1,60 +1,305 @@
 from __future__ import annotations
 
-import datetime
+import asyncio
+import threading
+import time
 from pathlib import Path
+from typing import AsyncIterator, Dict, Iterator, List
 
+from Common.LogSink import get_sink
+from Common.Metrics import REGISTRY, span
+
+from .Cache import MISS, cache_pending, get_cache
+from .Chain import ChainLink, ChainResult, get_chain
 from .Models import GenerateRequest, GenerateResponse
-from .Config import load_config
-from .Providers import BaseProvider, MockProvider, ProviderError, get_provider
+from .Config import LlmConfig, get_config, get_holder
+from .Providers import BaseProvider, MockProvider, ProviderError, http_pool_pending
+from .Registry import get_registry
 
 LOG_FILE = Path(__file__).resolve().parent.parent / ".logs" / "llm-gateway.log"
 
+FALLBACKS = REGISTRY.counter("mindful_llm_fallbacks_total", "Provider failures answered by the mock fallback.", ("provider",))
+
 
 def _append_log(prompt: str, reply: str, provider: str, usage: dict | None):
     """
-    Append prompt/response exchanges to the gateway log for debugging.
-    """
-    try:
-        LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
-        timestamp = datetime.datetime.utcnow().isoformat() + "Z"
-        with LOG_FILE.open("a", encoding="utf-8") as f:
-            f.write("\n--- LLM Exchange @ " + timestamp + " ---\n")
-            f.write(f"provider: {provider}\n")
-            if usage:
-                f.write(f"usage: {usage}\n")
-            f.write("prompt:\n")
-            f.write(prompt + "\n")
-            f.write("reply:\n")
-            f.write(reply + "\n")
-    except Exception:
-        # logging must never break the flow
-        pass
+    Record prompt/response exchanges in the gateway log for debugging (queued, written off-thread).
+    """
+    get_sink(LOG_FILE).emit({"service": "llm-gateway", "provider": provider, "usage": usage or {}, "prompt": prompt, "reply": reply})
+
+
+def warm_providers() -> Dict[str, str]:
+    """
+    Load LLM_WARM_PROVIDERS into the registry; returns per-provider "ok" / "error: ...".
+    """
+    config = get_config()
+    return get_registry(config).warm(config.warm_providers, config)
+
+
+def _apply_config(previous: LlmConfig, config: LlmConfig, changed: List[str]) -> None:
+    """
+    React to a config reload; providers are only rebuilt when a setting they captured changed.
+    """
+    changed_fields = set(changed)
+    registry = get_registry(config)
+    if changed_fields & {"registry_max_entries", "registry_ttl"}:
+        registry.resize(config.registry_max_entries, config.registry_ttl)
+    # model, base_url and credentials are part of the registry key, so those changes simply miss;
+    # the timeout and the local model are not, so drop the stale instances explicitly
+    if "request_timeout" in changed_fields:
+        registry.clear("openai-compatible")
+    if changed_fields & {"local_model", "local_max_new_tokens"}:
+        registry.clear("tiny-local")
+    if changed_fields & {"breaker_failures", "breaker_reset"}:
+        get_chain().configure(config)
+    if changed_fields & {"provider", "warm_providers", "api_key", "base_url", "api_model", "local_model", "request_timeout"}:
+        threading.Thread(target=warm_providers, name="llm-warm", daemon=True).start()
+
+
+get_holder().subscribe(_apply_config)
+# the shared HTTP pool and the cache store keep the settings they were built with until restart
+get_holder().track_restart(http_pool_pending)
+get_holder().track_restart(cache_pending)
+
+
+def provider_states() -> Dict[str, str]:
+    config = get_config()
+    registry = get_registry(config)
+    return {f"provider:{name}": registry.state(name, config) for name in config.warm_providers}
+
+
+def _fallback(request: GenerateRequest, provider: str, error: str) -> GenerateResponse:
+    # Every link failed or was skipped: answer with mock so the service can still run.
+    FALLBACKS.inc(provider=provider)
+    fallback = MockProvider()
+    with span("llm.fallback"):
+        text, usage = fallback.generate(prompt=request.prompt, max_tokens=request.max_tokens, temperature=request.temperature)
+    usage.update({"error": error, "fallback_from": provider})
+    return GenerateResponse(text=text, provider=fallback.name, usage=usage)
+
+
+def _chain_usage(usage: Dict, result: ChainResult, links: List[ChainLink]) -> Dict:
+    if result.link is not links[0]:
+        usage["served_by"] = result.link.label
+    if result.hedged:
+        usage["hedged"] = True
+    if result.errors:
+        usage["attempts"] = result.errors
+    return usage
+
+
+def _chain_response(request: GenerateRequest, config: LlmConfig, result: ChainResult, links: List[ChainLink]) -> GenerateResponse:
+    if result.link is None:
+        return _fallback(request, request.provider or config.provider, "; ".join(result.errors) or "no provider available")
+    return GenerateResponse(text=result.text, provider=result.provider, usage=_chain_usage(result.usage, result, links))
+
+
+def _generate(request: GenerateRequest, config: LlmConfig) -> GenerateResponse:
+    registry = get_registry(config)
+
+    def attempt(link: ChainLink):
+        # Reuse loaded models/clients across requests instead of rebuilding per call
+        client: BaseProvider = registry.get(link.provider, config, **link.overrides)
+        with span("llm.provider"):
+            text, usage = client.generate(prompt=request.prompt, max_tokens=request.max_tokens, temperature=request.temperature)
+        return text, usage, client.name
+
+    chain = get_chain()
+    links = chain.links(request, config)
+    return _chain_response(request, config, chain.generate(links, config, attempt), links)
+
+
+async def _agenerate(request: GenerateRequest, config: LlmConfig) -> GenerateResponse:
+    registry = get_registry(config)
+
+    async def attempt(link: ChainLink):
+        client = registry.lookup(link.provider, config, **link.overrides)
+        if client is None:
+            # Cold load (e.g. local weights) must not block the event loop.
+            client = await asyncio.to_thread(registry.get, link.provider, config, **link.overrides)
+        with span("llm.provider"):
+            text, usage = await client.agenerate(prompt=request.prompt, max_tokens=request.max_tokens, temperature=request.temperature)
+        return text, usage, client.name
+
+    chain = get_chain()
+    links = chain.links(request, config)
+    return _chain_response(request, config, await chain.agenerate(links, config, attempt), links)
 
 
 def generate_text(request: GenerateRequest) -> GenerateResponse:
     """
-    Placeholder LLM gateway. Extend with real provider calls (OpenAI/DeepSeek).
-    """
-    config = load_config()
-    provider = request.provider or config.provider
-
-    try:
-        # client: BaseProvider = get_provider(provider, config)
-        client: BaseProvider = get_provider(
-            provider,
-            config,
-            api_key=request.api_key,
-            base_url=request.base_url,
-            api_model=request.api_model,
-        )
-        text, usage = client.generate(prompt=request.prompt, max_tokens=request.max_tokens)
-        resolved_provider = client.name
-    except ProviderError as exc:
-        # Fall back to mock so the service can still run.
-        fallback = MockProvider()
-        text, usage = fallback.generate(prompt=request.prompt, max_tokens=request.max_tokens)
-        usage.update({"error": str(exc), "fallback_from": provider})
-        resolved_provider = fallback.name
-
-    _append_log(request.prompt, text, resolved_provider, usage)
-    return GenerateResponse(text=text, provider=resolved_provider, usage=usage)
+    Walk the fallback chain (providers resolved from the registry) and fall back to mock when
+    every link fails or is circuit-open. With LLM_CACHE_ENABLED, identical requests are served from the completion cache.
+    """
+    config = get_config()
+    cache = get_cache(config)
+    if cache is None:
+        response = _generate(request, config)
+    else:
+        response = cache.resolve(cache.key(request, config), lambda: _generate(request, config))
+
+    _append_log(request.prompt, response.text, response.provider, response.usage)
+    return response
+
+
+async def agenerate_text(request: GenerateRequest) -> GenerateResponse:
+    """
+    Async variant of generate_text: API providers are awaited on the shared AsyncClient.
+    """
+    config = get_config()
+    cache = get_cache(config)
+    if cache is None:
+        response = await _agenerate(request, config)
+    else:
+        response = await cache.aresolve(cache.key(request, config), lambda: _agenerate(request, config))
+
+    _append_log(request.prompt, response.text, response.provider, response.usage)
+    return response
+
+
+def _cached_events(response: GenerateResponse) -> Iterator[Dict]:
+    # a cached completion is replayed as one delta
+    yield {"type": "delta", "text": response.text}
+    yield {"type": "done", "provider": response.provider, "usage": response.usage}
+
+
+def _store_streamed(config: LlmConfig, request: GenerateRequest, text: str, provider: str, usage: Dict) -> None:
+    cache = get_cache(config)
+    if cache is None:
+        return
+    cache.put(cache.key(request, config), GenerateResponse(text=text, provider=provider, usage=dict(usage)))
+    usage["cache"] = MISS
+
+
+def _cached_stream(config: LlmConfig, request: GenerateRequest) -> GenerateResponse | None:
+    cache = get_cache(config)
+    if cache is None:
+        return None
+    # streams are not coalesced: a follower would see nothing until the leader finished
+    response = cache.get(cache.key(request, config))
+    if response is not None:
+        _append_log(request.prompt, response.text, response.provider, response.usage)
+    return response
+
+
+async def _cache_io(config: LlmConfig, fn, *args):
+    # with a disk tier the completion cache does SQLite I/O; keep it off the event loop
+    cache = get_cache(config)
+    if cache is not None and cache.on_disk:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
+
+
+def _fallback_events(request: GenerateRequest, provider: str, errors: List[str]) -> Iterator[Dict]:
+    response = _fallback(request, provider, "; ".join(errors) or "no provider available")
+    _append_log(request.prompt, response.text, response.provider, response.usage)
+    yield {"type": "delta", "text": response.text}
+    yield {"type": "done", "provider": response.provider, "usage": response.usage}
+
+
+def _stream_done(config: LlmConfig, request: GenerateRequest, result: ChainResult, links: List[ChainLink], pieces: List[str]) -> Dict:
+    text = "".join(pieces)
+    usage = _chain_usage(result.usage, result, links)
+    _store_streamed(config, request, text, result.provider, usage)
+    _append_log(request.prompt, text, result.provider, usage)
+    return {"type": "done", "provider": result.provider, "usage": usage}
+
+
+def _stream_failed(link: ChainLink, exc: ProviderError) -> Dict:
+    # Part of the reply already reached the client; report the failure instead of switching models mid-answer.
+    return {"type": "done", "provider": link.label, "usage": {"error": str(exc)}}
+
+
+def stream_text(request: GenerateRequest) -> Iterator[Dict]:
+    """
+    Streaming generate_text: yields {"type": "delta", "text"} events then one {"type": "done", "provider", "usage"}.
+    Links are tried serially until one starts answering; there is no hedging once text has been sent.
+    """
+    config = get_config()
+    cached = _cached_stream(config, request)
+    if cached is not None:
+        yield from _cached_events(cached)
+        return
+    registry = get_registry(config)
+    chain = get_chain()
+    links = chain.links(request, config)
+    errors: List[str] = []
+    for link in links:
+        if not chain.begin(link, config):
+            errors.append(f"{link.label}: circuit open")
+            continue
+        started = time.perf_counter()
+        pieces: List[str] = []
+        usage: Dict = {}
+        try:
+            client: BaseProvider = registry.get(link.provider, config, **link.overrides)
+            for chunk in client.stream(prompt=request.prompt, max_tokens=request.max_tokens, temperature=request.temperature):
+                if isinstance(chunk, dict):
+                    usage.update(chunk)
+                    continue
+                pieces.append(chunk)
+                yield {"type": "delta", "text": chunk}
+        except ProviderError as exc:
+            chain.failed(link, config, time.perf_counter() - started)
+            if pieces:
+                yield _stream_failed(link, exc)
+                return
+            errors.append(f"{link.label}: {exc}")
+            continue
+        except BaseException:
+            # client went away mid-stream: no verdict on the upstream
+            chain.breaker(link, config).release()
+            raise
+        chain.succeeded(link, config, time.perf_counter() - started)
+        yield _stream_done(config, request, ChainResult(link, usage=usage, provider=client.name, errors=errors), links, pieces)
+        return
+    yield from _fallback_events(request, request.provider or config.provider, errors)
+
+
+async def astream_text(request: GenerateRequest) -> AsyncIterator[Dict]:
+    """
+    Async streaming variant used by /generate when stream=true.
+    """
+    config = get_config()
+    cached = await _cache_io(config, _cached_stream, config, request)
+    if cached is not None:
+        for event in _cached_events(cached):
+            yield event
+        return
+    registry = get_registry(config)
+    chain = get_chain()
+    links = chain.links(request, config)
+    errors: List[str] = []
+    for link in links:
+        if not chain.begin(link, config):
+            errors.append(f"{link.label}: circuit open")
+            continue
+        started = time.perf_counter()
+        pieces: List[str] = []
+        usage: Dict = {}
+        try:
+            client = registry.lookup(link.provider, config, **link.overrides)
+            if client is None:
+                client = await asyncio.to_thread(registry.get, link.provider, config, **link.overrides)
+            async for chunk in client.astream(prompt=request.prompt, max_tokens=request.max_tokens, temperature=request.temperature):
+                if isinstance(chunk, dict):
+                    usage.update(chunk)
+                    continue
+                pieces.append(chunk)
+                yield {"type": "delta", "text": chunk}
+        except ProviderError as exc:
+            chain.failed(link, config, time.perf_counter() - started)
+            if pieces:
+                yield _stream_failed(link, exc)
+                return
+            errors.append(f"{link.label}: {exc}")
+            continue
+        except BaseException:
+            chain.breaker(link, config).release()
+            raise
+        chain.succeeded(link, config, time.perf_counter() - started)
+        result = ChainResult(link, usage=usage, provider=client.name, errors=errors)
+        yield await _cache_io(config, _stream_done, config, request, result, links, pieces)
+        return
+    for event in _fallback_events(request, request.provider or config.provider, errors):
+        yield event
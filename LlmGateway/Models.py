@@ -18,6 +18,13 @@ class GenerateRequest(BaseModel):
         description="Override base URL (e.g. https://api.openai.com/v1 or a self-hosted OpenAI-compatible gateway).",
     )
     api_model: Optional[str] = Field(default=None, description="Override model name for the provider call.")
+    temperature: Optional[float] = Field(
+        default=None, ge=0.0, le=2.0, description="Sampling temperature; omitted means the provider default."
+    )
+    priority: Optional[str] = Field(
+        default=None, description="Admission priority: high_safety requests are queued ahead of normal ones."
+    )
+    stream: bool = Field(default=False, description="Stream the completion as server-sent events instead of one JSON body.")
 
 
 class GenerateResponse(BaseModel):
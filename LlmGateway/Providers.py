@@ -1,13 +1,23 @@
 from __future__ import annotations
 
+import asyncio
+import json
+import queue
 import textwrap
+import threading
+from urllib.parse import urlsplit
 # from typing import Dict, Tuple
-from typing import Dict, Optional, Tuple
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple, Union
 
 import httpx
 
+from Common.Tokens import get_counter, register, usage as token_usage
+
 from .Config import LlmConfig
 
+# Streaming providers yield text deltas and finish with one usage dict.
+StreamChunk = Union[str, Dict]
+
 
 class ProviderError(RuntimeError):
     """Custom error so callers can decide how to fall back."""
@@ -16,9 +26,36 @@ class ProviderError(RuntimeError):
 class BaseProvider:
     name: str
 
-    def generate(self, prompt: str, max_tokens: int | None) -> Tuple[str, Dict]:
+    def generate(self, prompt: str, max_tokens: int | None, temperature: float | None = None) -> Tuple[str, Dict]:
         raise NotImplementedError
 
+    async def agenerate(self, prompt: str, max_tokens: int | None, temperature: float | None = None) -> Tuple[str, Dict]:
+        """
+        Async entry point; blocking providers run in a worker thread by default.
+        """
+        return await asyncio.to_thread(self.generate, prompt, max_tokens, temperature)
+
+    def stream(self, prompt: str, max_tokens: int | None, temperature: float | None = None) -> Iterator[StreamChunk]:
+        """
+        Yield text deltas then a usage dict; non-streaming providers emit the whole reply once.
+        """
+        text, usage = self.generate(prompt, max_tokens, temperature)
+        yield text
+        yield usage
+
+    async def astream(self, prompt: str, max_tokens: int | None, temperature: float | None = None) -> AsyncIterator[StreamChunk]:
+        # Drive the blocking iterator from a worker thread, one chunk at a time.
+        iterator = self.stream(prompt, max_tokens, temperature)
+        done = object()
+        while True:
+            chunk = await asyncio.to_thread(next, iterator, done)
+            if chunk is done:
+                return
+            yield chunk
+
+    def warm(self) -> None:
+        """Load heavy resources ahead of the first request (no-op by default)."""
+
 
 class MockProvider(BaseProvider):
     name = "mock"
@@ -27,10 +64,12 @@ class MockProvider(BaseProvider):
         preview = prompt.strip().splitlines()[0][:120]
         return f"(mock) Notional model reply based on: {preview}"
 
-    def generate(self, prompt: str, max_tokens: int | None) -> Tuple[str, Dict]:
+    def generate(self, prompt: str, max_tokens: int | None, temperature: float | None = None) -> Tuple[str, Dict]:
         text = self._mock_response(prompt)
-        usage = {"prompt_tokens": len(prompt.split()), "completion_tokens": 0, "total_tokens": len(prompt.split())}
-        return text, usage
+        return text, token_usage(get_counter(), prompt, text)
+
+    async def agenerate(self, prompt: str, max_tokens: int | None, temperature: float | None = None) -> Tuple[str, Dict]:
+        return self.generate(prompt, max_tokens, temperature)
 
 
 class TinyLocalProvider(BaseProvider):
@@ -42,14 +81,27 @@ class TinyLocalProvider(BaseProvider):
     """
 
     name = "tiny-local"
+    # sampling needs a positive temperature, so 0/None means this default
+    default_temperature = 0.8
 
-    def __init__(self, model_id: str):
+    def __init__(self, model_id: str, max_new_tokens: int = 512, timeout: float = 60.0):
         self.model_id = model_id
+        self.max_new_tokens = max_new_tokens
+        # longest wait for the next streamed token before the stream is abandoned
+        self.timeout = timeout
+        self.context_window: Optional[int] = None
+        self._counter = None
         self._pipeline = None
+        self._load_lock = threading.Lock()
 
     def _lazy_load(self):
         if self._pipeline is not None:
             return
+        with self._load_lock:
+            if self._pipeline is None:
+                self._load()
+
+    def _load(self):
         try:
             from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
             import torch  # noqa: F401
@@ -62,28 +114,208 @@ class TinyLocalProvider(BaseProvider):
         model = AutoModelForCausalLM.from_pretrained(self.model_id)
         # keep on CPU for portability
         self._pipeline = pipeline("text-generation", model=model, tokenizer=tokenizer, device=-1)
+        config = model.config
+        self.context_window = getattr(config, "n_positions", None) or getattr(config, "max_position_embeddings", None)
+        # accounting shares the tokenizer that is already loaded
+        self._counter = register(self.model_id, tokenizer)
 
-    def generate(self, prompt: str, max_tokens: int | None) -> Tuple[str, Dict]:
+    def warm(self) -> None:
         self._lazy_load()
-        max_new_tokens = max_tokens or 512  # pipeline requires a value; fall back to a safe length
+
+    def _max_new_tokens(self, prompt: str, max_tokens: int | None) -> int:
+        """
+        The requested (or default) completion length, capped by what the prompt leaves of the context window.
+        """
+        wanted = max_tokens or self.max_new_tokens
+        if not self.context_window:
+            return wanted
+        prompt_tokens = self._counter.count(prompt)
+        room = self.context_window - prompt_tokens
+        if room < 1:
+            raise ProviderError(f"Prompt does not fit {self.model_id}: {prompt_tokens} tokens, context window {self.context_window}")
+        return min(wanted, room)
+
+    def _usage(self, prompt: str, completion: str) -> Dict:
+        return token_usage(self._counter, prompt, completion, model=self.model_id)
+
+    def generate(self, prompt: str, max_tokens: int | None, temperature: float | None = None) -> Tuple[str, Dict]:
+        self._lazy_load()
+        max_new_tokens = self._max_new_tokens(prompt, max_tokens)
         outputs = self._pipeline(
             prompt,
             max_new_tokens=max_new_tokens,
             do_sample=True,
-            temperature=0.8,
+            temperature=temperature if temperature else self.default_temperature,
             num_return_sequences=1,
             pad_token_id=self._pipeline.tokenizer.eos_token_id,
         )
         generated = outputs[0]["generated_text"]
         completion = generated[len(prompt) :].strip() if generated.startswith(prompt) else generated
         completion = completion or generated
-        usage = {
-            "model": self.model_id,
-            "prompt_tokens": len(prompt.split()),
-            "completion_tokens": len(completion.split()),
-            "total_tokens": len(prompt.split()) + len(completion.split()),
-        }
-        return completion, usage
+        return completion, self._usage(prompt, completion)
+
+    def stream(self, prompt: str, max_tokens: int | None, temperature: float | None = None) -> Iterator[StreamChunk]:
+        self._lazy_load()
+        import torch
+        from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+
+        class _Stop(StoppingCriteria):
+            # checked after every generated token; set once the consumer is gone
+            def __call__(self, input_ids, scores, **kwargs):
+                return torch.full((input_ids.shape[0],), stop.is_set(), dtype=torch.bool, device=input_ids.device)
+
+        tokenizer = self._pipeline.tokenizer
+        model = self._pipeline.model
+        max_new_tokens = self._max_new_tokens(prompt, max_tokens)
+        inputs = tokenizer(prompt, return_tensors="pt")
+        streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=self.timeout)
+        stop = threading.Event()
+        failure: list = []
+
+        def run() -> None:
+            try:
+                model.generate(
+                    **inputs,
+                    streamer=streamer,
+                    stopping_criteria=StoppingCriteriaList([_Stop()]),
+                    max_new_tokens=max_new_tokens,
+                    do_sample=True,
+                    temperature=temperature if temperature else self.default_temperature,
+                    pad_token_id=tokenizer.eos_token_id,
+                )
+            except BaseException as exc:  # noqa: BLE001 - surfaced to the consumer below
+                failure.append(exc)
+            finally:
+                # without the end signal the consumer would wait for tokens that never come
+                streamer.end()
+
+        worker = threading.Thread(target=run, daemon=True)
+        worker.start()
+        pieces = []
+        try:
+            for piece in streamer:
+                if piece:
+                    pieces.append(piece)
+                    yield piece
+        except queue.Empty as exc:
+            raise ProviderError(f"{self.model_id} produced no token for {self.timeout:g}s") from exc
+        finally:
+            # consumer disconnect (GeneratorExit), timeout or error: stop generating at the next token
+            stop.set()
+        worker.join()
+        if failure:
+            raise ProviderError(f"{self.model_id} generation failed: {failure[0]}") from failure[0]
+        yield self._usage(prompt, "".join(pieces))
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class HttpPool:
+    """
+    Keep-alive httpx clients shared by every openai-compatible provider.
+
+    One sync client serves in-process callers, one AsyncClient serves the async
+    /generate path; both reuse TCP/TLS connections across requests. Per-host
+    semaphores cap how many calls may be in flight against one upstream.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_keepalive: int = 20,
+        keepalive_expiry: float = 30.0,
+        per_host_limit: int = 16,
+        http2: bool = True,
+    ):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.per_host_limit = max(1, per_host_limit)
+        # HTTP/2 needs the optional `h2` package (pip install httpx[http2])
+        self.http2 = http2 and _http2_available()
+        self._client: httpx.Client | None = None
+        self._async_client: httpx.AsyncClient | None = None
+        self._host_slots: Dict[str, threading.BoundedSemaphore] = {}
+        self._async_host_slots: Dict[str, asyncio.Semaphore] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(limits=self.limits, http2=self.http2)
+        return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        if self._async_client is None:
+            with self._lock:
+                if self._async_client is None:
+                    self._async_client = httpx.AsyncClient(limits=self.limits, http2=self.http2)
+        return self._async_client
+
+    def host_slot(self, url: str) -> threading.BoundedSemaphore:
+        host = urlsplit(url).netloc
+        with self._lock:
+            return self._host_slots.setdefault(host, threading.BoundedSemaphore(self.per_host_limit))
+
+    def async_host_slot(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        with self._lock:
+            return self._async_host_slots.setdefault(host, asyncio.Semaphore(self.per_host_limit))
+
+    async def aclose(self) -> None:
+        with self._lock:
+            client, async_client = self._client, self._async_client
+            self._client, self._async_client = None, None
+            self._async_host_slots.clear()
+        if client is not None:
+            client.close()
+        if async_client is not None:
+            await async_client.aclose()
+
+
+# LlmConfig fields the pool is built from; a reload cannot resize live httpx clients
+HTTP_POOL_FIELDS = ("http_max_connections", "http_max_keepalive", "http_keepalive_expiry", "http_per_host_limit", "http2")
+
+_http_pool: HttpPool | None = None
+_http_pool_config: LlmConfig | None = None
+_http_pool_lock = threading.Lock()
+
+
+def get_http_pool(config: LlmConfig) -> HttpPool:
+    global _http_pool, _http_pool_config
+    if _http_pool is None:
+        with _http_pool_lock:
+            if _http_pool is None:
+                _http_pool_config = config
+                _http_pool = HttpPool(
+                    max_connections=config.http_max_connections,
+                    max_keepalive=config.http_max_keepalive,
+                    keepalive_expiry=config.http_keepalive_expiry,
+                    per_host_limit=config.http_per_host_limit,
+                    http2=config.http2,
+                )
+    return _http_pool
+
+
+def http_pool_pending(config: LlmConfig) -> List[str]:
+    """
+    Pool settings in `config` that differ from the ones the running pool was built with.
+    """
+    built = _http_pool_config
+    if built is None:
+        return []
+    return [name for name in HTTP_POOL_FIELDS if getattr(built, name) != getattr(config, name)]
 
 
 class OpenAICompatibleProvider(BaseProvider):
@@ -95,50 +327,169 @@ class OpenAICompatibleProvider(BaseProvider):
     """
 
     name = "openai-compatible"
+    default_temperature = 0.7
 
-    def __init__(self, api_key: str | None, base_url: str | None, model: str, timeout: float):
+    def __init__(self, api_key: str | None, base_url: str | None, model: str, timeout: float, pool: HttpPool | None = None):
         if not api_key:
             raise ProviderError("LLM_API_KEY is required for openai-like provider")
         self.api_key = api_key
         self.base_url = (base_url or "https://api.openai.com/v1").rstrip("/")
         self.model = model
         self.timeout = timeout
+        self.pool = pool or HttpPool()
 
-    def generate(self, prompt: str, max_tokens: int | None) -> Tuple[str, Dict]:
+    def _request(self, prompt: str, max_tokens: int | None, temperature: float | None = None) -> Tuple[str, Dict, Dict]:
         url = f"{self.base_url}/chat/completions"
         headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
-        payload = {"model": self.model, "messages": [{"role": "user", "content": prompt}], "temperature": 0.7}
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": prompt}],
+            "temperature": self.default_temperature if temperature is None else temperature,
+        }
         if max_tokens is not None:
             payload["max_tokens"] = max_tokens
-        with httpx.Client(timeout=self.timeout) as client:
-            resp = client.post(url, headers=headers, json=payload)
-            try:
-                resp.raise_for_status()
-            except httpx.HTTPStatusError as exc:
-                raise ProviderError(f"API provider failed: {exc.response.text}") from exc
+        return url, headers, payload
+
+    def _with_usage(self, usage: Dict, prompt: str, completion: str) -> Dict:
+        # some compatible servers omit usage (or ignore stream_options); count locally then
+        if "prompt_tokens" not in usage:
+            usage.update(token_usage(get_counter(self.model), prompt, completion))
+        usage.update({"model": self.model})
+        return usage
+
+    def _parse(self, resp: httpx.Response, prompt: str) -> Tuple[str, Dict]:
+        try:
+            resp.raise_for_status()
+        except httpx.HTTPStatusError as exc:
+            raise ProviderError(f"API provider failed: {exc.response.text}") from exc
         data = resp.json()
         if not data.get("choices"):
             raise ProviderError(f"API provider returned no choices: {data}")
         message = data["choices"][0].get("message", {})
         text = message.get("content") or ""
-        usage = data.get("usage", {})
-        usage.update({"model": self.model})
-        return text, usage
+        return text, self._with_usage(data.get("usage") or {}, prompt, text)
+
+    def _stream_request(self, prompt: str, max_tokens: int | None, temperature: float | None = None) -> Tuple[str, Dict, Dict]:
+        url, headers, payload = self._request(prompt, max_tokens, temperature)
+        payload.update({"stream": True, "stream_options": {"include_usage": True}})
+        return url, headers, payload
+
+    def _parse_sse_line(self, line: str, usage: Dict) -> Optional[str]:
+        """
+        Decode one upstream SSE line; returns the text delta (if any) and collects usage.
+        """
+        if not line.startswith("data:"):
+            return None
+        data = line[len("data:") :].strip()
+        if not data or data == "[DONE]":
+            return None
+        try:
+            chunk = json.loads(data)
+        except ValueError as exc:
+            raise ProviderError(f"Malformed stream frame from {self.name}: {data[:200]!r}") from exc
+        if chunk.get("usage"):
+            usage.update(chunk["usage"])
+        choices = chunk.get("choices") or []
+        if not choices:
+            return None
+        return (choices[0].get("delta") or {}).get("content") or None
+
+    def stream(self, prompt: str, max_tokens: int | None, temperature: float | None = None) -> Iterator[StreamChunk]:
+        url, headers, payload = self._stream_request(prompt, max_tokens, temperature)
+        usage: Dict = {}
+        pieces = []
+        try:
+            with self.pool.host_slot(url), self.pool.client.stream(
+                "POST", url, headers=headers, json=payload, timeout=self.timeout
+            ) as resp:
+                if resp.status_code >= 400:
+                    resp.read()
+                    raise ProviderError(f"API provider failed: {resp.text}")
+                for line in resp.iter_lines():
+                    delta = self._parse_sse_line(line, usage)
+                    if delta:
+                        pieces.append(delta)
+                        yield delta
+        except httpx.HTTPError as exc:
+            raise ProviderError(f"API provider unreachable: {exc!r}") from exc
+        yield self._with_usage(usage, prompt, "".join(pieces))
+
+    async def astream(self, prompt: str, max_tokens: int | None, temperature: float | None = None) -> AsyncIterator[StreamChunk]:
+        url, headers, payload = self._stream_request(prompt, max_tokens, temperature)
+        usage: Dict = {}
+        pieces = []
+        try:
+            async with self.pool.async_host_slot(url), self.pool.async_client.stream(
+                "POST", url, headers=headers, json=payload, timeout=self.timeout
+            ) as resp:
+                if resp.status_code >= 400:
+                    await resp.aread()
+                    raise ProviderError(f"API provider failed: {resp.text}")
+                async for line in resp.aiter_lines():
+                    delta = self._parse_sse_line(line, usage)
+                    if delta:
+                        pieces.append(delta)
+                        yield delta
+        except httpx.HTTPError as exc:
+            raise ProviderError(f"API provider unreachable: {exc!r}") from exc
+        yield self._with_usage(usage, prompt, "".join(pieces))
+
+    def generate(self, prompt: str, max_tokens: int | None, temperature: float | None = None) -> Tuple[str, Dict]:
+        url, headers, payload = self._request(prompt, max_tokens, temperature)
+        try:
+            with self.pool.host_slot(url):
+                resp = self.pool.client.post(url, headers=headers, json=payload, timeout=self.timeout)
+        except httpx.HTTPError as exc:
+            raise ProviderError(f"API provider unreachable: {exc!r}") from exc
+        return self._parse(resp, prompt)
+
+    async def agenerate(self, prompt: str, max_tokens: int | None, temperature: float | None = None) -> Tuple[str, Dict]:
+        url, headers, payload = self._request(prompt, max_tokens, temperature)
+        try:
+            async with self.pool.async_host_slot(url):
+                resp = await self.pool.async_client.post(url, headers=headers, json=payload, timeout=self.timeout)
+        except httpx.HTTPError as exc:
+            raise ProviderError(f"API provider unreachable: {exc!r}") from exc
+        return self._parse(resp, prompt)
+
+
+_PROVIDER_ALIASES: Dict[str, str] = {
+    "mock": "mock",
+    "local": "tiny-local",
+    "tiny": "tiny-local",
+    "tiny-local": "tiny-local",
+    "openai": "openai-compatible",
+    "deepseek": "openai-compatible",
+    "api": "openai-compatible",
+    "openai-compatible": "openai-compatible",
+    "openai_compatible": "openai-compatible",
+}
+
+
+def normalize_provider(name: str | None) -> str:
+    """
+    Map user-facing provider aliases onto the canonical provider name.
+    """
+    normalized = (name or "tiny-local").lower()
+    return _PROVIDER_ALIASES.get(normalized, normalized)
 
 
 def get_provider(
     name: str, config: LlmConfig, *, api_key: Optional[str] = None, base_url: Optional[str] = None, api_model: Optional[str] = None
 ) -> BaseProvider:
-    normalized = (name or config.provider or "tiny-local").lower()
-    if normalized in {"mock"}:
+    normalized = normalize_provider(name or config.provider)
+    if normalized == "mock":
         return MockProvider()
-    if normalized in {"local", "tiny", "tiny-local"}:
-        return TinyLocalProvider(model_id=config.local_model)
-    if normalized in {"openai", "deepseek", "api", "openai-compatible", "openai_compatible"}:
+    if normalized == "tiny-local":
+        return TinyLocalProvider(
+            model_id=config.local_model, max_new_tokens=config.local_max_new_tokens, timeout=config.request_timeout
+        )
+    if normalized == "openai-compatible":
         return OpenAICompatibleProvider(
             api_key=api_key or config.api_key,
             base_url=base_url or config.base_url,
             model=api_model or config.api_model,
             timeout=config.request_timeout,
+            pool=get_http_pool(config),
         )
     raise ProviderError(f"Unknown provider '{normalized}'")
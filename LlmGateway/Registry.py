@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Tuple
+
+from .Config import LlmConfig
+from .Providers import BaseProvider, ProviderError, get_provider, normalize_provider
+
+RegistryKey = Tuple[str, str, str, str]
+
+
+@dataclass
+class _Entry:
+    provider: BaseProvider
+    load_seconds: float
+    created_at: float
+    last_used: float
+    hits: int = 0
+
+
+def _credentials_hash(api_key: Optional[str]) -> str:
+    if not api_key:
+        return "-"
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:12]
+
+
+def registry_key(
+    name: str, config: LlmConfig, *, api_key: Optional[str] = None, base_url: Optional[str] = None, api_model: Optional[str] = None
+) -> RegistryKey:
+    """
+    (provider, model, base_url, credentials-hash) — the same inputs get_provider uses.
+    """
+    kind = normalize_provider(name or config.provider)
+    if kind == "openai-compatible":
+        return (kind, api_model or config.api_model, base_url or config.base_url or "", _credentials_hash(api_key or config.api_key))
+    if kind == "tiny-local":
+        return (kind, config.local_model, "", "-")
+    return (kind, "", "", "-")
+
+
+class ProviderRegistry:
+    """
+    Process-wide pool of ready-to-use providers.
+
+    Loaded pipelines and HTTP clients survive across requests; idle entries are
+    dropped after `ttl` seconds and the least recently used one is evicted once
+    `max_entries` is exceeded.
+    """
+
+    def __init__(self, max_entries: int = 8, ttl: float = 1800.0):
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self._entries: "OrderedDict[RegistryKey, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._key_locks: Dict[RegistryKey, threading.Lock] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_seconds_total = 0.0
+        self._warm_errors: Dict[RegistryKey, str] = {}
+
+    def get(
+        self, name: str, config: LlmConfig, *, api_key: Optional[str] = None, base_url: Optional[str] = None, api_model: Optional[str] = None
+    ) -> BaseProvider:
+        key = registry_key(name, config, api_key=api_key, base_url=base_url, api_model=api_model)
+        entry = self._lookup(key)
+        if entry is not None:
+            return entry.provider
+
+        # Load outside the registry lock so one slow model does not block other keys.
+        with self._key_lock(key):
+            entry = self._lookup(key)
+            if entry is not None:
+                return entry.provider
+            with self._lock:
+                self.misses += 1
+            started = time.perf_counter()
+            provider = get_provider(name, config, api_key=api_key, base_url=base_url, api_model=api_model)
+            provider.warm()
+            load_seconds = time.perf_counter() - started
+            now = time.monotonic()
+            with self._lock:
+                self.load_seconds_total += load_seconds
+                self._entries[key] = _Entry(provider, load_seconds, now, now)
+                self._evict_locked(now)
+            return provider
+
+    def lookup(
+        self, name: str, config: LlmConfig, *, api_key: Optional[str] = None, base_url: Optional[str] = None, api_model: Optional[str] = None
+    ) -> Optional[BaseProvider]:
+        """
+        Return an already-loaded provider without ever loading one (safe on the event loop).
+        """
+        entry = self._lookup(registry_key(name, config, api_key=api_key, base_url=base_url, api_model=api_model))
+        return entry.provider if entry is not None else None
+
+    def warm(self, names: Iterable[str], config: LlmConfig) -> Dict[str, str]:
+        """
+        Load providers ahead of the first request; failures are reported, not raised.
+        """
+        report: Dict[str, str] = {}
+        for name in names:
+            key = registry_key(name, config)
+            try:
+                self.get(name, config)
+                self._warm_errors.pop(key, None)
+                report[name] = "ok"
+            except ProviderError as exc:
+                self._warm_errors[key] = str(exc)
+                report[name] = f"error: {exc}"
+        return report
+
+    def state(self, name: str, config: LlmConfig) -> str:
+        """
+        ready | loading | error | cold for the default credentials of `name`; never loads or counts a hit.
+        """
+        key = registry_key(name, config)
+        with self._lock:
+            if key in self._entries:
+                return "ready"
+            key_lock = self._key_locks.get(key)
+        if key_lock is not None and key_lock.locked():
+            return "loading"
+        return "error" if key in self._warm_errors else "cold"
+
+    def clear(self, kind: Optional[str] = None) -> None:
+        """
+        Drop every loaded provider, or only those of one canonical kind (e.g. "openai-compatible").
+        """
+        with self._lock:
+            if kind is None:
+                self._entries.clear()
+                self._key_locks.clear()
+                return
+            for key in [key for key in self._entries if key[0] == kind]:
+                self._entries.pop(key)
+                self._key_locks.pop(key, None)
+
+    def resize(self, max_entries: int, ttl: float) -> None:
+        with self._lock:
+            self.max_entries = max(1, max_entries)
+            self.ttl = ttl
+            self._evict_locked(time.monotonic())
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "evictions": self.evictions,
+                "load_seconds_total": round(self.load_seconds_total, 4),
+                "max_entries": self.max_entries,
+                "ttl": self.ttl,
+                "entries": [
+                    {
+                        "provider": key[0],
+                        "model": key[1],
+                        "base_url": key[2],
+                        "credentials": key[3],
+                        "hits": entry.hits,
+                        "load_seconds": round(entry.load_seconds, 4),
+                        "age_seconds": round(now - entry.created_at, 1),
+                        "idle_seconds": round(now - entry.last_used, 1),
+                    }
+                    for key, entry in self._entries.items()
+                ],
+            }
+
+    def _lookup(self, key: RegistryKey) -> Optional[_Entry]:
+        now = time.monotonic()
+        with self._lock:
+            self._evict_locked(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            entry.last_used = now
+            entry.hits += 1
+            self.hits += 1
+            return entry
+
+    def _key_lock(self, key: RegistryKey) -> threading.Lock:
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _evict_locked(self, now: float) -> None:
+        expired = [key for key, entry in self._entries.items() if self.ttl > 0 and now - entry.last_used > self.ttl]
+        for key in expired:
+            self._drop_locked(key)
+        while len(self._entries) > self.max_entries:
+            self._drop_locked(next(iter(self._entries)))
+
+    def _drop_locked(self, key: RegistryKey) -> None:
+        # Dropping the reference lets in-flight callers finish before the model is freed.
+        self._entries.pop(key)
+        self._key_locks.pop(key, None)
+        self.evictions += 1
+
+
+_registry: Optional[ProviderRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry(config: LlmConfig) -> ProviderRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = ProviderRegistry(max_entries=config.registry_max_entries, ttl=config.registry_ttl)
+    return _registry
@@ -1,10 +1,30 @@
-from fastapi import FastAPI
+import json
+import os
+from typing import Any, Dict, Optional
+
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+from Common.Admission import admit, admit_from_thread, install_admission
+from Common.Health import readiness_response
+from Common.Metrics import instrument_app
+from Common.Responses import FastJSONResponse, model_response
 
-from .Flows import chat_flow
+from .Flows import achat_flow, chat_stream_flow, preload, readiness
 from .Models import ChatRequest, OrchestratorResponse
+from .Safety import get_matcher, reload_rules
+from .Sessions import get_store
+from .Transport import get_transport
+
+app = FastAPI(title="Orchestrator", version="0.1.0", default_response_class=FastJSONResponse)
+instrument_app(app, "orchestrator")
+install_admission(app)
 
-app = FastAPI(title="Orchestrator", version="0.1.0")
+# Warm the in-process model stacks after startup instead of at import time
+PRELOAD = os.environ.get("ORCHESTRATOR_PRELOAD", "1").lower() not in {"0", "false", "no"}
 
 app.add_middleware(
     CORSMiddleware,
@@ -16,17 +36,161 @@ app.add_middleware(
 )
 
 
+@app.on_event("startup")
+def start_preload():
+    if PRELOAD:
+        preload()
+
+
+# Response keys a client may ask for with ?fields=, mapped to the model's field names
+RESPONSE_FIELDS = {field.alias: name for name, field in OrchestratorResponse.__fields__.items()}
+# meta kept with ?verbose=false: what a client acts on, not how the reply was produced
+# (spans, timings, llmParams, usage and template stay in the logs and /metrics)
+SLIM_META = ("flow", "traceId", "safety", "suggestedExercise")
+
+
+def _parse_fields(fields: Optional[str]) -> Optional[set]:
+    if not fields:
+        return None
+    wanted = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = wanted - RESPONSE_FIELDS.keys()
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"unknown fields: {', '.join(sorted(unknown))}; choose from {', '.join(sorted(RESPONSE_FIELDS))}")
+    return {RESPONSE_FIELDS[name] for name in wanted}
+
+
+def _slim(result: Dict[str, Any]) -> Dict[str, Any]:
+    # reply duplicates message, and the full score vector is only for charts and debugging
+    slim = {key: value for key, value in result.items() if value is not None and key != "reply"}
+    slim["meta"] = {key: value for key, value in result.get("meta", {}).items() if key in SLIM_META}
+    if result.get("emotion"):
+        slim["emotion"] = {key: value for key, value in result["emotion"].items() if key != "scores"}
+    return slim
+
+
+def _chat_response(result: Dict[str, Any], verbose: bool, fields: Optional[set]) -> FastJSONResponse:
+    # the flow assembled `result` from validated downstream models, so construct() skips a second validation
+    if not verbose:
+        return model_response(OrchestratorResponse.construct(**_slim(result)), include=fields, exclude_none=True)
+    return model_response(OrchestratorResponse.construct(**result), include=fields)
+
+
 @app.post("/chat", response_model=OrchestratorResponse)
-def chat(request: ChatRequest) -> OrchestratorResponse:
-    result = chat_flow(request.text)
-    return OrchestratorResponse(**result)
+async def chat(
+    request: ChatRequest,
+    http_request: Request,
+    verbose: bool = Query(True, description="false drops debug meta (spans, timings, llmParams, usage), emotion.scores, reply and nulls"),
+    fields: Optional[str] = Query(None, description="Comma-separated top-level fields to return, e.g. reply,emotion,session_id"),
+) -> FastJSONResponse:
+    include = _parse_fields(fields)
+    # the flow runs the safety check once and takes an admission slot only for model work, so
+    # safety blocks are never turned away; in-flight stages are cancelled if the client disconnects
+    result = await achat_flow(
+        request.text,
+        is_disconnected=http_request.is_disconnected,
+        session_id=request.session_id,
+        admission=lambda: admit("chat"),
+    )
+    return _chat_response(result, verbose, include)
+
+
+async def _sse(events):
+    try:
+        async for event in events:
+            yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+    finally:
+        # closes the upstream generator and returns an admission slot even on a disconnect
+        await events.aclose()
+
+
+async def _stepped(flow, first):
+    if first is not None:
+        yield first
+        async for event in iterate_in_threadpool(flow):
+            yield event
+
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    # meta (emotion/mode) arrives first, then token deltas; the sync flow is stepped in the threadpool.
+    # The first step validates, runs the safety check and takes the admission slot (model work only),
+    # so overload is still a plain 429/503 rather than a broken stream
+    flow = chat_stream_flow(request.text, request.session_id, admission=lambda: admit_from_thread("chat"))
+    first = await run_in_threadpool(next, flow, None)
+    # closing the flow returns the slot, even when the client left before the first chunk was pulled
+    return StreamingResponse(
+        _sse(_stepped(flow, first)), media_type="text/event-stream", background=BackgroundTask(flow.close)
+    )
+
+
+@app.on_event("shutdown")
+async def close_transport():
+    close = getattr(get_transport(), "aclose", None)
+    if close is not None:
+        await close()
+
+
+@app.get("/transport/stats")
+def transport_stats():
+    # transport mode, downstream URLs and circuit breaker states
+    return get_transport().stats()
+
+
+def _session_store():
+    store = get_store()
+    if store is None:
+        raise HTTPException(status_code=404, detail="sessions are disabled (SESSION_ENABLED=0)")
+    return store
+
+
+@app.get("/sessions/stats")
+def session_stats():
+    store = get_store()
+    return store.stats() if store is not None else {"enabled": False}
+
+
+@app.get("/sessions/{session_id}")
+def session_detail(session_id: str):
+    # summary, recent turns and emotion trajectory, plus the size of the history the next prompt gets
+    store = _session_store()
+    session = store.get(session_id)
+    if session is None:
+        raise HTTPException(status_code=404, detail="unknown or expired session")
+    return store.describe(session)
+
+
+@app.delete("/sessions/{session_id}")
+def session_delete(session_id: str):
+    if not _session_store().delete(session_id):
+        raise HTTPException(status_code=404, detail="unknown or expired session")
+    return {"deleted": session_id}
+
+
+@app.get("/safety/rules")
+def safety_rules():
+    return get_matcher().describe()
+
+
+@app.post("/safety/reload")
+def safety_reload():
+    # rebuilds the automaton from SAFETY_RULES_FILE; the old one keeps serving if this fails
+    try:
+        return reload_rules()
+    except (OSError, ValueError) as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
 
 
 @app.get("/health")
 def health():
+    # liveness only: validation and safety blocks are served even while models load
     return {"status": "ok"}
 
 
+@app.get("/health/ready")
+def health_ready():
+    return readiness_response(readiness())
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -1,9 +1,14 @@
 from __future__ import annotations
 
+import asyncio
+import contextlib
+import os
 import sys
+import threading
+import time
 import uuid
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, AsyncContextManager, Awaitable, Callable, ContextManager, Coroutine, Dict, Iterator, Optional, Tuple
 
 # Ensure parent directory is on sys.path so sibling modules can be imported when running locally.
 BASE_DIR = Path(__file__).resolve().parent
@@ -11,15 +16,35 @@ PARENT_DIR = BASE_DIR.parent
 if str(PARENT_DIR) not in sys.path:
     sys.path.append(str(PARENT_DIR))
 
-from EmotionService.Core import analyze_text
-from LlmGateway.Core import generate_text
+from Common.LogSink import get_sink
+from Common.Metrics import REGISTRY, Trace, current_spans, span, trace, traced
 from LlmGateway.Models import GenerateRequest
-from PromptEngine.Core import build_prompt
-from PromptEngine.Models import PromptRequest
-from .Safety import hard_stop_message, is_safe
-import datetime
+from PromptEngine.Models import PromptRequest, PromptResponse
+from .Safety import SafetyMatch, check, hard_stop_message
+from .Sessions import get_store
+# In-process Cores or pooled HTTP to the standalone services, per ORCHESTRATOR_TRANSPORT
+from .Transport import get_transport
 
 LOG_FILE = BASE_DIR.parent / ".logs" / "orchestrator.log"
+# Start a normal-mode generation while classification runs; discarded if the real prompt differs.
+SPECULATIVE_GENERATION = os.environ.get("ORCHESTRATOR_SPECULATIVE", "1").lower() not in {"0", "false", "no"}
+DISCONNECT_POLL_SECONDS = float(os.environ.get("ORCHESTRATOR_DISCONNECT_POLL", "0.25"))
+
+FLOW_OUTCOMES = REGISTRY.counter("mindful_chat_outcomes_total", "Chat flow results by status.", ("status",))
+
+def preload() -> threading.Thread:
+    """
+    Warm the transport (load models in-process, or open pooled connections) in a daemon
+    thread; requests that arrive meanwhile are still served (cheap paths immediately).
+    """
+    thread = threading.Thread(target=get_transport().preload, name="orchestrator-preload", daemon=True)
+    thread.start()
+    return thread
+
+
+def readiness() -> Dict[str, str]:
+    return get_transport().readiness()
+
 
 def _new_trace_id() -> str:
     return str(uuid.uuid4())
@@ -35,71 +60,139 @@ def _emotion_payload(emotion) -> Dict[str, Any]:
     }
 
 
-def _error_response(code: str, detail: str, trace_id: str, meta: Dict[str, Any]) -> Dict[str, Any]:
+def _error_response(
+    code: str, detail: str, trace_id: str, meta: Dict[str, Any], session_id: Optional[str] = None
+) -> Dict[str, Any]:
     _append_log(trace_id, status="error", detail=detail)
     return {
         "message": "Something went wrong. Please try again.",
         "trace_id": trace_id,
         "meta": meta,
         "emotion": None,
+        "session_id": session_id,
         "error": {"code": code, "detail": detail},
     }
 
 
-def _append_log(trace_id: str, *, status: str, user_text: str | None = None, detail: str | None = None):
-    try:
-        LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
-        timestamp = datetime.datetime.utcnow().isoformat() + "Z"
-        with LOG_FILE.open("a", encoding="utf-8") as f:
-            f.write(f"\n--- Orchestrator @ {timestamp} ---\n")
-            f.write(f"trace_id: {trace_id}\n")
-            f.write(f"status: {status}\n")
-            if user_text:
-                f.write(f"user_text: {user_text}\n")
-            if detail:
-                f.write(f"detail: {detail}\n")
-    except Exception:
-        pass
-
-
-def chat_flow(text: str) -> Dict[str, Any]:
+def _open_session(session_id: Optional[str]) -> Tuple[Optional[str], Optional[str]]:
+    """
+    (session id, rendered history) for this turn; a new session when none or an expired id
+    was sent, and (None, None) when sessions are disabled.
+    """
+    store = get_store()
+    if store is None:
+        return None, None
+    with span("orchestrator.session"):
+        session = store.load(session_id)
+        return session["id"], store.history(session)
+
+
+def _record_turn(session_id: Optional[str], text: str, reply: str, emotion: Optional[Dict[str, Any]]) -> None:
+    store = get_store()
+    if store is None or session_id is None:
+        return
+    with span("orchestrator.session"):
+        store.record(session_id, text, reply, emotion)
+
+
+def _append_log(
+    trace_id: str, *, status: str, user_text: str | None = None, detail: str | None = None, spans: list | None = None
+):
+    FLOW_OUTCOMES.inc(status=status)
+    # enqueue only; the sink's writer thread does the file I/O
+    record: Dict[str, Any] = {"service": "orchestrator", "trace_id": trace_id, "status": status}
+    if user_text:
+        record["user_text"] = user_text
+    if detail:
+        record["detail"] = detail
+    if spans:
+        record["spans"] = spans
+    get_sink(LOG_FILE).emit(record)
+
+
+def _blocked_response(
+    text: str, trace_id: str, base_meta: Dict[str, Any], match: SafetyMatch, session_id: Optional[str] = None
+) -> Dict[str, Any]:
+    message = hard_stop_message()
+    # the matched rule goes to the audit log only, not back to the client
+    _append_log(trace_id, status="blocked", user_text=text, detail=f"safety_block:{match.rule.id}")
+    # kept in the session so the next turn's prompt knows the conversation reached this point
+    _record_turn(session_id, text, message, None)
+    return {
+        "message": message,
+        "reply": message,
+        "trace_id": trace_id,
+        "mode": "high_safety",
+        "meta": {**base_meta, "safety": "blocked", "suggestedExercise": "grounding"},
+        "emotion": None,
+        "session_id": session_id,
+    }
+
+
+def _analyze_and_prompt(text: str, trace_id: str, history: Optional[str] = None) -> Tuple[Any, PromptResponse]:
+    transport = get_transport()
+    emotion = transport.analyze(text)
+    prompt = transport.build_prompt(
+        PromptRequest(
+            text=text,
+            emotion=emotion.emotion,
+            intensity=emotion.intensity,
+            context={"traceId": trace_id},
+            history=history,
+        )
+    )
+    return emotion, prompt
+
+
+def _check_safety(text: str) -> Optional[SafetyMatch]:
+    """
+    The rule that blocks this text, or None when it is safe.
+    """
+    with span("orchestrator.safety"):
+        return check(text)
+
+
+def _with_spans(result: Dict[str, Any], current) -> Dict[str, Any]:
+    # every span carries the trace id, so meta.spans can be matched against the service logs
+    result.setdefault("meta", {})["spans"] = list(current.spans)
+    return result
+
+
+def _suggested_exercise(mode: str) -> str:
+    return "grounding" if mode == "high_safety" else "thought_log"
+
+
+def chat_flow(text: str, session_id: Optional[str] = None) -> Dict[str, Any]:
     trace_id = _new_trace_id()
+    with trace(trace_id) as current:
+        return _with_spans(_chat_flow(text, trace_id, session_id), current)
+
+
+def _chat_flow(text: str, trace_id: str, session_id: Optional[str] = None) -> Dict[str, Any]:
     base_meta: Dict[str, Any] = {"flow": "chat", "traceId": trace_id}
 
     if not text or not text.strip():
-        return _error_response("invalid_input", "text is required", trace_id, base_meta)
+        return _error_response("invalid_input", "text is required", trace_id, base_meta, session_id)
 
-    if not is_safe(text):
-        message = hard_stop_message()
-        _append_log(trace_id, status="blocked", user_text=text, detail="safety_block")
-        return {
-            "message": message,
-            "reply": message,
-            "trace_id": trace_id,
-            "mode": "high_safety",
-            "meta": {**base_meta, "safety": "blocked", "suggestedExercise": "grounding"},
-            "emotion": None,
-        }
+    session_id, history = _open_session(session_id)
+    match = _check_safety(text)
+    if match is not None:
+        return _blocked_response(text, trace_id, base_meta, match, session_id)
 
     try:
-        emotion = analyze_text(text)
-        prompt = build_prompt(
-            PromptRequest(
-                text=text,
-                emotion=emotion.emotion,
-                intensity=emotion.intensity,
-                context={"traceId": trace_id},
-            )
-        )
+        emotion, prompt = _analyze_and_prompt(text, trace_id, history)
         mode = prompt.mode
-        llm_response = generate_text(
+        llm_response = get_transport().generate(
             GenerateRequest(
                 prompt=prompt.prompt,
+                priority=mode,
             )
         )
 
-        suggested = "grounding" if mode == "high_safety" else "thought_log"
-        _append_log(trace_id, status="ok", user_text=text)
+        suggested = _suggested_exercise(mode)
+        payload = _emotion_payload(emotion)
+        _record_turn(session_id, text, llm_response.text, payload)
+        _append_log(trace_id, status="ok", user_text=text, spans=current_spans())
         return {
             "message": llm_response.text,
             "reply": llm_response.text,
@@ -113,12 +206,255 @@ def chat_flow(text: str) -> Dict[str, Any]:
                 "usage": llm_response.usage,
                 "suggestedExercise": suggested,
             },
-            "emotion": _emotion_payload(emotion),
+            "emotion": payload,
             "suggestedExercise": suggested,
+            "session_id": session_id,
         }
     except Exception as exc:
         _append_log(trace_id, status="exception", user_text=text, detail=str(exc))
-        return _error_response("internal_error", str(exc), trace_id, base_meta)
+        return _error_response("internal_error", str(exc), trace_id, base_meta, session_id)
+
+
+def chat_stream_flow(
+    text: str, session_id: Optional[str] = None, admission: Optional[Callable[[], ContextManager]] = None
+) -> Iterator[Dict[str, Any]]:
+    """
+    Streaming chat_flow: a "meta" event (emotion/mode) as soon as classification is done,
+    then "delta" events as the LLM produces text, then "done" with provider/usage.
+    Failures surface as a single "error" event carrying the usual error payload.
+    The turn is added to the session once the whole reply has streamed.
+    `admission()` (e.g. Common.Admission.admit_from_thread) is held from after the safety
+    check until the stream ends, so invalid input and safety blocks never take a slot.
+    """
+    trace_id = _new_trace_id()
+    return traced(Trace(trace_id), _chat_stream_flow(text, trace_id, session_id, admission))
+
+
+def _chat_stream_flow(
+    text: str, trace_id: str, session_id: Optional[str], admission: Optional[Callable[[], ContextManager]]
+) -> Iterator[Dict[str, Any]]:
+    base_meta: Dict[str, Any] = {"flow": "chat", "traceId": trace_id}
+
+    if not text or not text.strip():
+        yield {"type": "error", **_error_response("invalid_input", "text is required", trace_id, base_meta, session_id)}
+        return
+
+    session_id, history = _open_session(session_id)
+    match = _check_safety(text)
+    if match is not None:
+        blocked = _blocked_response(text, trace_id, base_meta, match, session_id)
+        yield {"type": "meta", **{k: v for k, v in blocked.items() if k not in {"message", "reply"}}}
+        yield {"type": "delta", "text": blocked["message"]}
+        yield {"type": "done", "meta": {}}
+        return
+
+    # AdmissionRejected propagates from the first step, before the response has started
+    with admission() if admission is not None else contextlib.nullcontext():
+        try:
+            emotion, prompt = _analyze_and_prompt(text, trace_id, history)
+            mode = prompt.mode
+            suggested = _suggested_exercise(mode)
+            payload = _emotion_payload(emotion)
+            yield {
+                "type": "meta",
+                "trace_id": trace_id,
+                "mode": mode,
+                "meta": {
+                    **base_meta,
+                    "template": prompt.meta.get("template", "unknown"),
+                    "llmParams": prompt.llmParams,
+                    "suggestedExercise": suggested,
+                },
+                "emotion": payload,
+                "suggestedExercise": suggested,
+                "session_id": session_id,
+            }
+
+            done_meta: Dict[str, Any] = {}
+            parts = []
+            for event in get_transport().stream(GenerateRequest(prompt=prompt.prompt, priority=mode, stream=True)):
+                if event["type"] == "delta":
+                    parts.append(event["text"])
+                    yield {"type": "delta", "text": event["text"]}
+                else:
+                    done_meta = {"llm_provider": event["provider"], "usage": event["usage"]}
+            _record_turn(session_id, text, "".join(parts), payload)
+            done_meta["spans"] = current_spans()
+            _append_log(trace_id, status="ok", user_text=text, spans=done_meta["spans"])
+            yield {"type": "done", "meta": done_meta}
+        except Exception as exc:
+            _append_log(trace_id, status="exception", user_text=text, detail=str(exc))
+            yield {"type": "error", **_error_response("internal_error", str(exc), trace_id, base_meta, session_id)}
+
+
+class ClientDisconnected(Exception):
+    """Raised when the caller went away before the flow finished."""
+
+
+async def _timed(stage: str, awaitable: Awaitable, timings: Dict[str, float]):
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[stage] = round((time.perf_counter() - started) * 1000, 2)
+
+
+def _timed_task(stage: str, coro: Coroutine, timings: Dict[str, float]) -> asyncio.Task:
+    # the task wraps the coroutine directly, so cancelling it before it starts still closes it
+    started = time.perf_counter()
+    task = asyncio.create_task(coro)
+    task.add_done_callback(lambda _: timings.__setitem__(stage, round((time.perf_counter() - started) * 1000, 2)))
+    return task
+
+
+async def _cancel(*tasks: Optional[asyncio.Task]) -> None:
+    pending = [t for t in tasks if t is not None and not t.done()]
+    for task in pending:
+        task.cancel()
+    # Let cancellations land so nothing keeps running after the flow returns.
+    await asyncio.gather(*pending, return_exceptions=True)
+
+
+async def _until_disconnected(is_disconnected: Callable[[], Awaitable[bool]], stop: asyncio.Event) -> None:
+    # Starlette's is_disconnected() runs in an already-cancelled anyio scope that can swallow a
+    # task.cancel() landing at that moment, so the loop also ends on `stop` rather than only on cancel
+    while not stop.is_set():
+        if await is_disconnected():
+            return
+        await asyncio.sleep(DISCONNECT_POLL_SECONDS)
+
+
+async def _run_stages(text: str, trace_id: str, timings: Dict[str, float], history: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Overlap classification with a speculative normal-mode generation.
+
+    The normal-mode prompt is built up front from placeholder emotion values; if the
+    real prompt (built after classification) comes out identical, the in-flight
+    generation is reused, otherwise it is cancelled and the real prompt is sent.
+    """
+    transport = get_transport()
+    emotion_task = _timed_task("emotion", transport.aanalyze(text), timings)
+    spec_prompt: Optional[PromptResponse] = None
+    spec_task: Optional[asyncio.Task] = None
+    try:
+        if SPECULATIVE_GENERATION:
+            spec_prompt = await transport.abuild_prompt(
+                PromptRequest(text=text, emotion="neutral", intensity=1, context={"traceId": trace_id}, history=history)
+            )
+            spec_task = _timed_task(
+                "speculative_generation", transport.agenerate(GenerateRequest(prompt=spec_prompt.prompt)), timings
+            )
+
+        emotion = await emotion_task
+        started = time.perf_counter()
+        prompt = await transport.abuild_prompt(
+            PromptRequest(
+                text=text, emotion=emotion.emotion, intensity=emotion.intensity, context={"traceId": trace_id}, history=history
+            )
+        )
+        timings["prompt"] = round((time.perf_counter() - started) * 1000, 2)
+
+        if spec_task is not None and spec_prompt is not None and prompt.prompt == spec_prompt.prompt:
+            speculative = "hit"
+            llm_response = await spec_task
+        else:
+            speculative = "discarded" if spec_task is not None else "off"
+            await _cancel(spec_task)
+            llm_response = await _timed("generation", transport.agenerate(GenerateRequest(prompt=prompt.prompt, priority=prompt.mode)), timings)
+    finally:
+        # A failed or cancelled stage must not leave its siblings running.
+        await _cancel(emotion_task, spec_task)
+
+    return {"emotion": emotion, "prompt": prompt, "llm_response": llm_response, "speculative": speculative}
+
+
+async def achat_flow(
+    text: str,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]] = None,
+    session_id: Optional[str] = None,
+    admission: Optional[Callable[[], AsyncContextManager]] = None,
+) -> Dict[str, Any]:
+    """
+    Async chat_flow with overlapped stages, per-stage timings in meta and
+    cancellation once `is_disconnected()` reports the client has gone.
+    `admission()` (e.g. Common.Admission.admit) is entered around the model stages only,
+    after the safety check, so a safety block is never queued or turned away.
+    """
+    trace_id = _new_trace_id()
+    # set before any stage task starts so tasks/threads inherit the trace
+    with trace(trace_id) as current:
+        return _with_spans(await _achat_flow(text, trace_id, is_disconnected, session_id, admission), current)
+
+
+async def _achat_flow(
+    text: str,
+    trace_id: str,
+    is_disconnected: Optional[Callable[[], Awaitable[bool]]],
+    session_id: Optional[str] = None,
+    admission: Optional[Callable[[], AsyncContextManager]] = None,
+) -> Dict[str, Any]:
+    base_meta: Dict[str, Any] = {"flow": "chat", "traceId": trace_id}
+    timings: Dict[str, float] = {}
+    started = time.perf_counter()
+
+    if not text or not text.strip():
+        return _error_response("invalid_input", "text is required", trace_id, base_meta, session_id)
+
+    # session reads/writes may hit SQLite (SESSION_DB), so they stay off the event loop
+    session_id, history = await asyncio.to_thread(_open_session, session_id)
+    safety_started = time.perf_counter()
+    match = _check_safety(text)
+    timings["safety"] = round((time.perf_counter() - safety_started) * 1000, 2)
+    if match is not None:
+        return await asyncio.to_thread(_blocked_response, text, trace_id, {**base_meta, "timings": timings}, match, session_id)
+
+    # AdmissionRejected propagates to the app's 429/503 handler
+    async with admission() if admission is not None else contextlib.nullcontext():
+        stages = asyncio.create_task(_run_stages(text, trace_id, timings, history))
+        finished = asyncio.Event()
+        watcher = asyncio.create_task(_until_disconnected(is_disconnected, finished)) if is_disconnected else None
+        try:
+            done, _ = await asyncio.wait({t for t in (stages, watcher) if t is not None}, return_when=asyncio.FIRST_COMPLETED)
+            if stages not in done:
+                raise ClientDisconnected()
+            result = stages.result()
+        except ClientDisconnected:
+            await _cancel(stages)
+            _append_log(trace_id, status="cancelled", user_text=text, detail="client_disconnected")
+            return _error_response("client_disconnected", "client closed the connection", trace_id, base_meta, session_id)
+        except Exception as exc:
+            _append_log(trace_id, status="exception", user_text=text, detail=str(exc))
+            return _error_response("internal_error", str(exc), trace_id, base_meta, session_id)
+        finally:
+            finished.set()
+            await _cancel(watcher)
+
+    emotion, prompt, llm_response = result["emotion"], result["prompt"], result["llm_response"]
+    mode = prompt.mode
+    suggested = _suggested_exercise(mode)
+    payload = _emotion_payload(emotion)
+    await asyncio.to_thread(_record_turn, session_id, text, llm_response.text, payload)
+    timings["total"] = round((time.perf_counter() - started) * 1000, 2)
+    _append_log(trace_id, status="ok", user_text=text, spans=current_spans())
+    return {
+        "message": llm_response.text,
+        "reply": llm_response.text,
+        "trace_id": trace_id,
+        "mode": mode,
+        "meta": {
+            **base_meta,
+            "template": prompt.meta.get("template", "unknown"),
+            "llmParams": prompt.llmParams,
+            "llm_provider": llm_response.provider,
+            "usage": llm_response.usage,
+            "suggestedExercise": suggested,
+            "speculative": result["speculative"],
+            "timings": timings,
+        },
+        "emotion": payload,
+        "suggestedExercise": suggested,
+        "session_id": session_id,
+    }
 
 
-__all__ = ["chat_flow"]
+__all__ = ["achat_flow", "chat_flow", "chat_stream_flow", "preload", "readiness"]
@@ -1,10 +1,15 @@
 from typing import Any, Dict, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, constr
+
+from .Sessions import SESSION_ID
 
 
 class ChatRequest(BaseModel):
     text: str = Field(..., description="User input text")
+    session_id: Optional[constr(regex=SESSION_ID.pattern)] = Field(
+        default=None, description="Conversation to continue; omit to start a new one (the response carries its id)"
+    )
 
 
 class OrchestratorResponse(BaseModel):
@@ -17,6 +22,7 @@ class OrchestratorResponse(BaseModel):
         default=None, alias="suggestedExercise", description="Recommended exercise based on emotion"
     )
     reply: Optional[str] = Field(default=None, description="Alias for message to match interface guide")
+    session_id: Optional[str] = Field(default=None, description="Session to send with the next turn")
     error: Optional[Dict[str, str]] = Field(default=None, description="{code, detail} if something went wrong")
 
     class Config:
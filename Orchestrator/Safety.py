@@ -1,11 +1,229 @@
 from __future__ import annotations
 
+import os
+import threading
+import unicodedata
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+# Legacy built-in list; only used when the rules file is missing or unreadable
 BLOCKLIST = {"suicide", "violence", "weapon"}
 
+RULES_FILE = Path(os.environ.get("SAFETY_RULES_FILE", Path(__file__).resolve().parent / "SafetyRules.txt"))
+
+
+def fold(text: str) -> str:
+    """
+    Unicode-aware normalisation shared by rules and input: compatibility forms + case folding.
+    """
+    return unicodedata.normalize("NFKC", text).casefold()
+
+
+def _is_cjk(ch: str) -> bool:
+    # CJK scripts are written without spaces, so word boundaries do not apply to them
+    code = ord(ch)
+    return (
+        0x3040 <= code <= 0x30FF  # Hiragana / Katakana
+        or 0x3400 <= code <= 0x4DBF  # CJK Extension A
+        or 0x4E00 <= code <= 0x9FFF  # CJK Unified Ideographs
+        or 0xAC00 <= code <= 0xD7AF  # Hangul syllables
+        or 0xF900 <= code <= 0xFAFF  # CJK Compatibility Ideographs
+        or 0x20000 <= code <= 0x2FA1F  # CJK Extensions B+
+    )
+
+
+def _is_word_char(ch: str) -> bool:
+    return ch.isalnum() or ch == "_"
+
+
+@dataclass(frozen=True)
+class SafetyRule:
+    """
+    One blocklist entry. A trailing `*` in the rules file makes it a prefix rule
+    ("weapon*" matches "weapons"); otherwise alphabetic edges must sit on word boundaries.
+    """
+
+    id: str
+    category: str
+    term: str
+    prefix: bool = False
+    boundaries: bool = True
+
+    @property
+    def left_boundary(self) -> bool:
+        return self.boundaries and _is_word_char(self.term[0]) and not _is_cjk(self.term[0])
+
+    @property
+    def right_boundary(self) -> bool:
+        return self.boundaries and not self.prefix and _is_word_char(self.term[-1]) and not _is_cjk(self.term[-1])
+
+
+@dataclass(frozen=True)
+class SafetyMatch:
+    rule: SafetyRule
+    start: int
+    end: int
+    text: str
+
+    def audit(self) -> Dict[str, object]:
+        return {"rule": self.rule.id, "category": self.rule.category, "match": self.text, "span": [self.start, self.end]}
+
+
+class SafetyMatcher:
+    """
+    Aho–Corasick automaton over all rule terms: one pass over the folded text,
+    independent of how many rules are loaded.
+    """
+
+    def __init__(self, rules: List[SafetyRule], source: str = "inline"):
+        self.rules = rules
+        self.source = source
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        self._build()
+
+    def _build(self) -> None:
+        goto, fail, out = self._goto, self._fail, self._out
+        own: List[List[int]] = [[]]
+        for idx, rule in enumerate(self.rules):
+            node = 0
+            for ch in rule.term:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[node][ch] = nxt
+                    goto.append({})
+                    fail.append(0)
+                    out.append(())
+                    own.append([])
+                node = nxt
+            own[node].append(idx)
+
+        # BFS so each node's fail target is finalised before its children need it
+        queue = deque(goto[0].values())
+        out[0] = tuple(own[0])
+        while queue:
+            node = queue.popleft()
+            out[node] = tuple(own[node]) + out[fail[node]]
+            for ch, child in goto[node].items():
+                state = fail[node]
+                while state and ch not in goto[state]:
+                    state = fail[state]
+                fail[child] = goto[state].get(ch, 0)
+                queue.append(child)
+
+    def _accept(self, rule: SafetyRule, folded: str, start: int, end: int) -> bool:
+        if rule.left_boundary and start > 0 and _is_word_char(folded[start - 1]):
+            return False
+        if rule.right_boundary and end < len(folded) and _is_word_char(folded[end]):
+            return False
+        return True
+
+    def find_all(self, text: str, first_only: bool = False) -> List[SafetyMatch]:
+        folded = fold(text)
+        goto, fail, out, rules = self._goto, self._fail, self._out, self.rules
+        matches: List[SafetyMatch] = []
+        node = 0
+        for pos, ch in enumerate(folded):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for idx in out[node]:
+                rule = rules[idx]
+                end = pos + 1
+                start = end - len(rule.term)
+                if self._accept(rule, folded, start, end):
+                    matches.append(SafetyMatch(rule=rule, start=start, end=end, text=folded[start:end]))
+                    if first_only:
+                        return matches
+        return matches
+
+    def find(self, text: str) -> Optional[SafetyMatch]:
+        matches = self.find_all(text, first_only=True)
+        return matches[0] if matches else None
+
+    def describe(self) -> Dict[str, object]:
+        categories: Dict[str, int] = {}
+        for rule in self.rules:
+            categories[rule.category] = categories.get(rule.category, 0) + 1
+        return {"source": self.source, "rules": len(self.rules), "states": len(self._goto), "categories": categories}
+
+
+def parse_rules(lines: List[str]) -> List[SafetyRule]:
+    """
+    Rules file format: `[category]` section headers, one term or phrase per line,
+    `#` comments, trailing `*` for prefix rules.
+    """
+    rules: Dict[str, SafetyRule] = {}
+    category = "default"
+    for raw in lines:
+        line = raw.split("#", 1)[0].strip()
+        if not line:
+            continue
+        if line.startswith("[") and line.endswith("]"):
+            category = line[1:-1].strip() or "default"
+            continue
+        prefix = line.endswith("*")
+        term = fold(line.rstrip("*").strip())
+        if not term:
+            continue
+        rule_id = f"{category}:{term}{'*' if prefix else ''}"
+        rules.setdefault(rule_id, SafetyRule(id=rule_id, category=category, term=term, prefix=prefix))
+    return list(rules.values())
+
+
+def _blocklist_matcher() -> SafetyMatcher:
+    # plain substring semantics, as the original `word in lowered` check
+    rules = [SafetyRule(id=f"blocklist:{w}", category="blocklist", term=fold(w), boundaries=False) for w in sorted(BLOCKLIST)]
+    return SafetyMatcher(rules, source="builtin")
+
+
+def load_matcher(path: Path = RULES_FILE) -> SafetyMatcher:
+    rules = parse_rules(Path(path).read_text(encoding="utf-8").splitlines())
+    if not rules:
+        raise ValueError(f"No safety rules found in {path}")
+    return SafetyMatcher(rules, source=str(path))
+
+
+_matcher: Optional[SafetyMatcher] = None
+_lock = threading.Lock()
+
+
+def get_matcher() -> SafetyMatcher:
+    global _matcher
+    if _matcher is None:
+        with _lock:
+            if _matcher is None:
+                try:
+                    _matcher = load_matcher()
+                except (OSError, ValueError):
+                    _matcher = _blocklist_matcher()
+    return _matcher
+
+
+def reload_rules(path: Optional[Path] = None) -> Dict[str, object]:
+    """
+    Rebuild the automaton from disk and swap it in; on failure the current matcher stays active.
+    """
+    global _matcher
+    matcher = load_matcher(path or RULES_FILE)
+    with _lock:
+        _matcher = matcher
+    return matcher.describe()
+
+
+def check(text: str) -> Optional[SafetyMatch]:
+    """
+    First matching rule, or None when the text is safe.
+    """
+    return get_matcher().find(text)
+
 
 def is_safe(text: str) -> bool:
-    lowered = text.lower()
-    return not any(word in lowered for word in BLOCKLIST)
+    return check(text) is None
 
 
 def hard_stop_message() -> str:
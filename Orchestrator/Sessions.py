@@ -0,0 +1,195 @@
+"""
+Server-side conversation sessions for /chat.
+
+A session keeps only what the next prompt needs, in bounded space:
+- the last SESSION_RECENT_TURNS turns verbatim (each side clipped to SESSION_TURN_CHARS),
+- a rolling summary of everything older, one extractive line per turn, oldest lines
+  dropped once it exceeds SESSION_SUMMARY_TOKENS,
+- an emotion trajectory updated per turn: the last SESSION_TRAJECTORY_LEN points plus
+  a per-label EWMA of the classifier scores.
+history() renders these into the prompt's {history} block, whose size stays roughly
+constant however long the conversation gets, so clients send only the new message.
+
+Sessions live in a Common.Cache.TtlLruCache: LRU over SESSION_MAX_ENTRIES, expiring
+SESSION_TTL seconds after the last turn; SESSION_DB adds its SQLite tier, so sessions
+survive restarts and eviction from memory.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from Common.Cache import TtlLruCache
+from Common.Tokens import estimate_tokens
+
+SESSION_ENABLED = os.environ.get("SESSION_ENABLED", "1").lower() not in {"0", "false", "no"}
+SESSION_MAX_ENTRIES = int(os.environ.get("SESSION_MAX_ENTRIES", "10000"))
+SESSION_TTL = float(os.environ.get("SESSION_TTL", "1800"))
+SESSION_DB = os.environ.get("SESSION_DB") or None
+SESSION_RECENT_TURNS = int(os.environ.get("SESSION_RECENT_TURNS", "3"))
+SESSION_TURN_CHARS = int(os.environ.get("SESSION_TURN_CHARS", "300"))
+SESSION_SUMMARY_TOKENS = int(os.environ.get("SESSION_SUMMARY_TOKENS", "200"))
+SESSION_TRAJECTORY_LEN = int(os.environ.get("SESSION_TRAJECTORY_LEN", "20"))
+TRAJECTORY_ALPHA = 0.3
+# Summary lines keep roughly the first sentence of each side of a turn
+GIST_CHARS = 120
+# Trajectory points shown in the prompt (the full window is kept in the session)
+TREND_POINTS = 5
+
+SESSION_ID = re.compile(r"^[A-Za-z0-9_-]{1,128}$")
+_SENTENCE_END = re.compile(r"(?<=[.!?。！？])\s*")
+
+
+def _clip(text: str, limit: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[: limit - 1].rstrip() + "…"
+
+
+def _gist(text: str) -> str:
+    first = _SENTENCE_END.split(" ".join(text.split()), maxsplit=1)[0]
+    return _clip(first, GIST_CHARS)
+
+
+def new_session(session_id: Optional[str] = None) -> Dict[str, Any]:
+    now = time.time()
+    return {
+        "id": session_id or uuid.uuid4().hex,
+        "created_at": now,
+        "updated_at": now,
+        "turns": 0,
+        "recent": [],
+        "summary": [],
+        "summarized": 0,
+        "trajectory": [],
+        "ewma": {},
+    }
+
+
+class SessionStore:
+    """
+    Bounded session state; record() is a read-modify-write under one lock, so concurrent
+    turns on the same session both land.
+    """
+
+    def __init__(self, cache: TtlLruCache):
+        self.cache = cache
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Optional[Dict[str, Any]]:
+        return self.cache.get(session_id)
+
+    def load(self, session_id: Optional[str]) -> Dict[str, Any]:
+        """
+        The stored session, or a new empty one (with the client's id when it sent one that expired).
+        """
+        existing = self.get(session_id) if session_id else None
+        return existing if existing is not None else new_session(session_id)
+
+    def delete(self, session_id: str) -> bool:
+        return self.cache.invalidate(session_id) > 0
+
+    def record(self, session_id: str, user_text: str, reply: str, emotion: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Append one turn; emotion is the normalized payload ({label, intensity, score, scores}) or None.
+        """
+        with self._lock:
+            current = self.get(session_id)
+            # never mutate the cached object in place; a reader may hold it
+            session = dict(current) if current is not None else new_session(session_id)
+            session["turns"] += 1
+            session["updated_at"] = time.time()
+            turn = {
+                "user": _clip(user_text, SESSION_TURN_CHARS),
+                "assistant": _clip(reply, SESSION_TURN_CHARS),
+                "emotion": emotion["label"] if emotion else None,
+                "intensity": emotion["intensity"] if emotion else None,
+            }
+            recent = [*session["recent"], turn]
+            summary = list(session["summary"])
+            while len(recent) > max(0, SESSION_RECENT_TURNS):
+                summary.append(self._summary_line(recent.pop(0)))
+                session["summarized"] += 1
+            while len(summary) > 1 and estimate_tokens("\n".join(summary)) > SESSION_SUMMARY_TOKENS:
+                summary.pop(0)
+            session["recent"], session["summary"] = recent, summary
+            if emotion:
+                self._update_trajectory(session, emotion)
+            self.cache.set(session["id"], session)
+            return session
+
+    @staticmethod
+    def _summary_line(turn: Dict[str, Any]) -> str:
+        feeling = f" ({turn['emotion']}, {turn['intensity']}/4)" if turn.get("emotion") else ""
+        return f"- User{feeling}: {_gist(turn['user'])} / You: {_gist(turn['assistant'])}"
+
+    @staticmethod
+    def _update_trajectory(session: Dict[str, Any], emotion: Dict[str, Any]) -> None:
+        point = {
+            "turn": session["turns"],
+            "emotion": emotion["label"],
+            "intensity": emotion["intensity"],
+            "score": round(float(emotion.get("score", 0.0)), 4),
+        }
+        session["trajectory"] = [*session["trajectory"], point][-max(1, SESSION_TRAJECTORY_LEN) :]
+        ewma = dict(session["ewma"])
+        for label, score in (emotion.get("scores") or {}).items():
+            previous = ewma.get(label)
+            ewma[label] = round(score if previous is None else previous + TRAJECTORY_ALPHA * (score - previous), 4)
+        session["ewma"] = ewma
+
+    @staticmethod
+    def history(session: Dict[str, Any]) -> str:
+        """
+        The prompt's {history} block; empty for the first turn.
+        """
+        if not session["turns"]:
+            return ""
+        lines: List[str] = []
+        if session["summary"]:
+            omitted = session["summarized"] - len(session["summary"])
+            suffix = f", {omitted} oldest omitted" if omitted > 0 else ""
+            lines.append(f"Earlier in this conversation ({session['summarized']} turns{suffix}):")
+            lines.extend(session["summary"])
+        if session["recent"]:
+            lines.append("Most recent turns:")
+            for turn in session["recent"]:
+                lines.append(f"User: {turn['user']}")
+                lines.append(f"You: {turn['assistant']}")
+        if session["trajectory"]:
+            trend = " -> ".join(f"{p['emotion']}({p['intensity']})" for p in session["trajectory"][-TREND_POINTS:])
+            line = f"Emotion over recent turns: {trend}"
+            if session["ewma"]:
+                line += f"; overall leaning {max(session['ewma'], key=session['ewma'].get)}"
+            lines.append(line)
+        return "\n".join(lines)
+
+    @staticmethod
+    def describe(session: Dict[str, Any]) -> Dict[str, Any]:
+        return {**session, "history_tokens": estimate_tokens(SessionStore.history(session))}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"enabled": True, **self.cache.stats()}
+
+
+_store: Optional[SessionStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> Optional[SessionStore]:
+    """
+    Process-wide session store; None when SESSION_ENABLED=0.
+    """
+    global _store
+    if not SESSION_ENABLED:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                cache = TtlLruCache(max_entries=SESSION_MAX_ENTRIES, ttl=SESSION_TTL, db_path=SESSION_DB, namespace="session")
+                _store = SessionStore(cache)
+    return _store
@@ -0,0 +1,365 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Iterator, Optional
+
+import httpx
+
+from Common.Metrics import span
+from Common.Resilience import CircuitBreaker, CircuitOpenError, backoff_delays
+from EmotionService.Models import EmotionResponse, EmotionResult
+from LlmGateway.Models import GenerateRequest, GenerateResponse
+from PromptEngine.Models import PromptRequest, PromptResponse
+
+# inprocess: import the service Cores into this process (one copy of every model per worker)
+# http: call the standalone services over pooled HTTP, so orchestrator workers stay slim
+TRANSPORT = os.environ.get("ORCHESTRATOR_TRANSPORT", "inprocess").lower()
+EMOTION_SERVICE_URL = os.environ.get("EMOTION_SERVICE_URL", "http://127.0.0.1:8001")
+PROMPT_SERVICE_URL = os.environ.get("PROMPT_SERVICE_URL", "http://127.0.0.1:8002")
+LLM_GATEWAY_URL = os.environ.get("LLM_GATEWAY_URL", "http://127.0.0.1:8004")
+HTTP_TIMEOUT = float(os.environ.get("ORCHESTRATOR_HTTP_TIMEOUT", "10"))
+# Generation can legitimately take much longer than classification
+LLM_TIMEOUT = float(os.environ.get("ORCHESTRATOR_LLM_TIMEOUT", "90"))
+HTTP_RETRIES = int(os.environ.get("ORCHESTRATOR_HTTP_RETRIES", "2"))
+HTTP_BACKOFF_MS = float(os.environ.get("ORCHESTRATOR_HTTP_BACKOFF_MS", "100"))
+HTTP_MAX_CONNECTIONS = int(os.environ.get("ORCHESTRATOR_HTTP_MAX_CONNECTIONS", "100"))
+HTTP_MAX_KEEPALIVE = int(os.environ.get("ORCHESTRATOR_HTTP_MAX_KEEPALIVE", "20"))
+BREAKER_FAILURES = int(os.environ.get("ORCHESTRATOR_BREAKER_FAILURES", "5"))
+BREAKER_RESET_SECONDS = float(os.environ.get("ORCHESTRATOR_BREAKER_RESET", "30"))
+
+RETRYABLE_STATUS = {502, 503, 504}
+
+
+class TransportError(RuntimeError):
+    """A downstream service call failed (after retries) or was rejected by its circuit breaker."""
+
+
+class ServiceTransport:
+    """
+    How the orchestrator reaches EmotionService, PromptEngine and LlmGateway.
+    """
+
+    name: str
+
+    def analyze(self, text: str) -> EmotionResult:
+        raise NotImplementedError
+
+    async def aanalyze(self, text: str) -> EmotionResult:
+        return await asyncio.to_thread(self.analyze, text)
+
+    def build_prompt(self, request: PromptRequest) -> PromptResponse:
+        raise NotImplementedError
+
+    async def abuild_prompt(self, request: PromptRequest) -> PromptResponse:
+        # the first call may load the PROMPT_TOKENIZER tokenizer from disk
+        return await asyncio.to_thread(self.build_prompt, request)
+
+    def generate(self, request: GenerateRequest) -> GenerateResponse:
+        raise NotImplementedError
+
+    async def agenerate(self, request: GenerateRequest) -> GenerateResponse:
+        return await asyncio.to_thread(self.generate, request)
+
+    def stream(self, request: GenerateRequest) -> Iterator[Dict[str, Any]]:
+        """
+        Gateway stream events: {"type": "delta", "text"} ... then {"type": "done", "provider", "usage"}.
+        """
+        raise NotImplementedError
+
+    def preload(self) -> None:
+        """Make the first request cheap (load models / open connections)."""
+
+    def readiness(self) -> Dict[str, str]:
+        return {}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"transport": self.name}
+
+
+class InProcessTransport(ServiceTransport):
+    """
+    Direct calls into the sibling Core modules. They are imported on first use, so
+    selecting the http transport never loads the models into this process.
+    """
+
+    name = "inprocess"
+
+    def analyze(self, text: str) -> EmotionResult:
+        from EmotionService.Core import analyze_text
+
+        return analyze_text(text)
+
+    def build_prompt(self, request: PromptRequest) -> PromptResponse:
+        from PromptEngine.Core import build_prompt
+
+        return build_prompt(request)
+
+    def generate(self, request: GenerateRequest) -> GenerateResponse:
+        from LlmGateway.Core import generate_text
+
+        return generate_text(request)
+
+    async def agenerate(self, request: GenerateRequest) -> GenerateResponse:
+        from LlmGateway.Core import agenerate_text
+
+        return await agenerate_text(request)
+
+    def stream(self, request: GenerateRequest) -> Iterator[Dict[str, Any]]:
+        from LlmGateway.Core import stream_text
+
+        return stream_text(request)
+
+    def preload(self) -> None:
+        from EmotionService.Core import preload
+        from LlmGateway.Core import warm_providers
+        from PromptEngine.Core import warm_tokenizer
+
+        preload(background=False)
+        warm_tokenizer()
+        warm_providers()
+
+    def readiness(self) -> Dict[str, str]:
+        from EmotionService.Core import model_state
+        from LlmGateway.Core import provider_states
+
+        return {"classifier": model_state(), **provider_states()}
+
+
+class HttpTransport(ServiceTransport):
+    """
+    Pooled keep-alive HTTP calls to the standalone services, with per-service
+    timeouts, jittered retries for transient failures and a circuit breaker each.
+    """
+
+    name = "http"
+
+    def __init__(
+        self,
+        emotion_url: str = EMOTION_SERVICE_URL,
+        prompt_url: str = PROMPT_SERVICE_URL,
+        llm_url: str = LLM_GATEWAY_URL,
+        *,
+        timeout: float = HTTP_TIMEOUT,
+        llm_timeout: float = LLM_TIMEOUT,
+        retries: int = HTTP_RETRIES,
+        backoff_ms: float = HTTP_BACKOFF_MS,
+    ):
+        self.urls = {"emotion": emotion_url.rstrip("/"), "prompt": prompt_url.rstrip("/"), "llm": llm_url.rstrip("/")}
+        self.timeouts = {"emotion": timeout, "prompt": timeout, "llm": llm_timeout}
+        self.retries = max(0, retries)
+        self.backoff_ms = backoff_ms
+        self.breakers = {
+            service: CircuitBreaker(f"orchestrator->{service}", BREAKER_FAILURES, BREAKER_RESET_SECONDS)
+            for service in self.urls
+        }
+        self._limits = httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=HTTP_MAX_KEEPALIVE)
+        self._client: Optional[httpx.Client] = None
+        self._async_client: Optional[httpx.AsyncClient] = None
+        self._lock = threading.Lock()
+
+    @property
+    def client(self) -> httpx.Client:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = httpx.Client(limits=self._limits)
+        return self._client
+
+    @property
+    def async_client(self) -> httpx.AsyncClient:
+        # created lazily on the serving event loop
+        if self._async_client is None:
+            self._async_client = httpx.AsyncClient(limits=self._limits)
+        return self._async_client
+
+    def _retryable(self, exc: Exception, idempotent: bool) -> bool:
+        # a connect error means the request never reached the service, so it is always safe to resend
+        if isinstance(exc, httpx.ConnectError):
+            return True
+        if not idempotent:
+            return False
+        if isinstance(exc, httpx.TimeoutException):
+            return True
+        return isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code in RETRYABLE_STATUS
+
+    def _is_failure(self, exc: Exception) -> bool:
+        # 4xx means our request was bad, not that the service is unhealthy; neither is a
+        # load-shed reply from admission control (429, or 503 with Retry-After): the service
+        # is up and answering, and opening the breaker would only turn shedding into an outage
+        if isinstance(exc, httpx.HTTPStatusError):
+            status = exc.response.status_code
+            if status == 503 and "retry-after" in exc.response.headers:
+                return False
+            return status >= 500
+        return isinstance(exc, httpx.HTTPError)
+
+    def _post(self, service: str, path: str, payload: Dict[str, Any], *, idempotent: bool = True) -> Dict[str, Any]:
+        breaker = self.breakers[service]
+        delays = backoff_delays(self.retries, self.backoff_ms)
+        with span(f"transport.{service}"):
+            while True:
+                try:
+                    breaker.check()
+                except CircuitOpenError as exc:
+                    raise TransportError(str(exc)) from exc
+                try:
+                    response = self.client.post(f"{self.urls[service]}{path}", json=payload, timeout=self.timeouts[service])
+                    response.raise_for_status()
+                    breaker.record_success()
+                    return response.json()
+                except httpx.HTTPError as exc:
+                    if self._is_failure(exc):
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                    delay = next(delays, None) if self._retryable(exc, idempotent) else None
+                    if delay is None:
+                        raise TransportError(f"{service} {path} failed: {exc}") from exc
+                    time.sleep(delay)
+                except BaseException:
+                    # cancelled or unexpected: free a half-open probe so the breaker can recover
+                    breaker.release()
+                    raise
+
+    async def _apost(self, service: str, path: str, payload: Dict[str, Any], *, idempotent: bool = True) -> Dict[str, Any]:
+        breaker = self.breakers[service]
+        delays = backoff_delays(self.retries, self.backoff_ms)
+        with span(f"transport.{service}"):
+            while True:
+                try:
+                    breaker.check()
+                except CircuitOpenError as exc:
+                    raise TransportError(str(exc)) from exc
+                try:
+                    response = await self.async_client.post(
+                        f"{self.urls[service]}{path}", json=payload, timeout=self.timeouts[service]
+                    )
+                    response.raise_for_status()
+                    breaker.record_success()
+                    return response.json()
+                except httpx.HTTPError as exc:
+                    if self._is_failure(exc):
+                        breaker.record_failure()
+                    else:
+                        breaker.record_success()
+                    delay = next(delays, None) if self._retryable(exc, idempotent) else None
+                    if delay is None:
+                        raise TransportError(f"{service} {path} failed: {exc}") from exc
+                    await asyncio.sleep(delay)
+                except BaseException:
+                    # cancelled or unexpected: free a half-open probe so the breaker can recover
+                    breaker.release()
+                    raise
+
+    def analyze(self, text: str) -> EmotionResult:
+        return EmotionResponse(**self._post("emotion", "/analyze", {"text": text})).emotion
+
+    async def aanalyze(self, text: str) -> EmotionResult:
+        return EmotionResponse(**await self._apost("emotion", "/analyze", {"text": text})).emotion
+
+    def build_prompt(self, request: PromptRequest) -> PromptResponse:
+        return PromptResponse(**self._post("prompt", "/prompt", request.dict()))
+
+    async def abuild_prompt(self, request: PromptRequest) -> PromptResponse:
+        return PromptResponse(**await self._apost("prompt", "/prompt", request.dict()))
+
+    def generate(self, request: GenerateRequest) -> GenerateResponse:
+        payload = request.dict(exclude_none=True)
+        return GenerateResponse(**self._post("llm", "/generate", payload, idempotent=False))
+
+    async def agenerate(self, request: GenerateRequest) -> GenerateResponse:
+        payload = request.dict(exclude_none=True)
+        return GenerateResponse(**await self._apost("llm", "/generate", payload, idempotent=False))
+
+    def stream(self, request: GenerateRequest) -> Iterator[Dict[str, Any]]:
+        # No retries: once tokens have been forwarded the request cannot be replayed transparently.
+        breaker = self.breakers["llm"]
+        try:
+            breaker.check()
+        except CircuitOpenError as exc:
+            raise TransportError(str(exc)) from exc
+        payload = {**request.dict(exclude_none=True), "stream": True}
+        try:
+            with self.client.stream(
+                "POST", f"{self.urls['llm']}/generate", json=payload, timeout=self.timeouts["llm"]
+            ) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if line.startswith("data:"):
+                        try:
+                            event = json.loads(line[len("data:") :].strip())
+                        except ValueError as exc:
+                            raise TransportError(f"llm /generate stream sent a malformed event: {line[:200]!r}") from exc
+                        yield event
+            breaker.record_success()
+        except httpx.HTTPError as exc:
+            if self._is_failure(exc):
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise TransportError(f"llm /generate stream failed: {exc}") from exc
+        except BaseException:
+            # consumer stopped reading (GeneratorExit), cancellation or a bad frame
+            breaker.release()
+            raise
+
+    def preload(self) -> None:
+        # open one keep-alive connection per service so the first request skips the handshake
+        for url in self.urls.values():
+            try:
+                self.client.get(f"{url}/health", timeout=self.timeouts["emotion"])
+            except httpx.HTTPError:
+                pass
+
+    def readiness(self) -> Dict[str, str]:
+        states: Dict[str, str] = {}
+        for service, url in self.urls.items():
+            try:
+                response = self.client.get(f"{url}/health/ready", timeout=self.timeouts["emotion"])
+                states[service] = "ready" if response.status_code == 200 else "loading"
+            except httpx.HTTPError:
+                states[service] = "unreachable"
+        return states
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "transport": self.name,
+            "services": {
+                service: {"url": url, **self.breakers[service].stats()} for service, url in self.urls.items()
+            },
+        }
+
+    async def aclose(self) -> None:
+        if self._async_client is not None:
+            await self._async_client.aclose()
+            self._async_client = None
+        if self._client is not None:
+            self._client.close()
+            self._client = None
+
+
+TRANSPORTS = ("inprocess", "http")
+
+_transport: Optional[ServiceTransport] = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> ServiceTransport:
+    """
+    Process-wide transport selected by ORCHESTRATOR_TRANSPORT.
+    """
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                if TRANSPORT == "http":
+                    _transport = HttpTransport()
+                elif TRANSPORT == "inprocess":
+                    _transport = InProcessTransport()
+                else:
+                    raise ValueError(f"Unknown ORCHESTRATOR_TRANSPORT '{TRANSPORT}'. Choose one of: {', '.join(TRANSPORTS)}")
+    return _transport
@@ -1,14 +1,33 @@
 from fastapi import FastAPI
 
+from Common.Health import readiness_response
+from Common.Metrics import instrument_app
+from Common.Responses import FastJSONResponse, model_response
+
 from .Core import build_prompt
 from .Models import PromptRequest, PromptResponse
+from .Registry import get_registry
 
-app = FastAPI(title="PromptEngine", version="0.1.0")
+app = FastAPI(title="PromptEngine", version="0.1.0", default_response_class=FastJSONResponse)
+instrument_app(app, "prompt")
 
 
 @app.post("/prompt", response_model=PromptResponse)
-def prompt(request: PromptRequest) -> PromptResponse:
-    return build_prompt(request)
+def prompt(request: PromptRequest) -> FastJSONResponse:
+    return model_response(build_prompt(request))
+
+
+@app.get("/templates")
+def templates():
+    registry = get_registry()
+    return {"templates": registry.describe(), "errors": registry.errors}
+
+
+@app.post("/templates/reload")
+def reload_templates():
+    # the watcher does this on its own; exposed for immediate rollouts
+    registry = get_registry()
+    return {"changed": registry.reload(), "templates": registry.describe()}
 
 
 @app.get("/health")
@@ -16,6 +35,12 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/health/ready")
+def health_ready():
+    # templates are the only thing PromptEngine loads
+    return readiness_response({"templates": "ready" if get_registry().describe() else "error"})
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -1,17 +1,24 @@
 from __future__ import annotations
 
-from pathlib import Path
-from typing import Dict, Tuple
+import os
+from typing import Any, Dict, List, Tuple
 
-from .Models import PromptRequest, PromptResponse
+from Common.Metrics import span
+from Common.Tokens import TokenCounter, get_counter, trim
 
-BASE_DIR = Path(__file__).resolve().parent
-TEMPLATES_DIR = BASE_DIR / "Templates"
+from .Models import PromptRequest, PromptResponse
+from .Registry import get_registry
 
 DEFAULT_LLM_PARAMS: Dict[str, Dict[str, float]] = {
     "normal": {"temperature": 0.4, "maxTokens": 320},
     "high_safety": {"temperature": 0.2, "maxTokens": 256},
 }
+# The target model's context window; a rendered prompt may use it minus the mode's maxTokens. 0 disables trimming.
+PROMPT_CONTEXT_TOKENS = int(os.environ.get("PROMPT_CONTEXT_TOKENS", "4096"))
+# Model whose tokenizer counts prompt tokens (e.g. LLM_LOCAL_MODEL or LLM_API_MODEL); empty uses the estimator
+PROMPT_TOKENIZER = os.environ.get("PROMPT_TOKENIZER", "")
+# Over budget, lose the cheapest parts first: trace metadata, then the oldest history, then the middle of the user's text
+TRIM_ORDER = ("context", "history", "user_text")
 
 
 def _normalize_intensity(intensity: int) -> int:
@@ -33,11 +40,6 @@ def _template_name(mode: str) -> str:
     return "HighIntensity.txt" if mode == "high_safety" else "NormalIntensity.txt"
 
 
-def _load_template(name: str) -> Tuple[str, str]:
-    path = TEMPLATES_DIR / name
-    return path.read_text(encoding="utf-8"), name
-
-
 def _context_block(context: Dict[str, str]) -> str:
     if not context:
         return "Context: none provided."
@@ -45,23 +47,77 @@ def _context_block(context: Dict[str, str]) -> str:
     return "Context:\n" + "\n".join(lines)
 
 
+def _history_block(history: str) -> str:
+    # empty on a session's first turn, so single-turn prompts render exactly as before
+    history = (history or "").strip()
+    return f"Conversation so far:\n{history}\n\n" if history else ""
+
+
+def _fit_budget(template, values: Dict[str, Any], request: PromptRequest, budget: int, counter: TokenCounter) -> Tuple[str, int, List[str]]:
+    """
+    Render, then shrink the parts in TRIM_ORDER until the prompt fits `budget` tokens.
+    Every step depends only on the inputs, so the same request always renders the same prompt.
+    """
+    context = list((request.context or {}).items())
+    history = (request.history or "").strip().splitlines()
+    prompt = template.render(values).strip()
+    used = counter.count(prompt)
+    trimmed: List[str] = []
+    for field in TRIM_ORDER:
+        if field not in template.fields:
+            continue
+        while used > budget:
+            if field == "context" and context:
+                context.pop()
+                values["context"] = _context_block(dict(context))
+            elif field == "history" and history:
+                history.pop(0)
+                values["history"] = _history_block("\n".join(history))
+            elif field == "user_text" and values["user_text"]:
+                text = values["user_text"]
+                values["user_text"] = trim(text, counter.count(text) - (used - budget), counter)
+            else:
+                break
+            if field not in trimmed:
+                trimmed.append(field)
+            prompt = template.render(values).strip()
+            used = counter.count(prompt)
+    return prompt, used, trimmed
+
+
+def warm_tokenizer() -> TokenCounter:
+    """
+    Resolve the PROMPT_TOKENIZER counter ahead of the first request (it may load a tokenizer from disk).
+    """
+    return get_counter(PROMPT_TOKENIZER)
+
+
 def build_prompt(request: PromptRequest) -> PromptResponse:
     intensity = _normalize_intensity(request.intensity)
     mode = _select_mode(intensity)
-    template_text, template_name = _load_template(_template_name(mode))
-
-    prompt = template_text.format(
-        user_text=request.text.strip(),
-        emotion=request.emotion,
-        intensity=intensity,
-        context=_context_block(request.context or {}),
-    ).strip()
-
     llm_params = DEFAULT_LLM_PARAMS.get(mode, DEFAULT_LLM_PARAMS["normal"])
-
-    return PromptResponse(
-        prompt=prompt,
-        mode=mode,
-        llmParams=llm_params,
-        meta={"template": template_name},
-    )
+    counter = get_counter(PROMPT_TOKENIZER)
+    with span("prompt.render"):
+        # compiled once and hot-reloaded by the registry; no file I/O on the request path
+        template = get_registry().get(_template_name(mode))
+        values = {"user_text": request.text.strip(), "emotion": request.emotion, "intensity": intensity}
+        if "context" in template.fields:
+            values["context"] = _context_block(request.context or {})
+        if "history" in template.fields:
+            values["history"] = _history_block(request.history)
+        if PROMPT_CONTEXT_TOKENS > 0:
+            budget = PROMPT_CONTEXT_TOKENS - int(llm_params.get("maxTokens", 0))
+            prompt, tokens, trimmed = _fit_budget(template, values, request, budget, counter)
+        else:
+            prompt = template.render(values).strip()
+            tokens, trimmed = counter.count(prompt), []
+
+    meta = {
+        "template": template.name,
+        "templateVersion": str(template.version),
+        "promptTokens": str(tokens),
+        "tokenizer": counter.name,
+    }
+    if trimmed:
+        meta["trimmed"] = ",".join(trimmed)
+    return PromptResponse(prompt=prompt, mode=mode, llmParams=llm_params, meta=meta)
@@ -16,6 +16,9 @@ class PromptRequest(BaseModel):
     context: Optional[Dict[str, str]] = Field(
         default_factory=dict, description="Optional metadata to surface inside prompt"
     )
+    history: Optional[str] = Field(
+        default=None, description="Bounded summary of earlier turns in the same session, rendered into {history}"
+    )
 
 
 class PromptResponse(BaseModel):
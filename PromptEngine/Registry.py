@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import string
+import threading
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+BASE_DIR = Path(__file__).resolve().parent
+TEMPLATES_DIR = BASE_DIR / "Templates"
+
+# Poll template mtimes every N seconds and hot-reload changes (0 disables the watcher)
+POLL_SECONDS = float(os.environ.get("PROMPT_TEMPLATE_POLL_SECONDS", "2"))
+
+_FORMATTER = string.Formatter()
+
+# (literal text, field name or None, format spec, conversion)
+Step = Tuple[str, Optional[str], str, Optional[str]]
+
+
+@dataclass(frozen=True)
+class CompiledTemplate:
+    """
+    A template parsed once into a render plan, so rendering is a single join.
+    """
+
+    name: str
+    sha256: str
+    mtime: float
+    version: int
+    loaded_at: float
+    plan: Tuple[Step, ...]
+    fields: frozenset
+
+    def render(self, values: Dict[str, Any]) -> str:
+        parts: List[str] = []
+        for literal, field, spec, conversion in self.plan:
+            parts.append(literal)
+            if field is None:
+                continue
+            value = values[field] if field in values else _FORMATTER.get_field(field, (), values)[0]
+            if conversion:
+                value = _FORMATTER.convert_field(value, conversion)
+            parts.append(format(value, spec) if spec else str(value))
+        return "".join(parts)
+
+
+def compile_template(name: str, text: str, mtime: float, version: int) -> CompiledTemplate:
+    plan = tuple((literal, field, spec or "", conversion) for literal, field, spec, conversion in _FORMATTER.parse(text))
+    fields = frozenset(field.split(".")[0].split("[")[0] for _, field, _, _ in plan if field)
+    return CompiledTemplate(
+        name=name,
+        sha256=hashlib.sha256(text.encode("utf-8")).hexdigest(),
+        mtime=mtime,
+        version=version,
+        loaded_at=time.time(),
+        plan=plan,
+        fields=fields,
+    )
+
+
+class TemplateRegistry:
+    """
+    In-memory registry of compiled templates with mtime-based hot reload.
+
+    Reloads build a fresh mapping and swap it in one assignment, so a request
+    always sees either the old or the new set of templates, never a mix.
+    """
+
+    def __init__(self, directory: Path = TEMPLATES_DIR):
+        self.directory = Path(directory)
+        self._templates: Dict[str, CompiledTemplate] = {}
+        self._lock = threading.Lock()
+        self._watcher: Optional[threading.Thread] = None
+        self.errors: Dict[str, str] = {}
+        self.reload()
+
+    def get(self, name: str) -> CompiledTemplate:
+        try:
+            return self._templates[name]
+        except KeyError:
+            raise FileNotFoundError(f"Template '{name}' not found in {self.directory}") from None
+
+    def reload(self) -> bool:
+        """
+        Re-read templates whose mtime changed; returns True if anything changed.
+        A template that fails to parse keeps its previous version.
+        """
+        with self._lock:
+            current = self._templates
+            updated: Dict[str, CompiledTemplate] = {}
+            errors: Dict[str, str] = {}
+            for path in sorted(self.directory.glob("*.txt")):
+                try:
+                    mtime = path.stat().st_mtime
+                    previous = current.get(path.name)
+                    if previous is not None and previous.mtime == mtime:
+                        updated[path.name] = previous
+                        continue
+                    text = path.read_text(encoding="utf-8")
+                    version = previous.version + 1 if previous is not None else 1
+                    compiled = compile_template(path.name, text, mtime, version)
+                    if previous is not None and previous.sha256 == compiled.sha256:
+                        # touched but unchanged: keep the version, remember the new mtime
+                        compiled = replace(previous, mtime=mtime)
+                    updated[path.name] = compiled
+                except (OSError, ValueError) as exc:
+                    errors[path.name] = str(exc)
+                    if path.name in current:
+                        updated[path.name] = current[path.name]
+            changed = updated.keys() != current.keys() or any(
+                updated[k].version != current[k].version for k in updated
+            )
+            self._templates = updated
+            self.errors = errors
+            return changed
+
+    def start_watcher(self, interval: float = POLL_SECONDS) -> None:
+        if interval <= 0 or self._watcher is not None:
+            return
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="template-watcher", daemon=True)
+        self._watcher.start()
+
+    def _watch(self, interval: float) -> None:
+        while True:
+            time.sleep(interval)
+            try:
+                self.reload()
+            except Exception:
+                # keep serving the last good templates
+                pass
+
+    def describe(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": t.name,
+                "version": t.version,
+                "sha256": t.sha256,
+                "mtime": t.mtime,
+                "loaded_at": t.loaded_at,
+                "fields": sorted(t.fields),
+            }
+            for t in self._templates.values()
+        ]
+
+
+_registry: Optional[TemplateRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_registry() -> TemplateRegistry:
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                _registry = TemplateRegistry()
+                _registry.start_watcher()
+    return _registry
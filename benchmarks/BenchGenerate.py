@@ -0,0 +1,94 @@
+"""
+Compare OpenAI-compatible call paths against a local stub upstream.
+
+- fresh:  a new httpx.Client per call (the old behaviour, new TCP handshake each time)
+- pooled: the shared keep-alive sync client, driven from a thread pool
+- async:  the shared AsyncClient, all calls awaited on one event loop
+
+    python -m benchmarks.StubOpenAI --port 9100 &
+    python -m benchmarks.BenchGenerate --base-url http://127.0.0.1:9100/v1 -n 200 -c 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, List
+
+import httpx
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from LlmGateway.Providers import HttpPool, OpenAICompatibleProvider  # noqa: E402
+
+PROMPT = "User said: I have a presentation tomorrow and I feel tense."
+
+
+def _summary(name: str, latencies: List[float], wall: float) -> str:
+    latencies = sorted(latencies)
+    p = lambda q: latencies[min(len(latencies) - 1, int(q * len(latencies)))] * 1000  # noqa: E731
+    return (
+        f"{name:<7} n={len(latencies):<5} rps={len(latencies) / wall:8.1f} "
+        f"p50={p(0.50):7.1f}ms p95={p(0.95):7.1f}ms p99={p(0.99):7.1f}ms mean={statistics.mean(latencies) * 1000:7.1f}ms"
+    )
+
+
+def _fresh_call(provider: OpenAICompatibleProvider) -> None:
+    url, headers, payload = provider._request(PROMPT, 32)
+    with httpx.Client(timeout=provider.timeout) as client:
+        provider._parse(client.post(url, headers=headers, json=payload))
+
+
+def _run_threaded(fn: Callable[[], None], total: int, concurrency: int):
+    latencies: List[float] = []
+
+    def timed(_):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(timed, range(total)))
+    return latencies, time.perf_counter() - started
+
+
+async def _run_async(provider: OpenAICompatibleProvider, total: int, concurrency: int):
+    latencies: List[float] = []
+    gate = asyncio.Semaphore(concurrency)
+
+    async def timed():
+        async with gate:
+            started = time.perf_counter()
+            await provider.agenerate(PROMPT, 32)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(timed() for _ in range(total)))
+    wall = time.perf_counter() - started
+    await provider.pool.aclose()
+    return latencies, wall
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://127.0.0.1:9100/v1")
+    parser.add_argument("-n", "--requests", type=int, default=200)
+    parser.add_argument("-c", "--concurrency", type=int, default=20)
+    args = parser.parse_args()
+
+    pool = HttpPool(per_host_limit=args.concurrency)
+    provider = OpenAICompatibleProvider(api_key="stub", base_url=args.base_url, model="stub", timeout=30, pool=pool)
+
+    print(_summary("fresh", *_run_threaded(lambda: _fresh_call(provider), args.requests, args.concurrency)))
+    print(_summary("pooled", *_run_threaded(lambda: provider.generate(PROMPT, 32), args.requests, args.concurrency)))
+    print(_summary("async", *asyncio.run(_run_async(provider, args.requests, args.concurrency))))
+
+
+if __name__ == "__main__":
+    main()
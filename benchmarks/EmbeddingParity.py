@@ -0,0 +1,116 @@
+"""
+Compare the single-encoder embedding mode against the NLI pipeline, and calibrate it.
+
+Runs the same texts through EMOTION_BACKEND=torch (one cross-encoder pass per label)
+and EMOTION_BACKEND=embedding (one sentence-encoder pass per text), then reports label
+and intensity agreement, score drift, per-text latency and model passes per text.
+
+--calibrate fits the per-label sigmoid on the baseline's probabilities over --texts
+and writes it where the embedding backend looks for it (calibration.json in the
+embedding model dir unless a path is given); evaluate on separate --eval-texts to
+keep the reported agreement out-of-sample.
+
+    python EmotionService/download_models.py --skip-download --embedding
+    python -m benchmarks.EmbeddingParity --calibrate --texts journal_samples.txt --eval-texts held_out.txt
+    python -m benchmarks.EmbeddingParity --min-label 0.8
+"""
+
+from __future__ import annotations
+
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import numpy as np
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+# Importing EmotionParity pins Core to the torch baseline with the result cache disabled
+from benchmarks.EmotionParity import _load_texts  # noqa: E402
+from EmotionService import Core  # noqa: E402
+from EmotionService.Embedding import (  # noqa: E402
+    CALIBRATION_FILE,
+    DEFAULT_EMBED_MODEL_DIR,
+    EMBED_MODEL_ID,
+    Calibration,
+    EmbeddingBackend,
+)
+
+
+def _score(backend, texts: List[str], batch_size: int):
+    results, per_text = [], []
+    for start in range(0, len(texts), batch_size):
+        chunk = texts[start : start + batch_size]
+        began = time.perf_counter()
+        scores = Core._score_texts(chunk, backend)
+        per_text.append((time.perf_counter() - began) / len(chunk))
+        results.extend(scores)
+    return results, per_text
+
+
+def _matrix(scores) -> np.ndarray:
+    return np.array([[row[label] for label in Core.EMOTION_LABELS] for row in scores])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--texts", help="UTF-8 file with one text per line (defaults to the built-in samples)")
+    parser.add_argument("--eval-texts", help="held-out texts for the comparison (defaults to --texts)")
+    parser.add_argument("--calibrate", nargs="?", const="", metavar="PATH", help="fit and save the calibration first")
+    parser.add_argument("--batch-size", type=int, default=1, help="1 measures per-request latency")
+    parser.add_argument("--min-label", type=float, default=0.80, help="minimum top-1 label agreement")
+    parser.add_argument("--min-intensity", type=float, default=0.70, help="minimum intensity agreement")
+    parser.add_argument("--verbose", action="store_true", help="print every disagreement")
+    args = parser.parse_args()
+
+    baseline = Core.get_backend()
+    model_dir = Core._resolve_model_dir(EMBED_MODEL_ID, "EMOTION_EMBED_MODEL_DIR", DEFAULT_EMBED_MODEL_DIR)
+    candidate = EmbeddingBackend(model_dir, Core.EMOTION_LABELS, Core.HYPOTHESIS_TEMPLATE)
+
+    if args.calibrate is not None:
+        fit_texts = _load_texts(args.texts)
+        targets = _matrix(Core._score_texts(fit_texts, baseline))
+        candidate.calibration = Calibration.fit(candidate.similarities(fit_texts), targets, Core.EMOTION_LABELS)
+        target: Optional[Path] = Path(args.calibrate) if args.calibrate else model_dir / CALIBRATION_FILE
+        candidate.calibration.save(target, EMBED_MODEL_ID)
+        print(f"calibrated on {len(fit_texts)} texts -> {target}")
+    elif not candidate.calibration.fitted:
+        print("warning: no calibration found, using the default sigmoid (run with --calibrate)")
+
+    texts = _load_texts(args.eval_texts or args.texts)
+    # warm both so one-time graph setup is not counted
+    Core._score_texts(texts[:1], baseline)
+    Core._score_texts(texts[:1], candidate)
+    base_scores, base_time = _score(baseline, texts, args.batch_size)
+    fast_scores, fast_time = _score(candidate, texts, args.batch_size)
+
+    base_results = [Core._to_result(s) for s in base_scores]
+    fast_results = [Core._to_result(s) for s in fast_scores]
+    label_rate = sum(a.emotion == b.emotion for a, b in zip(base_results, fast_results)) / len(texts)
+    intensity_rate = sum(a.intensity == b.intensity for a, b in zip(base_results, fast_results)) / len(texts)
+    drift = np.abs(_matrix(base_scores) - _matrix(fast_scores))
+    ms = lambda values, q: sorted(values)[min(len(values) - 1, int(q * len(values)))] * 1000  # noqa: E731
+
+    print(f"texts={len(texts)} baseline=torch/{Core.MODEL_ID} candidate=embedding/{EMBED_MODEL_ID}")
+    print(f"label agreement     {label_rate:.3f}")
+    print(f"intensity agreement {intensity_rate:.3f}")
+    print(f"score drift         max={drift.max():.4f} mean={drift.mean():.4f}")
+    print(f"passes per text     torch={len(Core.EMOTION_LABELS)} (text x label pairs) embedding=1")
+    for name, values in (("torch", base_time), ("embedding", fast_time)):
+        print(f"latency per text    {name:<9} mean={statistics.mean(values) * 1000:7.1f}ms p50={ms(values, 0.5):7.1f}ms p95={ms(values, 0.95):7.1f}ms")
+    print(f"speedup             {statistics.mean(base_time) / statistics.mean(fast_time):.2f}x")
+    if args.verbose:
+        for text, a, b in zip(texts, base_results, fast_results):
+            if a.emotion != b.emotion or a.intensity != b.intensity:
+                print(f"  {a.emotion}/{a.intensity} -> {b.emotion}/{b.intensity}: {text}")
+
+    ok = label_rate >= args.min_label and intensity_rate >= args.min_intensity
+    print("PASS" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
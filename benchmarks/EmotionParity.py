@@ -0,0 +1,121 @@
+"""
+Check an alternative emotion backend against the PyTorch baseline.
+
+Runs the same texts through EMOTION_BACKEND=torch and the candidate backend, then
+reports label agreement, intensity agreement, score drift and per-text latency.
+Exits non-zero when agreement falls below the thresholds, so it can gate a rollout.
+
+    python EmotionService/download_models.py --skip-download --export-onnx --quantize
+    python -m benchmarks.EmotionParity --backend onnx-int8
+    python -m benchmarks.EmotionParity --backend onnx --texts my_samples.txt --min-label 0.98
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+# The baseline is whatever Core loads, so pin it to torch and keep the result cache out of the way
+os.environ["EMOTION_BACKEND"] = "torch"
+os.environ["EMOTION_CACHE_ENABLED"] = "0"
+
+from EmotionService import Core  # noqa: E402
+from EmotionService.Backends import load_backend  # noqa: E402
+
+SAMPLES: List[str] = [
+    "I have a presentation tomorrow and I can't stop worrying about it.",
+    "My heart is racing and I keep thinking something bad will happen.",
+    "What if I fail the exam and everyone finds out?",
+    "I am so furious that they cancelled without telling me.",
+    "Stop interrupting me, this is the third time today!",
+    "He lied to my face again and I'm done with it.",
+    "I miss my grandmother so much since she passed away.",
+    "Nothing feels meaningful anymore, I just want to cry.",
+    "My best friend moved away and the house feels empty.",
+    "I slept four hours and I can barely keep my eyes open.",
+    "After the night shift I'm completely drained.",
+    "I'm exhausted from juggling work and the kids all week.",
+    "I had lunch and then went back to the office.",
+    "The meeting is at three, I'll bring the slides.",
+    "It's cloudy today, maybe it will rain later.",
+    "明天要面试了，我紧张得睡不着。",
+    "他又放我鸽子，我真的很生气。",
+    "最近总是很难过，什么都提不起兴趣。",
+    "连续加班一周，我好累。",
+    "今天吃了面条，然后去散步。",
+    "I'm a bit nervous but also kind of excited about the trip.",
+    "Honestly I'm fine, just tired and a little annoyed.",
+    "I don't know why, but everything makes me sad lately and I feel so heavy.",
+    "ugh. whatever. i'm so done",
+]
+
+
+def _load_texts(path: str | None) -> List[str]:
+    if not path:
+        return SAMPLES
+    return [line.strip() for line in Path(path).read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+def _score(backend, texts: List[str], batch_size: int):
+    results, elapsed = [], 0.0
+    for start in range(0, len(texts), batch_size):
+        chunk = texts[start : start + batch_size]
+        began = time.perf_counter()
+        scores = Core._score_texts(chunk, backend)
+        elapsed += time.perf_counter() - began
+        results.extend(Core._to_result(s) for s in scores)
+    return results, elapsed
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", default="onnx-int8", help="candidate backend (onnx / onnx-int8)")
+    parser.add_argument("--texts", help="UTF-8 file with one text per line (defaults to the built-in samples)")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--min-label", type=float, default=0.95, help="minimum top-1 label agreement")
+    parser.add_argument("--min-intensity", type=float, default=0.90, help="minimum intensity agreement")
+    parser.add_argument("--verbose", action="store_true", help="print every disagreement")
+    args = parser.parse_args()
+
+    texts = _load_texts(args.texts)
+    torch_backend = Core.get_backend()
+    candidate = load_backend(args.backend, torch_backend.model_dir)
+    # warm both so one-time graph setup is not counted
+    Core._score_texts(texts[:1], torch_backend)
+    Core._score_texts(texts[:1], candidate)
+
+    baseline, base_time = _score(torch_backend, texts, args.batch_size)
+    other, other_time = _score(candidate, texts, args.batch_size)
+
+    label_hits = sum(a.emotion == b.emotion for a, b in zip(baseline, other))
+    intensity_hits = sum(a.intensity == b.intensity for a, b in zip(baseline, other))
+    drift = [abs(a.scores[k] - b.scores[k]) for a, b in zip(baseline, other) for k in a.scores]
+    label_rate = label_hits / len(texts)
+    intensity_rate = intensity_hits / len(texts)
+
+    print(f"texts={len(texts)} baseline=torch candidate={candidate.name}")
+    print(f"label agreement     {label_rate:.3f} ({label_hits}/{len(texts)})")
+    print(f"intensity agreement {intensity_rate:.3f} ({intensity_hits}/{len(texts)})")
+    print(f"score drift         max={max(drift):.4f} mean={sum(drift) / len(drift):.4f}")
+    print(
+        f"latency per text    torch={base_time / len(texts) * 1000:.1f}ms "
+        f"{candidate.name}={other_time / len(texts) * 1000:.1f}ms speedup={base_time / other_time:.2f}x"
+    )
+    if args.verbose:
+        for text, a, b in zip(texts, baseline, other):
+            if a.emotion != b.emotion or a.intensity != b.intensity:
+                print(f"  {a.emotion}/{a.intensity} -> {b.emotion}/{b.intensity}: {text}")
+
+    ok = label_rate >= args.min_label and intensity_rate >= args.min_intensity
+    print("PASS" if ok else "FAIL")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
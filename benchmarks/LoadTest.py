@@ -0,0 +1,465 @@
+"""
+Closed-loop load test for the public endpoints: /chat, /analyze, /prompt and /generate.
+
+Each endpoint is driven in turn by --concurrency workers for --requests calls (or
+--duration seconds) after a short warmup. Per endpoint it reports throughput,
+p50/p95/p99 latency, error and status counts; per service the resident memory
+(before / peak / after, scraped from /metrics while the load runs).
+
+--spawn starts a self-contained offline stack on --port-base+1..4: the keyword
+classifier fixture (EMOTION_BACKEND=keyword) instead of the NLI model, and the
+LLM gateway pointed at benchmarks.StubOpenAI with a seeded latency distribution.
+Without it the services at the --*-url addresses are used as they are.
+
+--json writes the results; --compare checks them against an earlier file and exits
+with 1 when throughput, p95/p99, error rate or peak memory regressed by more than
+--max-regression. --results compares an existing file instead of running.
+
+    python -m benchmarks.LoadTest --spawn -c 16 -n 400 --json .bench/baseline.json
+    python -m benchmarks.LoadTest --spawn -c 16 -n 400 --compare .bench/baseline.json
+    python -m benchmarks.LoadTest --results .bench/new.json --compare .bench/baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import httpx
+
+ROOT = Path(__file__).resolve().parent.parent
+
+SERVICES = {"emotion": 1, "prompt": 2, "orchestrator": 3, "llm": 4}
+ENDPOINTS = {
+    "chat": ("orchestrator", "/chat"),
+    "analyze": ("emotion", "/analyze"),
+    "prompt": ("prompt", "/prompt"),
+    "generate": ("llm", "/generate"),
+}
+APPS = {
+    "emotion": "EmotionService.App:app",
+    "prompt": "PromptEngine.App:app",
+    "orchestrator": "Orchestrator.App:app",
+    "llm": "LlmGateway.App:app",
+}
+DEFAULT_URLS = {"emotion": "http://127.0.0.1:8001", "prompt": "http://127.0.0.1:8002", "orchestrator": "http://127.0.0.1:8003", "llm": "http://127.0.0.1:8004"}
+
+CORPUS = [
+    "I have a presentation tomorrow and I feel tense.",
+    "My manager keeps changing the deadline and it is so unfair.",
+    "I have been sleeping badly all week and I'm exhausted.",
+    "Since my friend moved away I feel lonely most evenings.",
+    "Nothing special happened today, just a normal day at work.",
+    "明天要考试了，我很紧张，一直在担心考不好。",
+    "室友总是半夜吵闹，我真的很生气。",
+    "最近加班太多，每天都很累，没力气做别的事。",
+    "和家人吵架之后一直很难过，不知道该怎么办。",
+    "今天天气不错，下班后去散了散步。",
+    "I keep worrying about money. Rent is due, my hours were cut, and every time I open the banking app "
+    "my chest tightens. I know panicking does not help but I cannot stop thinking about it at night.",
+    "工作上的事情一件接一件，项目延期被领导批评，回家还要照顾孩子。我觉得自己快撑不住了，很累也很失落，"
+    "但又不知道可以和谁说。",
+]
+EMOTIONS = ["anxious", "angry", "sad", "tired", "neutral"]
+
+
+def _texts(seed: int, unique: bool) -> Callable[[int], str]:
+    rng = random.Random(seed)
+    order = [rng.randrange(len(CORPUS)) for _ in range(4096)]
+
+    def pick(index: int) -> str:
+        text = CORPUS[order[index % len(order)]]
+        # a per-request suffix defeats the emotion / completion caches
+        return f"{text} (#{index})" if unique else text
+
+    return pick
+
+
+def _payload(endpoint: str, text: str, index: int) -> Dict:
+    if endpoint == "analyze":
+        return {"text": text}
+    if endpoint == "prompt":
+        return {"text": text, "emotion": EMOTIONS[index % len(EMOTIONS)], "intensity": 1 + index % 4}
+    if endpoint == "generate":
+        return {"prompt": f"User said: {text}\nReply with one supportive sentence.", "max_tokens": 64}
+    return {"text": text}
+
+
+def _percentile(ordered: List[float], q: float) -> float:
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else 0.0
+
+
+def _summarize(latencies: List[float], statuses: Dict[str, int], errors: int, wall: float) -> Dict:
+    # statuses also counts transport failures, by exception name
+    ordered = sorted(latencies)
+    total = sum(statuses.values())
+    ok = sum(count for code, count in statuses.items() if code.startswith("2"))
+    ms = lambda seconds: round(seconds * 1000.0, 2)  # noqa: E731
+    return {
+        "requests": total,
+        "ok": ok,
+        "error_rate": round((total - ok) / total, 4) if total else 0.0,
+        "transport_errors": errors,
+        "status": dict(sorted(statuses.items())),
+        "wall_s": round(wall, 3),
+        "rps": round(ok / wall, 2) if wall > 0 else 0.0,
+        "p50_ms": ms(_percentile(ordered, 0.50)),
+        "p95_ms": ms(_percentile(ordered, 0.95)),
+        "p99_ms": ms(_percentile(ordered, 0.99)),
+        "mean_ms": ms(statistics.mean(ordered)) if ordered else 0.0,
+        "max_ms": ms(ordered[-1]) if ordered else 0.0,
+    }
+
+
+async def _rss(client: httpx.AsyncClient, url: str) -> Optional[float]:
+    try:
+        response = await client.get(f"{url}/metrics", timeout=2.0)
+    except httpx.HTTPError:
+        return None
+    for line in response.text.splitlines():
+        if line.startswith("process_resident_memory_bytes "):
+            return float(line.split()[1]) / (1024 * 1024)
+    return None
+
+
+class MemoryProbe:
+    """
+    Polls process_resident_memory_bytes of every service while the load runs.
+    """
+
+    def __init__(self, urls: Dict[str, str], interval: float = 0.5):
+        self.urls = urls
+        self.interval = interval
+        self.samples: Dict[str, List[float]] = {name: [] for name in urls}
+        self._task: Optional[asyncio.Task] = None
+
+    async def sample(self, client: httpx.AsyncClient) -> None:
+        values = await asyncio.gather(*(_rss(client, url) for url in self.urls.values()))
+        for name, value in zip(self.urls, values):
+            if value is not None:
+                self.samples[name].append(value)
+
+    async def _loop(self, client: httpx.AsyncClient) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.sample(client)
+
+    def start(self, client: httpx.AsyncClient) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._loop(client))
+
+    async def stop(self, client: httpx.AsyncClient) -> None:
+        if self._task is not None:
+            self._task.cancel()
+        await self.sample(client)
+
+    def report(self) -> Dict:
+        return {
+            name: {"before_mb": round(values[0], 1), "peak_mb": round(max(values), 1), "after_mb": round(values[-1], 1)}
+            for name, values in self.samples.items()
+            if values
+        }
+
+
+async def _drive(
+    client: httpx.AsyncClient,
+    url: str,
+    endpoint: str,
+    concurrency: int,
+    total: int,
+    duration: float,
+    pick: Callable[[int], str],
+    offset: int,
+) -> Dict:
+    latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+    errors = 0
+    counter = iter(range(offset, offset + (total if total > 0 else 1 << 40)))
+    deadline = time.perf_counter() + duration if duration > 0 else float("inf")
+
+    async def worker() -> None:
+        nonlocal errors
+        for index in counter:
+            if time.perf_counter() >= deadline:
+                return
+            started = time.perf_counter()
+            try:
+                response = await client.post(url, json=_payload(endpoint, pick(index), index))
+            except httpx.HTTPError as exc:
+                errors += 1
+                statuses[type(exc).__name__] = statuses.get(type(exc).__name__, 0) + 1
+                continue
+            code = str(response.status_code)
+            statuses[code] = statuses.get(code, 0) + 1
+            if response.is_success:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return _summarize(latencies, statuses, errors, time.perf_counter() - started)
+
+
+async def run(args: argparse.Namespace, urls: Dict[str, str]) -> Dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    pick = _texts(args.seed, args.unique)
+    results: Dict = {"endpoints": {}, "memory": {}}
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        probe = MemoryProbe(urls)
+        await probe.sample(client)
+        probe.start(client)
+        offset = 0
+        for endpoint in args.endpoints:
+            service, path = ENDPOINTS[endpoint]
+            url = urls[service] + path
+            if args.warmup:
+                await _drive(client, url, endpoint, args.concurrency, args.warmup, 0, pick, offset)
+                offset += args.warmup
+            summary = await _drive(client, url, endpoint, args.concurrency, args.requests, args.duration, pick, offset)
+            offset += summary["requests"]
+            results["endpoints"][endpoint] = summary
+            print(_line(endpoint, summary), flush=True)
+        await probe.stop(client)
+        results["memory"] = probe.report()
+    for name, memory in results["memory"].items():
+        print(f"{name:<13} rss before={memory['before_mb']:.1f}MB peak={memory['peak_mb']:.1f}MB after={memory['after_mb']:.1f}MB")
+    return results
+
+
+def _line(endpoint: str, s: Dict) -> str:
+    return (
+        f"{endpoint:<9} n={s['requests']:<6} ok={s['ok']:<6} rps={s['rps']:8.1f} "
+        f"p50={s['p50_ms']:7.1f}ms p95={s['p95_ms']:7.1f}ms p99={s['p99_ms']:7.1f}ms err={s['error_rate']:.2%} {s['status']}"
+    )
+
+
+class Stack:
+    """
+    The four services plus the stub upstream as subprocesses, all offline and deterministic.
+    """
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.procs: List[subprocess.Popen] = []
+        self.logdir = Path(tempfile.mkdtemp(prefix="mindful-loadtest-"))
+        self.urls = {name: f"http://127.0.0.1:{args.port_base + n}" for name, n in SERVICES.items()}
+        self.stub_url = f"http://127.0.0.1:{args.port_base + 100}"
+
+    def env(self) -> Dict[str, str]:
+        env = dict(os.environ)
+        env.update(
+            {
+                "PYTHONPATH": str(ROOT),
+                "EMOTION_BACKEND": self.args.emotion_backend,
+                "EMOTION_PRELOAD": "1",
+                "LLM_PROVIDER": "openai",
+                "LLM_API_KEY": "stub",
+                "LLM_BASE_URL": f"{self.stub_url}/v1",
+                "LLM_API_MODEL": "stub",
+                "LLM_FALLBACK_CHAIN": "openai",
+                # keep a developer .env out of the measurement
+                "LLM_ENV_FILE": str(self.logdir / "absent.env"),
+                "ORCHESTRATOR_TRANSPORT": "http",
+                "EMOTION_SERVICE_URL": self.urls["emotion"],
+                "PROMPT_SERVICE_URL": self.urls["prompt"],
+                "LLM_GATEWAY_URL": self.urls["llm"],
+            }
+        )
+        for item in self.args.env:
+            key, _, value = item.partition("=")
+            env[key] = value
+        return env
+
+    def _spawn(self, name: str, argv: List[str], env: Dict[str, str]) -> None:
+        log = open(self.logdir / f"{name}.log", "wb")
+        self.procs.append(subprocess.Popen(argv, cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT))
+
+    def start(self) -> None:
+        env = self.env()
+        a = self.args
+        self._spawn(
+            "stub",
+            [sys.executable, "-m", "benchmarks.StubOpenAI", "--port", str(a.port_base + 100),
+             "--latency-ms", str(a.stub_latency_ms), "--latency-dist", a.stub_latency_dist,
+             "--spread-ms", str(a.stub_spread_ms), "--sigma", str(a.stub_sigma),
+             "--error-rate", str(a.stub_error_rate), "--seed", str(a.seed)],
+            env,
+        )
+        for name, offset in SERVICES.items():
+            self._spawn(
+                name,
+                [sys.executable, "-m", "uvicorn", APPS[name], "--host", "127.0.0.1",
+                 "--port", str(a.port_base + offset), "--log-level", "warning"],
+                env,
+            )
+        self._wait_ready()
+
+    def _wait_ready(self) -> None:
+        deadline = time.monotonic() + self.args.startup_timeout
+        pending = {name: f"{url}/health/ready" for name, url in self.urls.items()}
+        with httpx.Client(timeout=2.0) as client:
+            while pending:
+                for proc in self.procs:
+                    if proc.poll() is not None:
+                        raise RuntimeError(f"a service exited during startup, see logs in {self.logdir}")
+                for name, url in list(pending.items()):
+                    try:
+                        if client.get(url).status_code == 200:
+                            del pending[name]
+                    except httpx.HTTPError:
+                        pass
+                if pending and time.monotonic() > deadline:
+                    raise RuntimeError(f"not ready after {self.args.startup_timeout:g}s: {sorted(pending)} (logs in {self.logdir})")
+                time.sleep(0.2)
+
+    def stop(self) -> None:
+        for proc in self.procs:
+            proc.terminate()
+        for proc in self.procs:
+            try:
+                proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                proc.kill()
+
+
+def _git_rev() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _relative(base: float, current: float) -> float:
+    return (current - base) / base if base else 0.0
+
+
+def compare(baseline: Dict, current: Dict, max_regression: float, min_delta_ms: float, max_error_increase: float) -> List[str]:
+    """
+    Regressions of current against baseline, one line each; empty when within the thresholds.
+    """
+    problems: List[str] = []
+    for endpoint, base in baseline.get("endpoints", {}).items():
+        cur = current.get("endpoints", {}).get(endpoint)
+        if cur is None:
+            continue
+        drop = -_relative(base["rps"], cur["rps"])
+        flag = "  <-- regression" if drop > max_regression else ""
+        print(f"{endpoint:<9} rps   {base['rps']:9.1f} -> {cur['rps']:9.1f} ({-drop:+.1%}){flag}")
+        if flag:
+            problems.append(f"{endpoint}: throughput {base['rps']} -> {cur['rps']} rps")
+        for key in ("p95_ms", "p99_ms"):
+            rise = _relative(base[key], cur[key])
+            bad = rise > max_regression and cur[key] - base[key] > min_delta_ms
+            print(f"{endpoint:<9} {key[:3]:<5} {base[key]:9.1f} -> {cur[key]:9.1f} ({rise:+.1%}){'  <-- regression' if bad else ''}")
+            if bad:
+                problems.append(f"{endpoint}: {key} {base[key]} -> {cur[key]}")
+        if cur["error_rate"] - base["error_rate"] > max_error_increase:
+            print(f"{endpoint:<9} err   {base['error_rate']:9.2%} -> {cur['error_rate']:9.2%}  <-- regression")
+            problems.append(f"{endpoint}: error rate {base['error_rate']:.2%} -> {cur['error_rate']:.2%}")
+    for service, base in baseline.get("memory", {}).items():
+        cur = current.get("memory", {}).get(service)
+        if cur is None:
+            continue
+        rise = _relative(base["peak_mb"], cur["peak_mb"])
+        flag = "  <-- regression" if rise > max_regression else ""
+        print(f"{service:<13} peak  {base['peak_mb']:7.1f}MB -> {cur['peak_mb']:7.1f}MB ({rise:+.1%}){flag}")
+        if flag:
+            problems.append(f"{service}: peak rss {base['peak_mb']}MB -> {cur['peak_mb']}MB")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("-n", "--requests", type=int, default=200, help="calls per endpoint (ignored when --duration is set)")
+    parser.add_argument("-d", "--duration", type=float, default=0.0, help="seconds per endpoint instead of a fixed count")
+    parser.add_argument("--warmup", type=int, default=20, help="untimed calls per endpoint before measuring")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--unique", action="store_true", help="make every text unique so caches never hit")
+    for name, url in DEFAULT_URLS.items():
+        parser.add_argument(f"--{name}-url", default=url)
+    spawn = parser.add_argument_group("offline stack (--spawn)")
+    spawn.add_argument("--spawn", action="store_true")
+    spawn.add_argument("--port-base", type=int, default=18000)
+    spawn.add_argument("--emotion-backend", default="keyword")
+    spawn.add_argument("--stub-latency-ms", type=float, default=200.0)
+    spawn.add_argument("--stub-latency-dist", choices=("fixed", "uniform", "normal", "lognormal"), default="lognormal")
+    spawn.add_argument("--stub-spread-ms", type=float, default=50.0)
+    spawn.add_argument("--stub-sigma", type=float, default=0.5)
+    spawn.add_argument("--stub-error-rate", type=float, default=0.0)
+    spawn.add_argument("--startup-timeout", type=float, default=60.0)
+    spawn.add_argument("--env", action="append", default=[], metavar="KEY=VALUE", help="extra environment for the spawned services")
+    report = parser.add_argument_group("results")
+    report.add_argument("--json", type=Path, help="write results to this file")
+    report.add_argument("--results", type=Path, help="compare this results file instead of running")
+    report.add_argument("--compare", type=Path, help="baseline results file; exit 1 on regression")
+    report.add_argument("--max-regression", type=float, default=0.15, help="allowed relative slowdown (0.15 = 15%%)")
+    report.add_argument("--min-delta-ms", type=float, default=2.0, help="ignore latency changes smaller than this")
+    report.add_argument("--max-error-increase", type=float, default=0.01)
+    args = parser.parse_args()
+    if args.duration > 0:
+        args.requests = 0
+
+    if args.results:
+        results = json.loads(args.results.read_text(encoding="utf-8"))
+    else:
+        stack = Stack(args) if args.spawn else None
+        urls = stack.urls if stack else {name: getattr(args, f"{name}_url") for name in DEFAULT_URLS}
+        try:
+            if stack:
+                print(f"starting offline stack on ports {args.port_base + 1}-{args.port_base + 4} (logs in {stack.logdir})", flush=True)
+                stack.start()
+            results = asyncio.run(run(args, urls))
+        finally:
+            if stack:
+                stack.stop()
+        results["meta"] = {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "git": _git_rev(),
+            "python": platform.python_version(),
+            "host": platform.node(),
+            "cpus": os.cpu_count(),
+            "spawned": args.spawn,
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "duration": args.duration,
+            "warmup": args.warmup,
+            "unique": args.unique,
+            "seed": args.seed,
+        }
+        if args.spawn:
+            results["meta"]["stub"] = {
+                "latency_ms": args.stub_latency_ms,
+                "dist": args.stub_latency_dist,
+                "spread_ms": args.stub_spread_ms,
+                "sigma": args.stub_sigma,
+                "error_rate": args.stub_error_rate,
+            }
+            results["meta"]["emotion_backend"] = args.emotion_backend
+        if args.json:
+            args.json.parent.mkdir(parents=True, exist_ok=True)
+            args.json.write_text(json.dumps(results, indent=2, ensure_ascii=False), encoding="utf-8")
+            print(f"wrote {args.json}")
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        problems = compare(baseline, results, args.max_regression, args.min_delta_ms, args.max_error_increase)
+        if problems:
+            print("REGRESSION: " + "; ".join(problems))
+            sys.exit(1)
+        print("no regression beyond thresholds")
+
+
+if __name__ == "__main__":
+    main()
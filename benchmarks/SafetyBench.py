@@ -0,0 +1,86 @@
+"""
+Per-request cost of the safety check as the rule set grows.
+
+Compares the original check (`word in lowered` for every blocklist entry) with the
+compiled Aho–Corasick matcher on the same synthetic rule sets. The naive cost grows
+with the number of rules; the automaton stays roughly flat.
+
+    python -m benchmarks.SafetyBench
+    python -m benchmarks.SafetyBench --sizes 100 1000 10000 50000 --iterations 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import string
+import sys
+import time
+from pathlib import Path
+from typing import List
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+from Orchestrator.Safety import SafetyMatcher, parse_rules  # noqa: E402
+
+TEXTS: List[str] = [
+    "I have a presentation tomorrow and I can't stop worrying about how it will go. "
+    "My manager will be there and I keep replaying every slide in my head at night.",
+    "明天要面试了，我紧张得睡不着，一直在想如果回答不好怎么办，感觉心跳很快。",
+    "Honestly I'm fine, just tired and a little annoyed that the train was late again today.",
+]
+
+
+def _synthetic_terms(count: int, seed: int) -> List[str]:
+    rng = random.Random(seed)
+    cjk = [chr(c) for c in range(0x4E00, 0x4E00 + 2000)]
+    terms = set()
+    while len(terms) < count:
+        kind = rng.random()
+        if kind < 0.6:
+            terms.add("".join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 10))))
+        elif kind < 0.8:
+            words = ["".join(rng.choices(string.ascii_lowercase, k=rng.randint(3, 7))) for _ in range(2)]
+            terms.add(" ".join(words))
+        else:
+            terms.add("".join(rng.choices(cjk, k=rng.randint(2, 4))))
+    return sorted(terms)
+
+
+def _per_call_us(fn, iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for text in TEXTS:
+            fn(text)
+    return (time.perf_counter() - started) / (iterations * len(TEXTS)) * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--iterations", type=int, default=100)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    print(f"{'rules':>8} {'build ms':>10} {'naive us/req':>14} {'automaton us/req':>18} {'states':>9}")
+    for size in args.sizes:
+        terms = _synthetic_terms(size, args.seed)
+
+        def naive(text: str, terms=terms) -> bool:
+            lowered = text.lower()
+            return not any(term in lowered for term in terms)
+
+        started = time.perf_counter()
+        matcher = SafetyMatcher(parse_rules(terms))
+        build_ms = (time.perf_counter() - started) * 1000
+
+        naive_us = _per_call_us(naive, args.iterations)
+        automaton_us = _per_call_us(matcher.find, args.iterations)
+        print(f"{size:>8} {build_ms:>10.1f} {naive_us:>14.1f} {automaton_us:>18.1f} {len(matcher._goto):>9}")
+
+    # sanity check: the automaton still finds a planted rule
+    assert matcher.find(f"something about {terms[0]} here") is not None
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Serialization cost and payload size of one /chat response.
+
+Runs the real chat flow once (keyword emotion fixture + mock LLM, no models needed) and
+then times turning its result into response bytes:
+  default       what /chat did before: build OrchestratorResponse, let FastAPI validate it
+                again, run jsonable_encoder and encode with the stdlib JSONResponse
+  fast          construct() without validation, .dict() once, orjson (Common/Responses.py)
+  verbose=false the fast path without debug meta, emotion.scores and reply
+  fields=...    the fast path restricted to reply,emotion,session_id
+
+    python -m benchmarks.SerializationBench
+    python -m benchmarks.SerializationBench --iterations 5000 --text "我最近总是睡不好，工作压力很大。"
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+
+# offline stack: the keyword fixture and the mock provider, before the services are imported
+os.environ.setdefault("EMOTION_BACKEND", "keyword")
+os.environ.setdefault("LLM_PROVIDER", "mock")
+os.environ.setdefault("ORCHESTRATOR_TRANSPORT", "inprocess")
+os.environ.setdefault("ORCHESTRATOR_PRELOAD", "0")
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+
+from Common.Responses import encoder_name  # noqa: E402
+from Orchestrator.App import _chat_response, _parse_fields, app  # noqa: E402
+from Orchestrator.Flows import achat_flow  # noqa: E402
+from Orchestrator.Models import OrchestratorResponse  # noqa: E402
+
+
+async def _default_body(field, result) -> bytes:
+    content = await serialize_response(field=field, response_content=OrchestratorResponse(**result), is_coroutine=True)
+    return JSONResponse(content).body
+
+
+async def _measure(result, iterations: int):
+    route = next(r for r in app.routes if getattr(r, "path", None) == "/chat")
+    fields = _parse_fields("reply,emotion,session_id")
+    paths = {
+        "default": None,
+        "fast": lambda: _chat_response(result, True, None).body,
+        "verbose=false": lambda: _chat_response(result, False, None).body,
+        "fields=...": lambda: _chat_response(result, True, fields).body,
+    }
+    rows = []
+    for name, render in paths.items():
+        started = time.perf_counter()
+        if render is None:
+            for _ in range(iterations):
+                body = await _default_body(route.response_field, result)
+        else:
+            for _ in range(iterations):
+                body = render()
+        rows.append((name, (time.perf_counter() - started) / iterations * 1e6, len(body)))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--text", default="I keep staring at my screen because the deadlines are piling up and I can't sleep.")
+    args = parser.parse_args()
+
+    result = asyncio.run(achat_flow(args.text))
+    if result.get("error"):
+        raise SystemExit(f"chat flow failed: {result['error']}")
+    rows = asyncio.run(_measure(result, args.iterations))
+
+    base_us, base_bytes = rows[0][1], rows[0][2]
+    print(f"encoder={encoder_name()} iterations={args.iterations} spans={len(result['meta'].get('spans', []))}")
+    print(f"{'path':<14} {'us/call':>9} {'speedup':>8} {'bytes':>7} {'size':>6}")
+    for name, us, size in rows:
+        print(f"{name:<14} {us:9.1f} {base_us / us:7.2f}x {size:7d} {size / base_bytes:6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Minimal OpenAI-compatible upstream for offline benchmarks.
+
+Serves POST /v1/chat/completions with a canned reply after a configurable delay
+(or as SSE deltas when `stream` is set),
+so gateway overhead (connection setup, threadpool usage) can be measured without
+real API keys.
+
+The delay is drawn from a seeded distribution, so a run is repeatable:
+fixed (always --latency-ms), uniform (+/- --spread-ms), normal (sd --spread-ms)
+or lognormal (median --latency-ms, sigma --sigma). --error-rate answers that
+fraction of calls with a 500 to exercise the gateway's fallback chain.
+
+    python -m benchmarks.StubOpenAI --port 9100 --latency-ms 50
+    python -m benchmarks.StubOpenAI --port 9100 --latency-ms 200 --latency-dist lognormal --sigma 0.6 --seed 7
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, StreamingResponse
+
+app = FastAPI(title="StubOpenAI", version="0.1.0")
+
+LATENCY_MS = float(os.environ.get("STUB_LATENCY_MS", "50"))
+LATENCY_DIST = os.environ.get("STUB_LATENCY_DIST", "fixed")
+SPREAD_MS = float(os.environ.get("STUB_SPREAD_MS", "0"))
+SIGMA = float(os.environ.get("STUB_SIGMA", "0.5"))
+ERROR_RATE = float(os.environ.get("STUB_ERROR_RATE", "0"))
+SEED = int(os.environ.get("STUB_SEED", "0"))
+RNG = random.Random(SEED)
+DISTRIBUTIONS = ("fixed", "uniform", "normal", "lognormal")
+REPLY = "I hear you. Let's take this one small step at a time."
+
+
+def _latency() -> float:
+    """
+    Next upstream delay in seconds.
+    """
+    if LATENCY_DIST == "uniform":
+        ms = RNG.uniform(LATENCY_MS - SPREAD_MS, LATENCY_MS + SPREAD_MS)
+    elif LATENCY_DIST == "normal":
+        ms = RNG.gauss(LATENCY_MS, SPREAD_MS)
+    elif LATENCY_DIST == "lognormal":
+        ms = RNG.lognormvariate(math.log(max(LATENCY_MS, 1e-3)), SIGMA)
+    else:
+        ms = LATENCY_MS
+    return max(0.0, ms) / 1000.0
+
+
+def _usage(payload: dict) -> dict:
+    prompt = " ".join(m.get("content", "") for m in payload.get("messages", []))
+    prompt_tokens = len(prompt.split())
+    completion_tokens = len(REPLY.split())
+    return {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+
+async def _stream(payload: dict):
+    words = REPLY.split(" ")
+    # spread the drawn latency across the tokens so time-to-first-byte is visible
+    delay = _latency() / max(1, len(words))
+    for idx, word in enumerate(words):
+        await asyncio.sleep(delay)
+        delta = word if idx == 0 else " " + word
+        yield f"data: {json.dumps({'choices': [{'index': 0, 'delta': {'content': delta}}]})}\n\n"
+    yield f"data: {json.dumps({'choices': [], 'usage': _usage(payload)})}\n\n"
+    yield "data: [DONE]\n\n"
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(payload: dict):
+    if ERROR_RATE > 0 and RNG.random() < ERROR_RATE:
+        return JSONResponse({"error": {"message": "stub: injected failure"}}, status_code=500)
+    if payload.get("stream"):
+        return StreamingResponse(_stream(payload), media_type="text/event-stream")
+    await asyncio.sleep(_latency())
+    return {
+        "id": f"stub-{time.time_ns()}",
+        "object": "chat.completion",
+        "model": payload.get("model", "stub"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": REPLY}, "finish_reason": "stop"}],
+        "usage": _usage(payload),
+    }
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=LATENCY_MS)
+    parser.add_argument("--latency-dist", choices=DISTRIBUTIONS, default=LATENCY_DIST)
+    parser.add_argument("--spread-ms", type=float, default=SPREAD_MS, help="uniform half-width / normal sd")
+    parser.add_argument("--sigma", type=float, default=SIGMA, help="lognormal shape")
+    parser.add_argument("--error-rate", type=float, default=ERROR_RATE)
+    parser.add_argument("--seed", type=int, default=SEED)
+    args = parser.parse_args()
+    LATENCY_MS = args.latency_ms
+    LATENCY_DIST = args.latency_dist
+    SPREAD_MS = args.spread_ms
+    SIGMA = args.sigma
+    ERROR_RATE = args.error_rate
+    RNG.seed(args.seed)
+    uvicorn.run(app, host="127.0.0.1", port=args.port, log_level="warning")
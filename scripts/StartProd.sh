@@ -0,0 +1,85 @@
+#!/usr/bin/env bash
+
+################################################################
+# MindfulMentor — Production Launcher (preload-then-fork)
+# - 每个服务由 Common/Serve.py 启动：父进程加载一次模型，再 fork 多个 worker，
+#   worker 以写时复制（copy-on-write）方式共享模型权重
+# - 每个 worker 的 torch/OpenMP 线程数 = CPU 核数 / worker 数，避免超额订阅
+# - Orchestrator 默认走 HTTP 传输，不在自身 worker 中加载模型
+# - 不启动前端、不安装依赖；请先用 StartAll.sh 或手动准备好环境与模型
+################################################################
+
+ROOT="$(cd "$(dirname "${BASH_SOURCE[0]}")/.." && pwd)"
+VENV="${ROOT}/.venv"
+LOG_DIR="${ROOT}/.logs"
+ENV_FILE="${ROOT}/.env"
+
+mkdir -p "${LOG_DIR}"
+export PYTHONPATH="${ROOT}:${PYTHONPATH:-}"
+
+if [[ -x "${VENV}/bin/python" ]]; then
+  PYTHON_BIN="${VENV}/bin/python"
+elif command -v python >/dev/null 2>&1; then
+  PYTHON_BIN="python"
+else
+  PYTHON_BIN="python3"
+fi
+
+if [[ -f "${ENV_FILE}" ]]; then
+  set -a
+  # shellcheck source=/dev/null
+  source "${ENV_FILE}"
+  set +a
+fi
+
+HOST="${SERVE_HOST:-0.0.0.0}"
+CORES="$(nproc 2>/dev/null || echo 4)"
+# Model services get the cores; prompt rendering and orchestration are light
+EMOTION_WORKERS="${EMOTION_WORKERS:-$(( CORES > 4 ? CORES / 2 : 2 ))}"
+LLM_WORKERS="${LLM_WORKERS:-2}"
+PROMPT_WORKERS="${PROMPT_WORKERS:-2}"
+ORCHESTRATOR_WORKERS="${ORCHESTRATOR_WORKERS:-$(( CORES > 2 ? CORES / 2 : 1 ))}"
+
+export ORCHESTRATOR_TRANSPORT="${ORCHESTRATOR_TRANSPORT:-http}"
+export EMOTION_SERVICE_URL="${EMOTION_SERVICE_URL:-http://127.0.0.1:8001}"
+export PROMPT_SERVICE_URL="${PROMPT_SERVICE_URL:-http://127.0.0.1:8002}"
+export LLM_GATEWAY_URL="${LLM_GATEWAY_URL:-http://127.0.0.1:8004}"
+
+rm -f "${LOG_DIR}/pids"
+
+serve() {
+  local name="$1" app="$2" port="$3" workers="$4"
+  echo ">>> Starting ${name} on :${port} with ${workers} workers..."
+  "${PYTHON_BIN}" -m Common.Serve "${app}" --host "${HOST}" --port "${port}" --workers "${workers}" \
+    > "${LOG_DIR}/${name}.out" 2>&1 &
+  echo $! >> "${LOG_DIR}/pids"
+}
+
+wait_ready() {
+  local port="$1" name="$2"
+  # readiness, not just an open port: the emotion model may take a while to load
+  for _ in {1..240}; do
+    if "${PYTHON_BIN}" -c "import sys, urllib.request; sys.exit(urllib.request.urlopen('http://127.0.0.1:${port}/health/ready', timeout=2).status != 200)" >/dev/null 2>&1; then
+      echo ">>> ${name} ready."
+      return 0
+    fi
+    sleep 0.5
+  done
+  echo "!!! ${name} not ready on port ${port} in time (see ${LOG_DIR}/${name}.out)."
+  return 1
+}
+
+cd "${ROOT}" || exit 1
+
+serve "emotion"      EmotionService.App:app 8001 "${EMOTION_WORKERS}"
+serve "prompt"       PromptEngine.App:app   8002 "${PROMPT_WORKERS}"
+serve "llm-gateway"  LlmGateway.App:app     8004 "${LLM_WORKERS}"
+wait_ready 8001 "EmotionService" || exit 1
+wait_ready 8002 "PromptEngine" || exit 1
+wait_ready 8004 "LlmGateway" || exit 1
+
+serve "orchestrator" Orchestrator.App:app   8003 "${ORCHESTRATOR_WORKERS}"
+wait_ready 8003 "Orchestrator" || exit 1
+
+echo ">>> All services started (transport=${ORCHESTRATOR_TRANSPORT})."
+echo ">>> Stop with: kill \$(cat ${LOG_DIR}/pids)"